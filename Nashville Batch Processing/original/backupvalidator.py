@@ -1,6 +1,5 @@
 import pandas as pd
 import re
-from processor import Processor
 
 
 class BackupValidator:
@@ -171,6 +170,7 @@ class BackupValidator:
 
 # Example usage
 if __name__ == "__main__":
+    from processor import Processor
 
     processor = Processor()
     processor.process()
@@ -0,0 +1,138 @@
+import sys
+import argparse
+
+
+# Command line entry point for the batch pipeline.
+# Every subcommand imports only the stages it runs, the Azure SDK is only loaded
+# when a 'full' run actually writes:
+#   python cli.py read [file]
+#   python cli.py validate [file]
+#   python cli.py process [file]
+#   python cli.py run [file] [--pipeline full] [--engine polars]
+#   python cli.py stages [file] [--pipeline full] [--force validate] [--cron '0 2 * * *']
+#   python cli.py worker
+#   python cli.py submit [file] [--pipeline full] [--engine polars]
+#   python cli.py parcel <parcel id> [...] | --legal-reference <reference>
+# Without a file the default Nashville input file is used. A directory or a (quoted) glob
+# pattern runs every input file it holds as one batch, read in parallel.
+
+def cmd_read(args):
+    from reader import Reader
+    data = Reader(args.file).load_data()
+    if data is None:
+        print("Failed to load data.")
+        return 1
+    print(f"Data shape: {data.shape}")
+    print(f"Columns: {list(data.columns)}")
+    print("\nFirst 5 rows:")
+    print(data.head())
+    return 0
+
+
+def cmd_run(args):
+    from main import run_pipeline
+    summary = run_pipeline(args.file, args.pipeline, engine=args.engine)
+    return 1 if 'quarantined' in summary else 0
+
+
+def cmd_stages(args):
+    from main import run_stages
+
+    def run():
+        report = run_stages(args.file, args.pipeline, engine=args.engine, force=args.force)
+        for name, result in report.items():
+            print(f"{name}: {result['status']} ({result['seconds']}s)")
+        return report
+
+    if args.cron:
+        from main import build_stages
+        from stage_runner import StageRunner, run_on_schedule
+        # A misspelled stage should fail now, not at the first scheduled run
+        StageRunner(build_stages(args.file, args.engine)).check_names(args.force)
+        try:
+            run_on_schedule(args.cron, run)
+        except KeyboardInterrupt:
+            print("Scheduler stopped by user")
+        return 0
+    report = run()
+    return 1 if any(result['status'] == 'stopped' for result in report.values()) else 0
+
+
+def cmd_worker(args):
+    from worker import Worker
+    Worker(args.queue_dir, poll_interval=args.poll_interval).serve_forever()
+    return 0
+
+
+def cmd_submit(args):
+    from worker import submit_job
+    print(f"Queued {submit_job(args.file, args.pipeline, args.queue_dir, engine=args.engine)}")
+    return 0
+
+
+def cmd_parcel(args):
+    from main import PARCEL_INDEX_PATH
+    from parcel_index import ParcelIndex
+    index = ParcelIndex(PARCEL_INDEX_PATH)
+    if args.legal_reference:
+        records = index.by_legal_reference(args.legal_reference)
+    else:
+        records = index.by_parcels(args.parcel_ids)
+    print(records.to_string(index=False) if not records.empty else "No records found.")
+    return 0 if not records.empty else 1
+
+
+def build_parser():
+    pipelines = ('validate', 'process', 'full')
+    engines = ('pandas', 'polars')
+    parser = argparse.ArgumentParser(description="Nashville batch processing pipeline")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    read = subcommands.add_parser("read", help="read a file and show its shape")
+    read.add_argument("file", nargs="?")
+    read.set_defaults(handler=cmd_read)
+
+    # validate and process are shortcuts for run with that pipeline
+    for name in ("validate", "process"):
+        command = subcommands.add_parser(name, help=f"run the '{name}' pipeline")
+        command.add_argument("file", nargs="?")
+        command.add_argument("--engine", choices=engines, default=None)
+        command.set_defaults(handler=cmd_run, pipeline=name)
+
+    run = subcommands.add_parser("run", help="run a pipeline on a file")
+    run.add_argument("file", nargs="?")
+    run.add_argument("--pipeline", choices=pipelines, default="full")
+    run.add_argument("--engine", choices=engines, default=None)
+    run.set_defaults(handler=cmd_run)
+
+    stages = subcommands.add_parser("stages", help="run only the stages whose inputs, settings or code changed")
+    stages.add_argument("file", nargs="?")
+    stages.add_argument("--pipeline", choices=pipelines, default="full")
+    stages.add_argument("--engine", choices=engines, default=None)
+    stages.add_argument("--force", nargs="*", default=(), metavar="STAGE", help="stages to rerun anyway")
+    stages.add_argument("--cron", default=None, help="run on a cron schedule, e.g. '0 2 * * *'")
+    stages.set_defaults(handler=cmd_stages)
+
+    worker = subcommands.add_parser("worker", help="start a warm worker that waits for jobs")
+    worker.add_argument("--queue-dir", default=None)
+    worker.add_argument("--poll-interval", type=float, default=1.0)
+    worker.set_defaults(handler=cmd_worker)
+
+    submit = subcommands.add_parser("submit", help="queue a job for a running worker")
+    submit.add_argument("file", nargs="?")
+    submit.add_argument("--pipeline", choices=pipelines, default="full")
+    submit.add_argument("--engine", choices=engines, default=None)
+    submit.add_argument("--queue-dir", default=None)
+    submit.set_defaults(handler=cmd_submit)
+
+    parcel = subcommands.add_parser("parcel", help="look up sale records in the parcel index")
+    parcel.add_argument("parcel_ids", nargs="*")
+    parcel.add_argument("--legal-reference", default=None)
+    parcel.set_defaults(handler=cmd_parcel)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.handler(args))
@@ -0,0 +1,23 @@
+# ErrorBudget class
+# - Validation runs in chunks of chunk_size rows and checks the budget after every chunk.
+# - The budget is exceeded when the share of invalid rows seen so far passes max_error_rate,
+#   or when the number of errors passes max_errors. Either limit can be left out (None).
+class ErrorBudget:
+    def __init__(self, max_error_rate=None, max_errors=None, chunk_size=1000):
+        if max_error_rate is not None and not 0 <= max_error_rate <= 1:
+            raise ValueError("max_error_rate must be between 0 and 1")
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.max_error_rate = max_error_rate
+        self.max_errors = max_errors
+        self.chunk_size = chunk_size
+
+    def exceeded(self, rows_checked, invalid_rows, error_count):
+        """Return the reason the budget is exceeded, or None while it still holds"""
+        if self.max_errors is not None and error_count > self.max_errors:
+            return f"{error_count} errors after {rows_checked} rows (limit {self.max_errors})"
+        if self.max_error_rate is not None and rows_checked > 0:
+            rate = invalid_rows / rows_checked
+            if rate > self.max_error_rate:
+                return f"{rate:.1%} invalid rows after {rows_checked} rows (limit {self.max_error_rate:.1%})"
+        return None
@@ -1,46 +1,180 @@
-from reader import Reader 
+from reader import Reader, source_name
 from validator import Validator 
 from processor import Processor 
 from backupvalidator import BackupValidator 
 from writer import Writer 
+from error_budget import ErrorBudget
+from quarantine import quarantine_file, DeadLetterSink
+from parcel_index import ParcelIndex
+from dtype_optimizer import DtypeOptimizer
+from stage_runner import Stage, StageRunner, default_cache_dir, prune_caches
+from rule_plan import write_rule_report
 import os
+import hashlib
 
-def main():
-    
-    
-    # Reader step
-    reader = Reader()
-    data = reader.load_data()
-    data.head(2)
-    
-    
-    # Validation step
-    validator = Validator(data)
+# Output spec: input columns to keep in the output next to the derived ones.
+# None keeps every column the Processor doesn't remove.
+OUTPUT_COLUMNS = None
+
+
+def needed_columns(output_columns=OUTPUT_COLUMNS):
+    """
+    Column predicate for the Reader: only columns needed by the Validator, the Processor
+    or the output spec are parsed
+    """
+    needed = set(Validator().required_columns()) | set(Processor.required_columns())
+    if output_columns is not None:
+        needed |= set(output_columns)
+        return lambda name: name in needed
+    return lambda name: name in needed or name not in Processor.removed_columns
+
+
+# Write the Processor's rollup tables next to the output
+WRITE_ROLLUPS = True
+
+# Downcast the processed data (lossless) before it is handed to the Writer
+OPTIMIZE_DTYPES = True
+
+# Error budget of the Validator, a file past it is quarantined instead of processed
+VALIDATION_BUDGET = {'max_error_rate': 0.95, 'chunk_size': 1000}
+
+# Runs over several input files (a directory or glob) write one output partitioned by
+# this column: output/processed_nashville_housing/Sale Year=2013/part-0.csv, ...
+PARTITION_BY = 'Sale Year'
+
+# Parallel readers for several input files, None for one per CPU
+READ_WORKERS = None
+
+# Stage caches of run_stages kept under state/stage_cache, one per input and engine
+STAGE_CACHES_KEPT = 20
+
+# Write a JSON report per input file with the hits, time and sample values of every
+# validation rule (reports/ next to this module)
+WRITE_RULE_REPORTS = True
+
+# Engine for the Reader, Validator and Processor stages: 'pandas', or 'polars' for
+# multi-threaded column expressions (needs the polars package)
+ENGINE = os.environ.get('NASHVILLE_ENGINE', 'pandas')
+ENGINES = ('pandas', 'polars')
+
+CONNECTION_STRING = "DefaultEndpointsProtocol=https;AccountName=uiiauiiau;AccountKey=ZxKBlPoSrGjlXyHwFUQLe1l7Ps74FVGs4j27S2QBCeOtYnGO+be0020Krs37xlOFMaXiGQN23s4++ASt+O0Tpg==;EndpointSuffix=core.windows.net"
+CONTAINER_NAME = "nashville"
+# Use the absolute path inside the Docker container for output file
+OUTPUT_PATH = 'Nashville Batch Processing/original/output/processed_nashville_housing.csv'
+PARCEL_INDEX_PATH = os.path.join(os.path.dirname(OUTPUT_PATH), 'parcel_index.sqlite')
+
+# Pipelines that can be run, each one stops after its last stage
+PIPELINES = ('validate', 'process', 'full')
+
+
+def get_stages(engine=None):
+    """Reader, Validator and Processor classes of the engine (ENGINE when None)"""
+    engine = engine or ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if engine == 'polars':
+        from polars_engine import PolarsReader, PolarsValidator, PolarsProcessor
+        return PolarsReader, PolarsValidator, PolarsProcessor
+    return Reader, Validator, Processor
+
+
+def run_pipeline(file_path=None, pipeline='full', writer=None, engine=None):
+    """
+    Run the batch pipeline on one input file (the default Nashville file when None), or on
+    every file of a directory or glob pattern read in parallel into one batch.
+    'validate' stops after validation, 'process' after the backup validation and
+    'full' also writes and uploads. Returns a summary of what was done.
+    """
+    if pipeline not in PIPELINES:
+        raise ValueError(f"Unknown pipeline '{pipeline}', expected one of {PIPELINES}")
+    engine = engine or ENGINE
+    reader_class, validator_class, processor_class = get_stages(engine)
+
+    batch = read_step(file_path, reader_class)
+    batch['summary']['engine'] = engine
+    batch = validate_step(batch, validator_class)
+    if batch['data'] is None or pipeline == 'validate':
+        return batch['summary']
+    batch = process_step(batch, processor_class, rollups=WRITE_ROLLUPS and pipeline == 'full')
+    batch = backup_validate_step(batch)
+    if pipeline == 'full':
+        batch = write_step(batch, writer)
+    return batch['summary']
+
+
+# Steps of the pipeline, shared by run_pipeline and the stages of build_stages.
+# Every step takes the batch of the step before it, a dict with the data, the input
+# files and the summary so far, and returns the batch for the next one.
+
+def read_step(file_path, reader_class):
+    """Reader step"""
+    reader = reader_class(file_path, columns=needed_columns(), max_workers=READ_WORKERS)
+    summary = {'file_path': reader.file_path}
+    if len(reader.file_paths) > 1:
+        summary['input_files'] = reader.file_paths
+    return {'data': reader.load_data(), 'file_paths': reader.file_paths, 'summary': summary}
+
+
+def validate_step(batch, validator_class):
+    """
+    Validation step, the batch goes on with the clean rows and the rejected ones.
+    A batch past the error budget is quarantined and goes on with no data.
+    """
+    validator = validator_class(batch['data'], error_budget=ErrorBudget(**VALIDATION_BUDGET))
     validator.validate_dataset()
     print("Validation Summary:")
     print(validator.get_validation_summary())
-    errors = validator.get_validation_results()['validation_errors']
+    source = source_name(batch['file_paths'])
+    summary = dict(batch['summary'], validation=validator.get_validation_summary())
+    if WRITE_RULE_REPORTS:
+        summary['rule_report'] = write_rule_report(validator.get_rule_report(), source)
+    results = validator.get_validation_results()
+    if results['budget_exceeded']:
+        # Keep the batch input in place, only a copy goes to quarantine
+        for path in batch['file_paths']:
+            quarantine_file(path, results['termination_reason'], move=False)
+        summary['quarantined'] = results['termination_reason']
+        return dict(batch, data=None, summary=summary)
+    errors = results['validation_errors']
     if errors:
         print("\nSample validation errors (first 10):")
         for i, error in enumerate(errors[:10]):
             print(error)
         if len(errors) > 10:
             print(f"...and {len(errors) - 10} more errors")
-    validator.get_validated_data()
-    
-    
-    # Processor step
-    processor = Processor()
-    processor.process()
-    processed_data = processor.get_processed_data()
-    print(processed_data.info())
-    
-    
-    # Back-up Validator step
-    backup_validator = BackupValidator(processed_data=processed_data)
+        print("\nErrors by rule:")
+        for rule, count in errors.counts_by_rule().items():
+            print(f"{rule}: {count}")
+    return dict(batch, data=validator.get_validated_data(filter_invalid=True),
+                rejected=validator.get_rejected_data(), summary=summary)
+
+
+def process_step(batch, processor_class, rollups=WRITE_ROLLUPS):
+    """Processor step, the rejected rows of the batch go to the dead-letter sink first"""
+    # Rejected rows go to the dead-letter sink in the background, clean rows go on
+    with DeadLetterSink() as dead_letter_sink:
+        dead_letter_sink.submit(batch['rejected'], source_name(batch['file_paths']))
+
+        processor = processor_class(data=batch['data'])
+        processor.process()
+        # Rollups are taken before the output columns are selected, they may need dropped inputs
+        rollup_tables = processor.get_rollups() if rollups else None
+        if OUTPUT_COLUMNS is not None:
+            processor.select_output_columns(OUTPUT_COLUMNS)
+        processed_data = processor.get_processed_data()
+        print(processed_data.info())
+
+    summary = dict(batch['summary'], processed_records=len(processed_data))
+    return dict(batch, data=processed_data, rejected=None, rollups=rollup_tables, summary=summary)
+
+
+def backup_validate_step(batch):
+    """Back-up Validator step, then the dtype optimization of the processed data"""
+    backup_validator = BackupValidator(processed_data=batch['data'])
     backup_validator.validate()
     print("Backup Validation Summary:")
     print(backup_validator.get_validation_summary())
+    summary = dict(batch['summary'], backup_validation=backup_validator.get_validation_summary())
     flags = backup_validator.get_validation_results()['validation_flags']
     if flags:
         print("\nSample validation flags (first 10):")
@@ -48,13 +182,104 @@ def main():
             print(flag)
         if len(flags) > 10:
             print(f"...and {len(flags) - 10} more flags")
-           
-           
-    #Writer step 
-    writer = Writer("DefaultEndpointsProtocol=https;AccountName=uiiauiiau;AccountKey=ZxKBlPoSrGjlXyHwFUQLe1l7Ps74FVGs4j27S2QBCeOtYnGO+be0020Krs37xlOFMaXiGQN23s4++ASt+O0Tpg==;EndpointSuffix=core.windows.net", "nashville")
-    # Use the absolute path inside the Docker container for output file
-    output_path = 'Nashville Batch Processing/original/output/processed_nashville_housing.csv'
-    writer.write(processed_data, "processed_nashville_housing.csv", output_path)
+
+    processed_data = batch['data']
+    if OPTIMIZE_DTYPES:
+        optimizer = DtypeOptimizer()
+        processed_data = optimizer.optimize(processed_data)
+        summary['dtypes'] = optimizer.get_report()
+    return dict(batch, data=processed_data, summary=summary)
+
+
+def write_step(batch, writer=None):
+    """Writer step, partitioned by PARTITION_BY when the batch was read from several files"""
+    if writer is None:
+        writer = Writer(CONNECTION_STRING, CONTAINER_NAME)
+    processed_data = batch['data']
+    rollups = batch['rollups']
+    partition_by = PARTITION_BY if len(batch['file_paths']) > 1 else None
+    writer.write(processed_data, "processed_nashville_housing.csv", OUTPUT_PATH, rollups=rollups,
+                 partition_by=partition_by)
+    summary = dict(batch['summary'], output_path=os.path.splitext(OUTPUT_PATH)[0] if partition_by else OUTPUT_PATH)
+    summary['rollups'] = {name: len(table) for name, table in (rollups or {}).items()}
+    summary['parcel_index'] = ParcelIndex(PARCEL_INDEX_PATH).build(processed_data)
+    return dict(batch, summary=summary)
+
+
+# Last stage of each pipeline for run_stages
+PIPELINE_TARGETS = {'validate': 'validate', 'process': 'backup_validate', 'full': 'write'}
+
+
+def build_stages(file_path=None, engine=None, writer=None):
+    """
+    The pipeline steps as read -> validate -> process -> backup_validate -> write stages
+    for a StageRunner. Each stage lists the settings and source files its output depends on.
+    """
+    engine = engine or ENGINE
+    reader_class, validator_class, processor_class = get_stages(engine)
+    file_paths = reader_class(file_path).file_paths
+    # The steps live in this module, so it is part of every stage's code
+    shared_code = ['main.py'] + (['polars_engine.py', 'polars_io.py'] if engine == 'polars' else [])
+
+    def validate(batch):
+        batch = validate_step(batch, validator_class)
+        # A quarantined batch stops the stages after it
+        return batch if batch['data'] is not None else None
+
+    def write(batch):
+        # Only the summary is cached, the data is in the output
+        return {'summary': write_step(batch, writer)['summary']}
+
+    return [
+        Stage('read', lambda: read_step(file_path, reader_class), input_files=file_paths,
+              code=['reader.py'] + shared_code, params={
+            'file_paths': file_paths, 'engine': engine, 'output_columns': OUTPUT_COLUMNS,
+            'required_columns': sorted(set(Validator().required_columns()) | set(Processor.required_columns())),
+            'removed_columns': Processor.removed_columns
+        }),
+        Stage('validate', validate, after=['read'], params={
+            'budget': VALIDATION_BUDGET, 'rule_reports': WRITE_RULE_REPORTS
+        }, code=[
+            'validator.py', 'rule_plan.py', 'validation_rules.json', 'validation_errors.py', 'error_budget.py', 'quarantine.py'
+        ] + shared_code),
+        Stage('process', lambda batch: process_step(batch, processor_class), after=['validate'],
+              code=['processor.py'] + shared_code, params={'output_columns': OUTPUT_COLUMNS, 'rollups': WRITE_ROLLUPS}),
+        Stage('backup_validate', backup_validate_step, after=['process'],
+              code=['backupvalidator.py', 'dtype_optimizer.py', 'main.py'], params={'optimize_dtypes': OPTIMIZE_DTYPES}),
+        Stage('write', write, after=['backup_validate'], code=[
+            'writer.py', 'storage.py', 'parcel_index.py', 'main.py'
+        ], params={
+            'partition_by': PARTITION_BY, 'output_path': OUTPUT_PATH,
+            'parcel_index': PARCEL_INDEX_PATH, 'container': CONTAINER_NAME,
+            'storage': os.environ.get('STORAGE_BACKEND', 'azure')
+        }),
+    ]
+
+
+def run_stages(file_path=None, pipeline='full', engine=None, writer=None, force=(), cache_dir=None):
+    """
+    Run the stages of a pipeline that are out of date for this input, the others come
+    from the stage cache (one per input and engine, the STAGE_CACHES_KEPT most recently
+    used are kept). Returns {stage: {'status', 'seconds'}}.
+    """
+    if pipeline not in PIPELINES:
+        raise ValueError(f"Unknown pipeline '{pipeline}', expected one of {PIPELINES}")
+    stages = build_stages(file_path, engine, writer)
+    shared_cache = cache_dir is None
+    if shared_cache:
+        # Keyed on the input as given (file, directory or glob), files added to a directory
+        # change the read stage's fingerprint instead of starting a new cache
+        spec = file_path if isinstance(file_path, (list, tuple)) else [file_path]
+        key = repr(([os.path.abspath(path) if path else None for path in spec], engine or ENGINE))
+        cache_dir = os.path.join(default_cache_dir(), hashlib.sha1(key.encode()).hexdigest()[:12])
+    report = StageRunner(stages, cache_dir).run([PIPELINE_TARGETS[pipeline]], force=force)
+    if shared_cache:
+        prune_caches(default_cache_dir(), STAGE_CACHES_KEPT)
+    return report
+
+
+def main():
+    run_pipeline()
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
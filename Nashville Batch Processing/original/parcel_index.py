@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import pandas as pd
+
+
+def default_index_path():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, "output", "parcel_index.sqlite")
+
+
+# ParcelIndex class
+# - SQLite copy of the processed output, indexed on (Parcel ID, Sale Date) and on
+#   Legal Reference, so a parcel's sale history is a B-tree lookup instead of a CSV scan.
+# - build() writes a new database file and swaps it in with a rename, queries running
+#   against the old index are never broken by a rebuild.
+class ParcelIndex:
+    table = 'sales'
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_index_path()
+
+    def build(self, df: pd.DataFrame):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        tmp_path = f"{self.db_path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        with sqlite3.connect(tmp_path) as connection:
+            df.to_sql(self.table, connection, index=False, chunksize=10000)
+            connection.execute(f'CREATE INDEX idx_parcel_sale_date ON {self.table} ("Parcel ID", "Sale Date")')
+            if 'Legal Reference' in df.columns:
+                connection.execute(f'CREATE INDEX idx_legal_reference ON {self.table} ("Legal Reference")')
+            connection.execute("ANALYZE")
+        connection.close()
+
+        os.replace(tmp_path, self.db_path)
+        print(f"Parcel index with {len(df)} records written to {self.db_path}")
+        return self.db_path
+
+    def _query(self, where, params):
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"No parcel index at {self.db_path}, run the full pipeline first")
+        # Read-only connection, many readers can share the file
+        with sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True) as connection:
+            records = pd.read_sql_query(
+                f'SELECT * FROM {self.table} WHERE {where} ORDER BY "Parcel ID", "Sale Date"', connection, params=params
+            )
+        connection.close()
+        if 'Sale Date' in records.columns:
+            records['Sale Date'] = pd.to_datetime(records['Sale Date'])
+        return records
+
+    def by_parcel(self, parcel_id):
+        """Sale history of one Parcel ID, oldest sale first"""
+        return self._query('"Parcel ID" = ?', [parcel_id])
+
+    def by_parcels(self, parcel_ids):
+        """Sale history of several Parcel IDs, e.g. to join with another dataset"""
+        parcel_ids = list(parcel_ids)
+        if not parcel_ids:
+            return self._query('0', [])
+        placeholders = ", ".join("?" * len(parcel_ids))
+        return self._query(f'"Parcel ID" IN ({placeholders})', parcel_ids)
+
+    def by_legal_reference(self, legal_reference):
+        """Records of one Legal Reference (deed book and page)"""
+        return self._query('"Legal Reference" = ?', [legal_reference])
+
+
+if __name__ == "__main__":
+    import sys
+    index = ParcelIndex()
+    for parcel_id in sys.argv[1:]:
+        print(index.by_parcel(parcel_id))
@@ -0,0 +1,183 @@
+import polars as pl
+from reader import detect_format, select_columns, expand_inputs, check_schemas
+from validator import Validator
+from processor import Processor
+from polars_io import PANDAS_NA_VALUES, open_compressed
+
+
+def scan_table(file_path, columns=None):
+    """
+    LazyFrame over a CSV (plain or compressed), Parquet or Arrow IPC/Feather file.
+    Only the selected columns are read when the frame is collected, see select_columns.
+    """
+    file_format = detect_format(file_path)
+    if file_format == 'csv':
+        options = dict(infer_schema_length=None, null_values=PANDAS_NA_VALUES)
+        if str(file_path).lower().endswith('.csv'):
+            # Types come from the whole file like with pandas, inferred once and handed to the scan
+            schema = pl.scan_csv(file_path, **options).collect_schema()
+            frame = pl.scan_csv(file_path, schema=schema, null_values=PANDAS_NA_VALUES)
+        else:
+            # Compressed CSV can't be scanned, it is decompressed and read in one go
+            with open_compressed(file_path) as source:
+                frame = pl.read_csv(source, **options).lazy()
+        # Unnamed header columns get the names pandas gives them
+        names = frame.collect_schema().names()
+        renames = {name: f"Unnamed: {i}" for i, name in enumerate(names) if name == ''}
+        if renames:
+            frame = frame.rename(renames)
+            names = [renames.get(name, name) for name in names]
+    elif file_format == 'parquet':
+        frame = pl.scan_parquet(file_path)
+        names = frame.collect_schema().names()
+    elif file_format == 'arrow':
+        try:
+            frame = pl.scan_ipc(file_path)
+            names = frame.collect_schema().names()
+        except Exception:
+            # Not the file format, try the streaming format
+            frame = pl.read_ipc_stream(file_path).lazy()
+            names = frame.collect_schema().names()
+    else:
+        raise ValueError(f"Unsupported file format: {file_path}")
+    if columns is not None:
+        frame = frame.select(select_columns(names, columns))
+    return frame
+
+
+# PolarsReader class
+# - Same input files and column selection as the Reader, read with Polars: the scan is lazy,
+#   only the selected columns are parsed and parsing runs on all cores.
+# - Several input files (a directory, glob or list) are checked for the same columns and
+#   scanned as one query, Polars reads them in parallel.
+# - load_data() returns a Polars DataFrame for the PolarsValidator.
+class PolarsReader:
+    def __init__(self, file_path=None, columns=None, max_workers=None):
+        if file_path is None:
+            self.file_path = 'Nashville Batch Processing/original/input/Nashville_housing_data_2013_2016.csv'
+        else:
+            self.file_path = file_path
+        self.file_paths = expand_inputs(self.file_path)
+        self.columns = columns
+        self.max_workers = max_workers
+        self.data = None
+
+    def load_data(self):
+        if len(self.file_paths) == 1:
+            self.data = scan_table(self.file_paths[0], self.columns).collect()
+            return self.data
+        names = check_schemas(self.file_paths, self.columns, self.max_workers)
+        frames = [scan_table(path, names).select(names) for path in self.file_paths]
+        # Columns typed differently in some files are cast to a common type
+        self.data = pl.concat(frames, how='vertical_relaxed').collect()
+        return self.data
+
+
+# PolarsValidator class
+# - Runs the Validator's compiled rule plan over the Polars frame: each chunk hands only the
+#   checked columns to the plan, the ErrorStore, error budget and summary are the Validator's.
+class PolarsValidator(Validator):
+
+    def _row_labels(self):
+        return range(len(self.data))
+
+    def _chunk(self, start, stop):
+        columns = [col for col in self.plan.columns if col in self.data.columns]
+        return self.data.slice(start, stop - start).select(columns).to_pandas()
+
+    def get_validated_data(self, filter_invalid=False):
+        errors = self.validation_results['validation_errors']
+        if filter_invalid and errors:
+            return self.data.filter(pl.Series(~errors.invalid_mask()))
+        return self.data
+
+    def get_rejected_data(self):
+        """The rows that failed validation as a pandas DataFrame, for the dead-letter sink"""
+        errors = self.validation_results['validation_errors']
+        if not errors:
+            return self.data.head(0).to_pandas().assign(rule_codes=[])
+        rows = errors.invalid_rows()
+        rejected = self.data[rows].to_pandas()
+        rejected['rule_codes'] = errors.rule_codes(rows)
+        return rejected
+
+
+# PolarsProcessor class
+# - The Processor's clean-up and derived columns as Polars expressions, evaluated in one
+#   lazy query. get_processed_data() hands a pandas DataFrame to the rest of the pipeline.
+class PolarsProcessor(Processor):
+
+    def __init__(self, data):
+        self.data = data
+        self.processed = None
+
+    def _not_missing(self, col):
+        present = pl.col(col).is_not_null()
+        if self.data.schema[col].is_float():
+            present &= ~pl.col(col).is_nan()
+        return present
+
+    @staticmethod
+    def _owner_names():
+        owner = pl.col('Owner Name').cast(pl.String).str.strip_chars()
+        # First person listed only
+        owner = pl.when(owner.str.contains('&', literal=True)) \
+            .then(owner.str.extract(r'^([^&]*)').str.strip_chars()).otherwise(owner)
+        has_comma = owner.str.contains(',', literal=True)
+        # Stripped, so any whitespace left separates at least two words
+        has_space = owner.str.contains(r'\s')
+        family_name = pl.when(has_comma).then(owner.str.extract(r'^([^,]*)').str.strip_chars()) \
+            .when(has_space).then(owner.str.extract(r'(?s)^\S+\s+(.*)$').str.replace_all(r'\s+', ' ')) \
+            .otherwise(owner)
+        first_name = pl.when(has_comma).then(owner.str.extract(r'(?s)^[^,]*,(.*)$').str.strip_chars()) \
+            .when(has_space).then(owner.str.extract(r'^(\S+)')) \
+            .otherwise(pl.lit(None, dtype=pl.String))
+        return family_name.alias('Family Name'), first_name.alias('First Name')
+
+    def process(self):
+        missing = [col for col in self.mandatory_columns if col not in self.data.columns]
+        if missing:
+            raise KeyError(missing)
+
+        sale_date = pl.col('Sale Date')
+        if not self.data.schema['Sale Date'].is_temporal():
+            sale_date = sale_date.cast(pl.String).str.strptime(pl.Datetime('us'), '%Y-%m-%d')
+        sale_price = pl.col('Sale Price')
+
+        self.data = (
+            self.data.lazy()
+            .filter(pl.all_horizontal([self._not_missing(col) for col in self.mandatory_columns]))
+            .drop([col for col in self.removed_columns if col in self.data.columns])
+            .with_columns(sale_date.cast(pl.Datetime('us')).alias('Sale Date'))
+            .with_columns(
+                (sale_price / pl.col('Finished Area')).alias('Price per Square Foot'),
+                (pl.col('Sale Date').dt.year() - pl.col('Year Built')).alias('Property Age'),
+                pl.col('Sale Date').dt.year().alias('Sale Year'),
+                pl.col('Sale Date').dt.month().cast(pl.Int32).alias('Sale Month'),
+                pl.when(pl.col('Building Value') != 0)
+                .then(pl.col('Land Value') / pl.col('Building Value')).alias('Land-to-Building Ratio'),
+                pl.when(sale_price < 100000).then(pl.lit('Low'))
+                .when(sale_price <= 300000).then(pl.lit('Medium'))
+                .when(sale_price > 300000).then(pl.lit('High'))
+                .otherwise(pl.lit('Unknown')).alias('Sale Price Category'),
+                *self._owner_names()
+            )
+            .collect()
+        )
+        self.processed = None
+        return self
+
+    def select_output_columns(self, output_columns):
+        self.data = self.data.select([
+            col for col in self.data.columns if col in output_columns or col in self.derived_columns
+        ])
+        self.processed = None
+        return self
+
+    def get_rollups(self):
+        return self.compute_rollups(self.get_processed_data())
+
+    def get_processed_data(self):
+        if self.processed is None:
+            self.processed = self.data.to_pandas()
+        return self.processed
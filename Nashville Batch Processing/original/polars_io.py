@@ -0,0 +1,30 @@
+# Input helpers of the Polars engines, shared by both pipelines
+
+# Strings pandas.read_csv reads as missing, so both engines see the same nulls
+PANDAS_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+
+def open_compressed(file_path):
+    """
+    Binary file object over the decompressed content of a CSV, by its suffix. Polars only
+    recognises gzip, zlib and zstd content by itself, bz2, xz and zip must be opened here.
+    """
+    name = str(file_path).lower()
+    if name.endswith('.gz'):
+        import gzip
+        return gzip.open(file_path, 'rb')
+    if name.endswith('.bz2'):
+        import bz2
+        return bz2.open(file_path, 'rb')
+    if name.endswith('.xz'):
+        import lzma
+        return lzma.open(file_path, 'rb')
+    if name.endswith('.zip'):
+        import zipfile
+        archive = zipfile.ZipFile(file_path)
+        return archive.open(archive.namelist()[0])
+    # .zst is decompressed by Polars itself
+    return open(file_path, 'rb')
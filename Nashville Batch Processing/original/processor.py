@@ -1,13 +1,48 @@
 import pandas as pd
 import numpy as np
-from reader import Reader
-from validator import Validator 
 
 class Processor:
+
+    #Non-mandatory columns: ‘Suite/Condo’, ‘Owner Name’, ‘Adress’, ‘City’, ‘State’, ‘Tax District’,
+    #‘Image’, ‘Foundation Type’, ‘Exterior Wall’, ‘Grade’
+    mandatory_columns = ['Parcel ID', 'Land Use', 'Property Address', 'Property City',
+                         'Sale Date', 'Sale Price', 'Legal Reference', 'Sold As Vacant', 'Multiple Parcels Involved in Sale',
+                         'Acreage', 'Neighborhood', 'Land Value',
+                         'Building Value', 'Total Value', 'Finished Area', 'Year Built', 'Bedrooms', 'Full Bath', 'Half Bath']
+
+    # Input columns the derived fields are calculated from
+    derived_from_columns = ['Sale Price', 'Finished Area', 'Sale Date', 'Year Built', 'Land Value', 'Building Value', 'Owner Name']
+
+    # Columns added by process()
+    derived_columns = ['Price per Square Foot', 'Property Age', 'Sale Year', 'Sale Month',
+                       'Land-to-Building Ratio', 'Sale Price Category', 'Family Name', 'First Name']
+
+    # Columns dropped by remove_columns()
+    removed_columns = ['image', 'Sold As Vacant', 'Multiple Parcels Involved in Sale']
+
+    # Pre-aggregated tables written next to the output:
+    # name -> (group by columns, {output column: (input column, aggregation)})
+    rollups = {
+        'price_by_period': (['Sale Year', 'Sale Month', 'Sale Price Category'], {
+            'sales': ('Sale Price', 'size'),
+            'median_price_per_sqft': ('Price per Square Foot', 'median'),
+            'mean_sale_price': ('Sale Price', 'mean'),
+            'total_sale_price': ('Sale Price', 'sum'),
+        }),
+        'price_by_neighborhood': (['Neighborhood', 'Sale Year'], {
+            'sales': ('Sale Price', 'size'),
+            'median_price_per_sqft': ('Price per Square Foot', 'median'),
+            'median_sale_price': ('Sale Price', 'median'),
+        }),
+    }
     
-    def __init__(self):
-        reader = Reader()
-        self.data = reader.load_data()
+    def __init__(self, data=None):
+        # Use already validated data when given, otherwise read the input file
+        if data is None:
+            from reader import Reader
+            reader = Reader()
+            data = reader.load_data()
+        self.data = data
 
         # # Validate the data before processing
         # validator = Validator(self.data)
@@ -30,12 +65,7 @@ class Processor:
         
     # Remove all rows containing a missing value in a mandatory column.    
     def remove_rows_with_missing_mandatory_values(self):
-        #Non-mandatory columns: ‘Suite/Condo’, ‘Owner Name’, ‘Adress’, ‘City’, ‘State’, ‘Tax District’,
-        #‘Image’, ‘Foundation Type’, ‘Exterior Wall’, ‘Grade’
-        mandatory_columns = ['Parcel ID', 'Land Use', 'Property Address', 'Property City',
-                              'Sale Date', 'Sale Price', 'Legal Reference', 'Sold As Vacant', 'Multiple Parcels Involved in Sale'
-                              , 'Acreage', 'Neighborhood', 'Land Value',
-                                  'Building Value', 'Total Value', 'Finished Area', 'Year Built', 'Bedrooms', 'Full Bath', 'Half Bath']
+        mandatory_columns = self.mandatory_columns
         self.data = self.data.dropna(subset=mandatory_columns)
         missing_values = self.data[mandatory_columns].isnull().any(axis=1)
 
@@ -49,7 +79,7 @@ class Processor:
         
     # Remove columns 'image', 'Sold As Vacant' and 'Multiple Parcels Involved in Sale'.
     def remove_columns(self):
-        columns_to_remove = ['image', 'Sold As Vacant', 'Multiple Parcels Involved in Sale']
+        columns_to_remove = self.removed_columns
         existing_columns = [col for col in columns_to_remove if col in self.data.columns]
         self.data = self.data.drop(columns=existing_columns)
         return self
@@ -136,6 +166,33 @@ class Processor:
         self.data = self.data.reset_index(drop=True)
         return self
     
+    # Columns the Reader must load for process() to work.
+    @classmethod
+    def required_columns(cls):
+        return list(dict.fromkeys(cls.mandatory_columns + cls.derived_from_columns))
+
+    # Keep only the requested input columns next to the derived ones.
+    def select_output_columns(self, output_columns):
+        keep = [col for col in self.data.columns if col in output_columns or col in self.derived_columns]
+        self.data = self.data[keep]
+        return self
+
+    # Rollup tables, one groupby pass per rollup over the processed data.
+    # Rollups whose columns are missing are skipped.
+    @classmethod
+    def compute_rollups(cls, data):
+        tables = {}
+        for name, (group_by, aggregations) in cls.rollups.items():
+            if not set(group_by).issubset(data.columns):
+                continue
+            available = {out: spec for out, spec in aggregations.items() if spec[0] in data.columns}
+            if available:
+                tables[name] = data.groupby(group_by, observed=True).agg(**available).reset_index()
+        return tables
+
+    def get_rollups(self):
+        return self.compute_rollups(self.data)
+
     # To show the processed data.   
     def get_processed_data(self):
         return self.data
@@ -1,25 +1,210 @@
 # Added the imports and set the pandas to custom display. 
 import pandas as pd
 import os
+import glob
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 pd.set_option('display.max_columns', None)
 pd.set_option('display.width', None)
 pd.set_option('display.max_rows', 500)
 
+# Supported input formats, by file suffix
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz', '.csv.zst', '.csv.zip')
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+
+
+def detect_format(file_path):
+    name = str(file_path).lower()
+    if name.endswith(CSV_SUFFIXES):
+        return 'csv'
+    if name.endswith(PARQUET_SUFFIXES):
+        return 'parquet'
+    if name.endswith(ARROW_SUFFIXES):
+        return 'arrow'
+    return None
+
+
+def select_columns(names, columns):
+    """Names to keep, columns is None (all), a list of names or a predicate on the name"""
+    if columns is None:
+        return list(names)
+    if callable(columns):
+        return [name for name in names if columns(name)]
+    return [name for name in names if name in set(columns)]
+
+
+def read_table(file_path, columns=None):
+    """
+    Read a CSV (plain or compressed), Parquet or Arrow IPC/Feather file into a DataFrame.
+    Only the selected columns are parsed, see select_columns.
+    """
+    file_format = detect_format(file_path)
+    if file_format == 'csv':
+        usecols = None
+        if columns is not None:
+            usecols = columns if callable(columns) else (lambda name: name in set(columns))
+        if str(file_path).lower().endswith('.csv'):
+            # Plain CSV is parsed straight from the OS page cache
+            return pd.read_csv(file_path, memory_map=True, usecols=usecols)
+        # Compression is taken from the suffix (.zst needs the zstandard package)
+        return pd.read_csv(file_path, compression='infer', usecols=usecols)
+    if file_format == 'parquet':
+        if columns is None:
+            return pd.read_parquet(file_path)
+        import pyarrow.parquet as pq
+        names = pq.read_schema(file_path).names
+        return pd.read_parquet(file_path, columns=select_columns(names, columns))
+    if file_format == 'arrow':
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        # Memory-map the file so Arrow buffers point into the page cache instead of being copied
+        source = pa.memory_map(str(file_path), 'r')
+        try:
+            table = ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            # Not the file format, try the streaming format
+            source.seek(0)
+            table = ipc.open_stream(source).read_all()
+        if columns is not None:
+            # Unselected columns stay untouched in the mapped file
+            table = table.select(select_columns(table.column_names, columns))
+        # split_blocks keeps null-free numeric columns zero-copy
+        return table.to_pandas(split_blocks=True)
+    raise ValueError(f"Unsupported file format: {file_path}")
+
+
+def expand_inputs(file_path):
+    """
+    Input files of file_path, sorted: a file, a directory (its files in a supported format),
+    a glob pattern or a list of any of these
+    """
+    if isinstance(file_path, (list, tuple)):
+        return [path for item in file_path for path in expand_inputs(item)]
+    file_path = str(file_path)
+    if os.path.isdir(file_path):
+        paths = [entry.path for entry in os.scandir(file_path) if entry.is_file() and detect_format(entry.name)]
+    elif any(char in file_path for char in '*?['):
+        paths = [path for path in glob.glob(file_path) if os.path.isfile(path) and detect_format(path)]
+    else:
+        return [file_path]
+    if not paths:
+        raise FileNotFoundError(f"No input files found for {file_path}")
+    return sorted(paths)
+
+
+def source_name(file_paths):
+    """Name for the outputs about a set of input files: the file, or the folder they share"""
+    if len(file_paths) == 1:
+        return file_paths[0]
+    return os.path.commonpath([os.path.abspath(os.path.dirname(path)) for path in file_paths])
+
+
+def read_column_names(file_path):
+    """Column names of a file, from its header or schema only"""
+    file_format = detect_format(file_path)
+    if file_format == 'csv':
+        return list(pd.read_csv(file_path, nrows=0, compression='infer').columns)
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(file_path)
+        # A DataFrame index saved by pandas comes back as the index, not as a column
+        index_columns = (schema.pandas_metadata or {}).get('index_columns', [])
+        return [name for name in schema.names if name not in index_columns]
+    if file_format == 'arrow':
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        with pa.memory_map(str(file_path), 'r') as source:
+            try:
+                return ipc.open_file(source).schema.names
+            except pa.ArrowInvalid:
+                source.seek(0)
+                return ipc.open_stream(source).schema.names
+    raise ValueError(f"Unsupported file format: {file_path}")
+
+
+def check_schemas(file_paths, columns=None, max_workers=None):
+    """
+    Selected columns of the first file, after checking every other file has the same ones
+    (in any order). Only headers and schemas are read, on a thread pool.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        names = list(pool.map(read_column_names, file_paths))
+    selected = [select_columns(file_names, columns) for file_names in names]
+    expected = selected[0]
+    mismatches = []
+    for path, file_columns in zip(file_paths[1:], selected[1:]):
+        missing = [col for col in expected if col not in file_columns]
+        extra = [col for col in file_columns if col not in expected]
+        if missing or extra:
+            mismatches.append(f"{path} (missing {missing}, extra {extra})")
+    if mismatches:
+        raise ValueError(f"Input files don't have the columns of {file_paths[0]}: {'; '.join(mismatches)}")
+    return expected
+
+
+def _read_part(file_path, columns):
+    # Runs in a worker process, columns is a list so it can be pickled
+    return read_table(file_path, columns)
+
+
+def read_tables(file_paths, columns=None, max_workers=None):
+    """
+    Read several files with the same columns into one DataFrame, in file order.
+    CSV parsing is CPU-bound and runs on a process pool, Parquet and Arrow decode
+    outside the GIL and run on a thread pool.
+    """
+    names = check_schemas(file_paths, columns, max_workers)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+    if max_workers == 1:
+        # Nothing to parallelize, worker processes would only add the cost of pickling
+        tables = [_read_part(path, names)[names] for path in file_paths]
+    else:
+        # Spawned, not forked: the caller may already run threads (a warm worker, the
+        # header checks above) and a forked child could inherit a lock held by one of them
+        spawn = multiprocessing.get_context('spawn')
+        with ThreadPoolExecutor(max_workers=max_workers) as threads, \
+                ProcessPoolExecutor(max_workers=max_workers, mp_context=spawn) as processes:
+            futures = [
+                (processes if detect_format(path) == 'csv' else threads).submit(_read_part, path, names)
+                for path in file_paths
+            ]
+            tables = [future.result()[names] for future in futures]
+
+    # Columns typed differently in some files end up with a common type (often object),
+    # the Validator checks their values like any other
+    for col in names:
+        dtypes = {str(table[col].dtype) for table in tables}
+        if len(dtypes) > 1:
+            print(f"Column '{col}' has different types across input files: {sorted(dtypes)}")
+    return pd.concat(tables, ignore_index=True)
+
+
 # Reader class
-# - Gets the 'input/Nashville_housing_data_2013_2016.csv' file.
+# - Gets the 'input/Nashville_housing_data_2013_2016.csv' file by default.
+# - Also reads compressed CSV, Parquet and Arrow/Feather files (memory-mapped).
+# - file_path can also be a directory, a glob pattern or a list: the files are checked
+#   for the same columns, read in parallel and concatenated in name order.
 # - Loads the data into data frame.
 class Reader:
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, columns=None, max_workers=None):
         if file_path is None:
             # Use the absolute path inside the Docker container
             self.file_path = 'Nashville Batch Processing/original/input/Nashville_housing_data_2013_2016.csv'
         else:
             self.file_path = file_path
+        self.file_paths = expand_inputs(self.file_path)
+        # Columns to parse: None for all, a list of names or a predicate on the name
+        self.columns = columns
+        self.max_workers = max_workers
         self.data = None
         
-    def load_data(self):                
-        self.data = pd.read_csv(self.file_path)
+    def load_data(self):
+        if len(self.file_paths) == 1:
+            self.data = read_table(self.file_paths[0], self.columns)
+        else:
+            self.data = read_tables(self.file_paths, self.columns, self.max_workers)
         self.data = self.data.reset_index(drop=True)
         return self.data
 
@@ -0,0 +1,514 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+import pandas as pd
+from datetime import datetime
+
+# Rule files are JSON:
+#   {"templates": {name: rule, ...}, "rules": [rule or group, ...]}
+# A rule is a dict with
+#   rule          name, the ErrorStore rule id follows the order of the file
+#   message       template, with {row} and optionally {value} (the offending value)
+#   column        the column it checks, only present values are checked (except not_null)
+#   check         one of CHECKS, with that check's parameters
+#   applies_to    optional, "str" to only check text values
+#   when_present  optional, columns that must have a value for the rule to apply
+# A group {"columns": [...], "use": [template, ...]} adds the templates for every column in
+# turn, "{column}" in a template's rule name and message is replaced by the column name.
+CHECKS = {
+    'not_null': ('blank_is_null', 'fail_if_absent'),
+    'type': ('types', 'non_empty'),
+    'convertible': ('to',),
+    'range': ('min', 'max', 'integer'),
+    'nonzero': (),
+    'datetime': ('format', 'strip', 'allow'),
+    'pattern': ('regex', 'strip'),
+    'length': ('length',),
+    'enum': ('values', 'case_insensitive'),
+}
+RULE_KEYS = ('rule', 'message', 'column', 'check', 'applies_to', 'when_present')
+
+# Per-value results of a rule are remembered across chunks and files up to this many values
+MAX_MEMO_SIZE = 100000
+
+# Compiled plans kept, a long-running service whose rule file keeps changing drops the
+# least recently used plans (and the memos they hold). Plans are only cached per process,
+# they hold compiled checks (closures, regexes) that can't be stored, and compiling one
+# costs far less than a chunk of rows: every new process compiles its plans once.
+MAX_PLANS = 8
+
+NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+def _expand(entry, templates):
+    if 'use' not in entry:
+        return [dict(entry)]
+    rules = []
+    for column in entry.get('columns') or [entry['column']]:
+        for name in entry['use']:
+            if name not in templates:
+                raise ValueError(f"Unknown rule template '{name}'")
+            rule = {key: value.replace('{column}', column) if isinstance(value, str) and key in ('rule', 'message')
+                    else value for key, value in templates[name].items()}
+            rule['column'] = column
+            rules.append(rule)
+    return rules
+
+
+def _check_definition(rule):
+    name = rule.get('rule', '?')
+    for key in ('rule', 'message', 'column', 'check'):
+        if key not in rule:
+            raise ValueError(f"Rule '{name}' has no '{key}'")
+    if rule['check'] not in CHECKS:
+        raise ValueError(f"Rule '{name}': unknown check '{rule['check']}', expected one of {sorted(CHECKS)}")
+    unknown = set(rule) - set(RULE_KEYS) - set(CHECKS[rule['check']])
+    if unknown:
+        raise ValueError(f"Rule '{name}': unknown keys {sorted(unknown)} for check '{rule['check']}'")
+    if rule.get('applies_to') not in (None, 'str'):
+        raise ValueError(f"Rule '{name}': applies_to must be 'str'")
+
+
+# Parsed rule files by (path, modification time), a changed file is read again
+_rule_files = {}
+
+
+def load_rules(path):
+    """Rules of a JSON rule file, with the groups expanded, as a list of dicts"""
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _rule_files:
+        with open(path) as rule_file:
+            definition = json.load(rule_file)
+        templates = definition.get('templates', {})
+        rules = [rule for entry in definition['rules'] for rule in _expand(entry, templates)]
+        for rule in rules:
+            _check_definition(rule)
+        names = [rule['rule'] for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate rule names in {path}")
+        _rule_files[key] = rules
+    return _rule_files[key]
+
+
+# ColumnValues class
+# - The present values of one column in one chunk, and the predicates several rules share
+#   (is text, is a number, is blank, float() of the value, ...). Each one is computed once
+#   per column and chunk, whatever the number of rules using it.
+# - Checks run over the "domain": every present value of a numeric column (as an array), the
+#   distinct values of any other column. expand() maps a domain result back to the rows.
+class ColumnValues:
+    def __init__(self, series):
+        self.series = series
+        self.present = series.notna().to_numpy()
+        self.rows = np.flatnonzero(self.present)
+        # A pandas row hands the checks Python str, int and float values, so for typed columns
+        # the value type follows from the dtype
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            self.kind = 'number'
+        elif isinstance(series.dtype, pd.StringDtype):
+            self.kind = 'str'
+        else:
+            self.kind = 'object'
+        self._shared = {}
+
+    def shared(self, name):
+        if name not in self._shared:
+            self._shared[name] = getattr(self, '_' + name)()
+        return self._shared[name]
+
+    def _domain(self):
+        present = self.series[self.present]
+        if self.kind == 'number':
+            return None, present.to_numpy(dtype=object)
+        codes, uniques = pd.factorize(present)
+        return codes, np.asarray(uniques, dtype=object)
+
+    @property
+    def codes(self):
+        return None if self.kind == 'number' else self.shared('domain')[0]
+
+    @property
+    def values(self):
+        return self.shared('domain')[1]
+
+    @property
+    def size(self):
+        return len(self.rows) if self.kind == 'number' else len(self.values)
+
+    def expand(self, domain_result):
+        """Per present row (in the order of self.rows) from per domain value"""
+        return domain_result if self.codes is None else domain_result[self.codes]
+
+    def pick(self, domain_result, positions):
+        """expand(domain_result)[positions], without expanding the other rows"""
+        return domain_result[positions] if self.codes is None else domain_result[self.codes[positions]]
+
+    def map(self, function, memo=None):
+        """function of every domain value, memo keeps results across chunks"""
+        if memo is None:
+            return np.fromiter((function(value) for value in self.values), dtype=bool, count=len(self.values))
+        if len(memo) > MAX_MEMO_SIZE:
+            memo.clear()
+        results = np.empty(len(self.values), dtype=bool)
+        for i, value in enumerate(self.values):
+            result = memo.get(value)
+            if result is None:
+                result = memo[value] = function(value)
+            results[i] = result
+        return results
+
+    def _is_str(self):
+        if self.kind != 'object':
+            return np.full(self.size, self.kind == 'str')
+        return self.map(lambda value: isinstance(value, str))
+
+    def _is_number(self):
+        if self.kind != 'object':
+            return np.full(self.size, self.kind == 'number')
+        return self.map(lambda value: isinstance(value, (int, float)))
+
+    def _blank(self):
+        if self.kind == 'number':
+            return np.zeros(self.size, dtype=bool)
+        if self.kind == 'str':
+            return (pd.Series(self.values, dtype=object).str.strip() == '').to_numpy()
+        return self.map(lambda value: isinstance(value, str) and not value.strip())
+
+    def _float(self):
+        """float() of every value and whether it worked"""
+        if self.kind == 'number':
+            return self.series[self.present].to_numpy(dtype=np.float64), np.ones(self.size, dtype=bool)
+        floats = np.full(len(self.values), np.nan)
+        converts = np.zeros(len(self.values), dtype=bool)
+        for i, value in enumerate(self.values):
+            try:
+                floats[i] = float(value)
+                converts[i] = True
+            except (ValueError, TypeError, OverflowError):
+                pass
+        return floats, converts
+
+    def _int(self):
+        """Whether int() of every value works"""
+        if self.kind == 'number':
+            return np.isfinite(self.shared('float')[0])
+
+        def converts(value):
+            try:
+                int(value)
+                return True
+            except (ValueError, TypeError, OverflowError):
+                return False
+        return self.map(converts)
+
+
+# Check builders: compile a rule into a function of a ColumnValues, giving the failing domain
+# values and optionally the value to report for them (None reports the value itself).
+def _build_type(rule):
+    types = set(rule['types'])
+
+    def check(column):
+        valid = np.zeros(column.size, dtype=bool)
+        if 'str' in types:
+            text = column.shared('is_str')
+            valid |= text & ~column.shared('blank') if rule.get('non_empty') else text
+        if 'number' in types:
+            valid |= column.shared('is_number')
+        return ~valid, None
+    return check
+
+
+def _build_convertible(rule):
+    targets = set(rule['to'])
+
+    def check(column):
+        converts = np.zeros(column.size, dtype=bool)
+        if 'float' in targets:
+            converts |= column.shared('float')[1]
+        if 'int' in targets:
+            converts |= column.shared('int')
+        return ~converts, None
+    return check
+
+
+def _bound(value):
+    return datetime.now().year if value == 'current_year' else value
+
+
+def _build_range(rule):
+    def check(column):
+        floats, converts = column.shared('float')
+        outside = np.zeros(len(floats), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            if 'min' in rule:
+                outside |= floats < _bound(rule['min'])
+            if 'max' in rule:
+                outside |= floats > _bound(rule['max'])
+            if rule.get('integer'):
+                outside |= ~(np.isfinite(floats) & (floats == np.floor(floats)))
+        return converts & outside, floats
+    return check
+
+
+def _build_nonzero(rule):
+    def check(column):
+        floats, converts = column.shared('float')
+        return converts & (floats == 0), floats
+    return check
+
+
+def _build_datetime(rule):
+    allowed = {value.lower() for value in rule.get('allow', ())}
+    date_format = rule['format']
+    strip = rule.get('strip', False)
+    memo = {}
+
+    def fails(value):
+        if allowed and isinstance(value, str) and value.strip().lower() in allowed:
+            return False
+        try:
+            datetime.strptime(str(value).strip() if strip else str(value), date_format)
+            return False
+        except ValueError:
+            return True
+    return lambda column: (column.map(fails, memo), None)
+
+
+def _build_pattern(rule):
+    # Only text values are matched, other types are the job of a type rule
+    pattern = re.compile(rule['regex'])
+    strip = rule.get('strip', False)
+    memo = {}
+
+    def fails(value):
+        return isinstance(value, str) and not pattern.fullmatch(value.strip() if strip else value)
+    return lambda column: (column.map(fails, memo), None)
+
+
+def _build_length(rule):
+    length = rule['length']
+    return lambda column: (column.map(lambda value: isinstance(value, str) and len(value) != length), None)
+
+
+def _build_enum(rule):
+    memo = {}
+    if rule.get('case_insensitive'):
+        allowed = {str(value).strip().lower() for value in rule['values']}
+        return lambda column: (column.map(lambda value: str(value).strip().lower() not in allowed, memo), None)
+    allowed = list(rule['values'])
+    return lambda column: (column.map(lambda value: value not in allowed, memo), None)
+
+
+BUILDERS = {
+    'type': _build_type,
+    'convertible': _build_convertible,
+    'range': _build_range,
+    'nonzero': _build_nonzero,
+    'datetime': _build_datetime,
+    'pattern': _build_pattern,
+    'length': _build_length,
+    'enum': _build_enum,
+}
+
+
+def _never_fails(rule):
+    # str() works on anything
+    return rule['check'] == 'convertible' and 'str' in rule['to']
+
+
+# RulePlan class
+# - A list of rules compiled once: one check function per rule, rules that can never fail
+#   dropped, and the rules grouped by column so the shared predicates of a column are
+#   computed once per chunk.
+# - evaluate() runs the whole plan over a chunk with array operations and feeds an ErrorStore
+#   with add_many(), there is no per-row Python loop.
+class RulePlan:
+    def __init__(self, rules, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.rule_definitions = rules
+        self.rules = [(rule['rule'], rule['message']) for rule in rules]
+        self.columns = list(dict.fromkeys(
+            column for rule in rules for column in [rule['column'], *rule.get('when_present', ())]
+        ))
+        steps = [
+            (rule, None if rule['check'] == 'not_null' else BUILDERS[rule['check']](rule))
+            for rule in rules if not _never_fails(rule)
+        ]
+        # Stable sort by column, the rules of a column run together
+        order = {column: i for i, column in enumerate(self.columns)}
+        self.steps = sorted(steps, key=lambda step: order[step[0]['column']])
+
+    def columns_checked(self, check=None):
+        return list(dict.fromkeys(rule['column'] for rule in self.rule_definitions
+                                  if check is None or rule['check'] == check))
+
+    def evaluate(self, data: pd.DataFrame, errors, offset=0, stats=None):
+        """
+        Run every rule over data (a chunk starting at row offset) and record the errors.
+        stats, a RuleStats, gets the time spent and some offending values per rule.
+        """
+        columns = {}
+
+        def column_values(name):
+            if name not in columns:
+                columns[name] = ColumnValues(data[name])
+            return columns[name]
+
+        for rule, check in self.steps:
+            started = time.perf_counter()
+            rows, samples = self._run(rule, check, data, column_values)
+            if len(rows):
+                positions = rows + offset
+                # Only the values the ErrorStore can still retain become Python objects
+                wanted = errors.samples_wanted(positions, rule['rule']) if samples is not None else 0
+                errors.add_many(positions, rule['rule'], samples(wanted) if samples is not None else None)
+            if stats is not None:
+                # A shared predicate counts for the first rule that needs it in the chunk
+                stats.add_time(rule['rule'], time.perf_counter() - started)
+                if len(rows) and rule['column'] in data.columns:
+                    stats.add_values(rule['rule'], data[rule['column']], rows)
+
+    def _run(self, rule, check, data, column_values):
+        """
+        Rows (in the chunk) failing rule, and None or a function giving the values of the
+        first count of them to keep with the errors
+        """
+        name = rule['column']
+        if name not in data.columns:
+            # A missing mandatory column fails every row, other rules skip it
+            if rule['check'] == 'not_null' and rule.get('fail_if_absent'):
+                return np.arange(len(data)), None
+            return NO_ROWS, None
+        if any(other not in data.columns for other in rule.get('when_present', ())):
+            return NO_ROWS, None
+        column = column_values(name)
+
+        if check is None:
+            failing = ~column.present
+            if rule.get('blank_is_null'):
+                failing[column.rows] |= column.expand(column.shared('blank'))
+            return np.flatnonzero(failing), None
+
+        fails, reported = check(column)
+        if rule.get('applies_to') == 'str':
+            fails = fails & column.shared('is_str')
+        positions = np.flatnonzero(column.expand(fails))
+        for other in rule.get('when_present', ()):
+            positions = positions[column_values(other).present[column.rows[positions]]]
+        if not len(positions):
+            return NO_ROWS, None
+
+        samples = None
+        if '{value}' in rule['message']:
+            domain_values = column.values if reported is None else reported
+            samples = lambda count: column.pick(domain_values, positions[:count]).tolist()
+        return column.rows[positions], samples
+
+
+def _plain(value):
+    """A JSON friendly version of a cell value"""
+    if pd.isna(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+# RuleStats class
+# - Filled by RulePlan.evaluate(): the time spent in every rule and the first distinct
+#   offending values of every rule, over all chunks of a file.
+class RuleStats:
+    def __init__(self, max_values=5):
+        self.max_values = max_values
+        self.seconds = {}
+        self.values = {}
+
+    def add_time(self, rule, seconds):
+        self.seconds[rule] = self.seconds.get(rule, 0.0) + seconds
+
+    def add_values(self, rule, series, rows):
+        values = self.values.setdefault(rule, [])
+        if len(values) >= self.max_values:
+            return
+        # The first few failing rows are enough to fill the list most of the time
+        for value in series.iloc[rows[:10 * self.max_values]].tolist():
+            value = _plain(value)
+            if value not in values:
+                values.append(value)
+                if len(values) >= self.max_values:
+                    break
+
+
+def rule_report(errors, rows_checked, stats=None, plan=None):
+    """
+    Per rule: hits, share of the checked rows, seconds spent and sample offending values.
+    Rules are in ErrorStore order, rules outside the plan (file-level ones) have no column.
+    """
+    definitions = {rule['rule']: rule for rule in plan.rule_definitions} if plan is not None else {}
+    counts = errors.counts
+    rules = []
+    for rule_id, name in enumerate(errors.rule_names):
+        definition = definitions.get(name, {})
+        hits = int(counts[rule_id])
+        rules.append({
+            'rule': name,
+            'column': definition.get('column'),
+            'check': definition.get('check'),
+            'hits': hits,
+            'row_percentage': round(hits / rows_checked * 100, 3) if rows_checked else 0.0,
+            'seconds': round(stats.seconds.get(name, 0.0), 6) if stats is not None else None,
+            'sample_values': stats.values.get(name, []) if stats is not None else [],
+        })
+    return {
+        'rows_checked': int(rows_checked),
+        'error_count': len(errors),
+        'rules_fired': sum(1 for rule in rules if rule['hits']),
+        'seconds': round(sum(stats.seconds.values()), 6) if stats is not None else None,
+        'plan_fingerprint': plan.fingerprint if plan is not None else None,
+        'rules': rules,
+    }
+
+
+def default_report_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, "reports")
+
+
+def write_rule_report(report, source_name, report_dir=None):
+    """Write a rule report as <input name>_validation_<timestamp>.json, returns the path"""
+    report_dir = report_dir or default_report_dir()
+    os.makedirs(report_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    base = os.path.splitext(os.path.basename(str(source_name)))[0]
+    path = os.path.join(report_dir, f"{base}_validation_{timestamp}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as report_file:
+        json.dump(dict(report, source=str(source_name)), report_file, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Compiled plans by the fingerprint of their rules, shared by every validator in the process,
+# the MAX_PLANS most recently used ones are kept
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def compile_plan(rules):
+    """The RulePlan of rules, compiled once per distinct set of rules in this process"""
+    fingerprint = hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+    with _plans_lock:
+        if fingerprint in _plans:
+            _plans.move_to_end(fingerprint)
+        else:
+            _plans[fingerprint] = RulePlan(rules, fingerprint)
+            while len(_plans) > MAX_PLANS:
+                _plans.popitem(last=False)
+        return _plans[fingerprint]
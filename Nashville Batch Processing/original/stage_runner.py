@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import datetime
+import traceback
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_cache_dir():
+    return os.path.join(SCRIPT_DIR, "state", "stage_cache")
+
+
+def prune_caches(root, keep):
+    """Remove all but the keep most recently used cache directories under root, returns the removed ones"""
+    if not os.path.isdir(root):
+        return []
+    entries = [os.path.join(root, name) for name in os.listdir(root)]
+    entries = sorted((path for path in entries if os.path.isdir(path)), key=os.path.getmtime, reverse=True)
+    for path in entries[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+    return entries[keep:]
+
+
+def _file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Stage class
+# - One step of a StageRunner: func(*artifacts of the stages in after) returns the artifact
+#   of this stage, or None to stop the stages that depend on it (e.g. a quarantined file).
+# - Its fingerprint covers its code (the source files in code), its params, the files in
+#   input_files (path, size and modification time) and the fingerprints of the stages in after.
+class Stage:
+    def __init__(self, name, func, after=(), params=None, code=(), input_files=()):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.params = params or {}
+        self.code = tuple(code)
+        self.input_files = tuple(input_files)
+
+
+# StageRunner class
+# - Runs stages in dependency order and keeps the artifact of every stage in cache_dir as
+#   <stage>.pkl next to <stage>.json (its fingerprint and run time).
+# - A stage whose fingerprint matches its cached artifact is skipped, and its artifact is
+#   only loaded when a stage after it has to run. A changed writer setting reruns the
+#   write stage only, a changed rule file reruns validation and everything after it.
+class StageRunner:
+    def __init__(self, stages, cache_dir=None):
+        self.stages = {}
+        for stage in stages:
+            missing = [name for name in stage.after if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' runs after unknown or later stages {missing}")
+            self.stages[stage.name] = stage
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.code_digests = {}
+
+    def _code_digest(self, path):
+        path = path if os.path.isabs(path) else os.path.join(SCRIPT_DIR, path)
+        if path not in self.code_digests:
+            self.code_digests[path] = _file_digest(path) if os.path.exists(path) else None
+        return self.code_digests[path]
+
+    def fingerprints(self):
+        """Fingerprint of every stage, computed without running anything"""
+        fingerprints = {}
+        for name, stage in self.stages.items():
+            inputs = []
+            for path in stage.input_files:
+                stat = os.stat(path)
+                inputs.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+            description = {
+                'stage': name,
+                'params': stage.params,
+                'code': {os.path.basename(path): self._code_digest(path) for path in stage.code},
+                'inputs': inputs,
+                'after': [fingerprints[upstream] for upstream in stage.after],
+            }
+            encoded = json.dumps(description, sort_keys=True, default=str).encode()
+            fingerprints[name] = hashlib.sha1(encoded).hexdigest()
+        return fingerprints
+
+    def _paths(self, name):
+        base = os.path.join(self.cache_dir, name)
+        return base + ".pkl", base + ".json"
+
+    def _cached(self, name):
+        """Metadata of the cached artifact of a stage, {} when there is none"""
+        artifact_path, meta_path = self._paths(name)
+        if not (os.path.exists(artifact_path) and os.path.exists(meta_path)):
+            return {}
+        try:
+            with open(meta_path) as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return {}
+
+    def check_names(self, names):
+        """Raise ValueError for names that are not stages of this runner"""
+        unknown = [name for name in names if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown stages {unknown}, expected some of {list(self.stages)}")
+
+    def status(self, force=()):
+        """'fresh' or 'stale' for every stage, a stage after a stale one is stale too"""
+        self.check_names(force)
+        fingerprints = self.fingerprints()
+        status = {}
+        for name, stage in self.stages.items():
+            fresh = name not in force and self._cached(name).get('fingerprint') == fingerprints[name]
+            status[name] = 'fresh' if fresh and all(status[up] == 'fresh' for up in stage.after) else 'stale'
+        return status
+
+    def _needed(self, targets):
+        """Names of the targets and every stage they run after"""
+        needed = set()
+        pending = list(targets)
+        self.check_names(targets)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.stages[name].after)
+        return needed
+
+    def run(self, targets=None, force=()):
+        """
+        Run the stages that are out of date, up to targets (all stages when None).
+        force lists stages to rerun anyway. Returns {stage: {'status', 'seconds'}},
+        status is 'ran', 'cached', 'stopped' (None artifact) or 'skipped' (stopped upstream).
+        """
+        needed = self._needed(targets or list(self.stages))
+        status = self.status(force)
+        fingerprints = self.fingerprints()
+        artifacts = {}
+        report = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Marks the cache as used for prune_caches, a fully cached run writes nothing
+        os.utime(self.cache_dir)
+
+        def artifact(name):
+            if name not in artifacts:
+                with open(self._paths(name)[0], "rb") as artifact_file:
+                    artifacts[name] = pickle.load(artifact_file)
+            return artifacts[name]
+
+        for name, stage in self.stages.items():
+            if name not in needed:
+                continue
+            if any(report[up]['status'] in ('stopped', 'skipped') for up in stage.after):
+                report[name] = {'status': 'skipped', 'seconds': 0.0}
+                continue
+            if status[name] == 'fresh':
+                # A cached stop means the same inputs would stop here again
+                stopped = self._cached(name).get('stopped', False)
+                report[name] = {'status': 'stopped' if stopped else 'cached', 'seconds': 0.0}
+                print(f"Stage '{name}' is up to date")
+                continue
+
+            print(f"Stage '{name}' running")
+            started = time.perf_counter()
+            result = stage.func(*(artifact(up) for up in stage.after))
+            seconds = round(time.perf_counter() - started, 3)
+            artifacts[name] = result
+            self._save(name, result, fingerprints[name], seconds)
+            report[name] = {'status': 'ran' if result is not None else 'stopped', 'seconds': seconds}
+            if result is None:
+                print(f"Stage '{name}' stopped the run")
+        return report
+
+    def _save(self, name, result, fingerprint, seconds):
+        artifact_path, meta_path = self._paths(name)
+        # Old metadata goes first, an interrupted save leaves the stage stale, never wrong
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        tmp_path = artifact_path + ".tmp"
+        with open(tmp_path, "wb") as artifact_file:
+            pickle.dump(result, artifact_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, artifact_path)
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as meta_file:
+            json.dump({
+                'fingerprint': fingerprint, 'seconds': seconds, 'stopped': result is None,
+                'finished_at': datetime.datetime.now().isoformat(timespec='seconds')
+            }, meta_file, indent=2)
+        os.replace(tmp_path, meta_path)
+
+
+# CronSchedule class
+# - Standard five-field cron expressions: minute hour day-of-month month day-of-week,
+#   with *, lists (1,15), ranges (1-5) and steps (*/15, 8-18/2). Day of week 0 and 7 are
+#   Sunday. When both day fields are restricted a day matching either one runs, like cron;
+#   a day field starting with * (*/2 too) only narrows the other one.
+class CronSchedule:
+
+    ranges = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' should have 5 fields")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.ranges)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        # Like cron, a field starting with * counts as unrestricted when combining the two
+        self.any_day = fields[2].startswith('*')
+        self.any_weekday = fields[4].startswith('*')
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            step = int(step) if step else 1
+            if part == '*':
+                start, stop = low, high
+            elif '-' in part:
+                start, stop = (int(value) for value in part.split('-', 1))
+            else:
+                # 5/10 means from 5 to the end in steps of 10
+                start = int(part)
+                stop = high if '/' in field else start
+            if not low <= start <= stop <= high or step < 1:
+                raise ValueError(f"Invalid cron field '{field}', values go from {low} to {high}")
+            values.update(range(start, stop + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        # Python counts weekdays from Monday = 0, cron from Sunday = 0
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment):
+        """First minute strictly after moment that matches the schedule"""
+        moment = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        # Four years and a day covers every valid schedule, 29 February included
+        limit = moment + datetime.timedelta(days=4 * 366)
+        while moment <= limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+
+def run_on_schedule(expression, job):
+    """Call job() at every time matching the cron expression (local time), until interrupted"""
+    schedule = CronSchedule(expression)
+    while True:
+        next_run = schedule.next_after(datetime.datetime.now())
+        print(f"Next run at {next_run.isoformat(sep=' ')} ({expression})")
+        while True:
+            remaining = (next_run - datetime.datetime.now()).total_seconds()
+            if remaining <= 0:
+                break
+            # Short sleeps, so a clock change or a suspended machine doesn't skip a run
+            time.sleep(min(remaining, 60))
+        try:
+            job()
+        except Exception:
+            # A failed run is reported, the next one still happens
+            traceback.print_exc()
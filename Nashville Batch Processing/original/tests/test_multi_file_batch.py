@@ -0,0 +1,96 @@
+import functools
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import main
+from quarantine import DeadLetterSink
+from reader import Reader, check_schemas, expand_inputs, read_table, read_tables, source_name
+from storage import MemoryStorage
+from test_polars_engine import nashville_records
+from writer import Writer
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    """Three input files of one batch, written out of name order"""
+    records = nashville_records(n=30)
+    folder = tmp_path / "input"
+    folder.mkdir()
+    for i in (2, 0, 1):
+        records.iloc[10 * i:10 * (i + 1)].to_csv(folder / f"sales_{i}.csv", index=False)
+    (folder / "notes.txt").write_text("not an input")
+    return folder
+
+
+def test_directories_globs_and_lists_expand_to_sorted_files(input_dir):
+    expected = [str(input_dir / f"sales_{i}.csv") for i in range(3)]
+    assert expand_inputs(str(input_dir)) == expected
+    assert expand_inputs(str(input_dir / "sales_*.csv")) == expected
+    assert expand_inputs([expected[2], str(input_dir / "sales_[01].csv")]) == [expected[2]] + expected[:2]
+    assert source_name(expected) == str(input_dir) and source_name(expected[:1]) == expected[0]
+    with pytest.raises(FileNotFoundError):
+        expand_inputs(str(input_dir / "*.parquet"))
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_files_are_read_into_one_frame_in_name_order(input_dir, tmp_path, max_workers):
+    nashville_records(n=30).to_csv(tmp_path / "all.csv", index=False)
+    data = Reader(str(input_dir), max_workers=max_workers).load_data()
+    pd.testing.assert_frame_equal(data, read_table(tmp_path / "all.csv"), check_dtype=False)
+
+
+def test_mixed_formats_and_column_orders_are_read_together(input_dir):
+    pytest.importorskip("pyarrow")
+    part = pd.read_csv(input_dir / "sales_2.csv")
+    os.remove(input_dir / "sales_2.csv")
+    part[part.columns[::-1]].to_parquet(input_dir / "sales_2.parquet", index=False)
+    files = expand_inputs(str(input_dir))
+    assert read_tables(files, max_workers=1)['Parcel ID'].tolist() == nashville_records(n=30)['Parcel ID'].tolist()
+
+
+def test_files_with_other_columns_are_rejected(input_dir):
+    pd.read_csv(input_dir / "sales_1.csv").drop(columns=['Grade']).to_csv(input_dir / "sales_1.csv", index=False)
+    with pytest.raises(ValueError, match=r"sales_1.csv \(missing \['Grade'\]"):
+        check_schemas(expand_inputs(str(input_dir)))
+    # Unless the column isn't selected
+    assert 'Grade' not in check_schemas(expand_inputs(str(input_dir)), lambda name: name != 'Grade')
+
+
+def test_partitions_are_replaced_whole(tmp_path):
+    writer = Writer(None, "nashville", storage=MemoryStorage("nashville"))
+    output_path = str(tmp_path / "output" / "processed.csv")
+    os.makedirs(os.path.dirname(output_path))
+    df = pd.DataFrame({'Sale Year': [2013, 2014, np.nan, 2013], 'Sale Price': [1, 2, 3, 4]})
+    writer.write(df, "processed.csv", output_path, partition_by='Sale Year')
+    assert sorted(writer.storage.blobs) == [
+        "processed/Sale Year=2013.0/part-0.csv", "processed/Sale Year=2014.0/part-0.csv",
+        "processed/Sale Year=__HIVE_DEFAULT_PARTITION__/part-0.csv",
+    ]
+    part = pd.read_csv(tmp_path / "output" / "processed" / "Sale Year=2013.0" / "part-0.csv")
+    assert part['Sale Price'].tolist() == [1, 4]
+
+    writer.write(df.iloc[:2], "processed.csv", output_path, partition_by='Sale Year')
+    assert sorted(writer.storage.blobs) == ["processed/Sale Year=2013.0/part-0.csv", "processed/Sale Year=2014.0/part-0.csv"]
+    assert sorted(os.listdir(tmp_path / "output")) == ["processed"]
+    assert sorted(os.listdir(tmp_path / "output" / "processed")) == ["Sale Year=2013.0", "Sale Year=2014.0"]
+
+
+def test_a_batch_of_files_runs_into_a_partitioned_output(input_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'OUTPUT_PATH', str(tmp_path / "output" / "processed_nashville_housing.csv"))
+    monkeypatch.setattr(main, 'PARCEL_INDEX_PATH', str(tmp_path / "output" / "parcel_index.sqlite"))
+    monkeypatch.setattr(main, 'WRITE_RULE_REPORTS', False)
+    monkeypatch.setattr(main, 'READ_WORKERS', 1)
+    monkeypatch.setattr(main, 'DeadLetterSink', functools.partial(DeadLetterSink, dead_letter_dir=str(tmp_path / "dead")))
+    os.makedirs(tmp_path / "output")
+    writer = Writer(None, "nashville", storage=MemoryStorage("nashville"))
+
+    summary = main.run_pipeline(str(input_dir), writer=writer)
+    assert len(summary['input_files']) == 3
+    assert summary['validation']['total_records'] == 30
+    partitions = [name for name in writer.storage.blobs if name.startswith("processed_nashville_housing/")]
+    years = {name.split('/')[1] for name in partitions}
+    assert years and all(year.startswith("Sale Year=") for year in years)
+    assert summary['processed_records'] == sum(
+        len(pd.read_csv(os.path.join(tmp_path, "output", *name.split('/')))) for name in partitions
+    )
@@ -0,0 +1,55 @@
+import sqlite3
+import pandas as pd
+import pytest
+from parcel_index import ParcelIndex
+
+
+def sales():
+    return pd.DataFrame({
+        'Parcel ID': ['105 03 0D 008.00', '105 11 0 080.00', '105 03 0D 008.00'],
+        'Sale Date': ['2015-06-01', '2013-01-24', '2013-03-18'],
+        'Legal Reference': ['20150601-0049311', '20130128-0008725', '20130318-0026220'],
+        'Sale Price': [250000, 191500, 240000],
+    })
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ParcelIndex(str(tmp_path / "output" / "parcel_index.sqlite"))
+
+
+def test_sale_history_of_a_parcel_is_oldest_first(index):
+    index.build(sales())
+    history = index.by_parcel('105 03 0D 008.00')
+    assert history['Sale Price'].tolist() == [240000, 250000]
+    assert str(history['Sale Date'].dtype).startswith('datetime64')
+    assert index.by_parcel('missing').empty
+
+
+def test_lookups_by_several_parcels_and_by_legal_reference(index):
+    index.build(sales())
+    assert len(index.by_parcels(['105 03 0D 008.00', '105 11 0 080.00'])) == 3
+    assert index.by_parcels([]).empty
+    assert index.by_legal_reference('20130128-0008725')['Parcel ID'].tolist() == ['105 11 0 080.00']
+
+
+def test_lookups_use_the_indexes(index):
+    index.build(sales())
+    with sqlite3.connect(index.db_path) as connection:
+        plan = connection.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM sales WHERE "Parcel ID" = ? ORDER BY "Parcel ID", "Sale Date"', ['x']
+        ).fetchall()
+    connection.close()
+    assert 'idx_parcel_sale_date' in str(plan)
+
+
+def test_rebuild_replaces_the_index(index, tmp_path):
+    index.build(sales())
+    index.build(sales().iloc[:1])
+    assert len(index.by_parcels(sales()['Parcel ID'])) == 1
+    assert sorted(path.name for path in (tmp_path / "output").iterdir()) == ["parcel_index.sqlite"]
+
+
+def test_querying_before_a_build_fails(index):
+    with pytest.raises(FileNotFoundError, match="run the full pipeline first"):
+        index.by_parcel('105 03 0D 008.00')
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from main import get_stages, needed_columns
+
+pytest.importorskip("polars")
+
+COMPRESSIONS = {'.csv': None, '.csv.gz': 'gzip', '.csv.bz2': 'bz2', '.csv.xz': 'xz', '.csv.zip': 'zip'}
+
+
+def nashville_records(n=40, seed=0):
+    """n sales in the columns of the Nashville input, a few of them invalid"""
+    rng = np.random.default_rng(seed)
+    years = rng.integers(2013, 2017, n)
+    records = pd.DataFrame({
+        'Unnamed: 0': np.arange(n),
+        'Parcel ID': [f"105 03 0D {i:03d}.00" for i in range(n)],
+        'Land Use': rng.choice(['SINGLE FAMILY', 'RESIDENTIAL CONDO', 'DUPLEX'], n),
+        'Property Address': [f"{100 + i}  OAK ST" for i in range(n)],
+        'Suite/ Condo   #': [None] * n,
+        'Property City': 'NASHVILLE',
+        'Sale Date': [f"{year}-{month:02d}-15" for year, month in zip(years, rng.integers(1, 13, n))],
+        'Sale Price': rng.integers(50, 900, n) * 1000,
+        'Legal Reference': [f"2013{i:04d}-0008725" for i in range(n)],
+        'Sold As Vacant': rng.choice(['Yes', 'No'], n),
+        'Multiple Parcels Involved in Sale': 'No',
+        'Owner Name': [f"SMITH, JOHN {i}" for i in range(n)],
+        'Address': [f"{100 + i}  OAK ST" for i in range(n)],
+        'City': 'NASHVILLE',
+        'State': 'TN',
+        'Acreage': rng.integers(1, 100, n) / 100,
+        'Tax District': 'URBAN SERVICES DISTRICT',
+        'Neighborhood': rng.integers(3000, 3100, n),
+        'image': 'https://example.org/image.jpg',
+        'Land Value': rng.integers(10, 100, n) * 1000,
+        'Building Value': rng.integers(50, 400, n) * 1000,
+        'Total Value': rng.integers(60, 500, n) * 1000,
+        'Finished Area': rng.integers(800, 4000, n).astype(float),
+        'Foundation Type': rng.choice(['CRAWL', 'FULL BSMT', 'SLAB'], n),
+        'Year Built': rng.integers(1900, 2015, n),
+        'Exterior Wall': rng.choice(['BRICK', 'FRAME', 'BRICK/FRAME'], n),
+        'Grade': rng.choice(['C', 'B+', 'A-'], n),
+        'Bedrooms': rng.integers(1, 6, n),
+        'Full Bath': rng.integers(1, 4, n),
+        'Half Bath': rng.integers(0, 2, n),
+    })
+    # Invalid rows: a missing mandatory value, a bad enum, a negative acreage and a bad grade
+    records.loc[1, 'Property City'] = None
+    records.loc[3, 'Sold As Vacant'] = 'Maybe'
+    records.loc[5, 'Acreage'] = -0.5
+    records.loc[7, 'Grade'] = 'c'
+    return records
+
+
+def run_stages(engine, path):
+    reader_class, validator_class, processor_class = get_stages(engine)
+    validator = validator_class(reader_class(str(path), columns=needed_columns()).load_data())
+    validator.validate_dataset()
+    processor = processor_class(data=validator.get_validated_data(filter_invalid=True))
+    processor.process()
+    return validator, processor
+
+
+@pytest.mark.parametrize('suffix', COMPRESSIONS)
+def test_engines_give_the_same_results(tmp_path, suffix):
+    path = tmp_path / f"nashville{suffix}"
+    nashville_records().to_csv(path, index=False, compression=COMPRESSIONS[suffix])
+    pandas_validator, pandas_processor = run_stages('pandas', path)
+    polars_validator, polars_processor = run_stages('polars', path)
+
+    assert polars_validator.get_validation_summary() == pandas_validator.get_validation_summary()
+    assert pandas_validator.get_validation_summary()['invalid_records'] == 4
+    pandas_errors = pandas_validator.get_validation_results()['validation_errors']
+    polars_errors = polars_validator.get_validation_results()['validation_errors']
+    assert polars_errors.counts_by_rule() == pandas_errors.counts_by_rule()
+    assert [str(error) for error in polars_errors] == [str(error) for error in pandas_errors]
+    pd.testing.assert_frame_equal(polars_validator.get_rejected_data(), pandas_validator.get_rejected_data(),
+                                  check_dtype=False)
+    pd.testing.assert_frame_equal(polars_processor.get_processed_data(), pandas_processor.get_processed_data(),
+                                  check_dtype=False)
+
+
+def test_engines_give_the_same_rollups(tmp_path):
+    path = tmp_path / "nashville.csv"
+    nashville_records().to_csv(path, index=False)
+    pandas_rollups = run_stages('pandas', path)[1].get_rollups()
+    polars_rollups = run_stages('polars', path)[1].get_rollups()
+    assert list(polars_rollups) == list(pandas_rollups)
+    for name, table in pandas_rollups.items():
+        pd.testing.assert_frame_equal(polars_rollups[name], table, check_dtype=False)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError, match="Unknown engine"):
+        get_stages('duckdb')
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+from reader import Reader, detect_format, read_column_names, read_table
+
+COMPRESSIONS = {'.csv': None, '.csv.gz': 'gzip', '.csv.bz2': 'bz2', '.csv.xz': 'xz', '.csv.zip': 'zip'}
+
+
+@pytest.fixture
+def parcels():
+    return pd.DataFrame({
+        'Parcel ID': ['105 03 0D 008.00', '105 11 0 080.00', '118 03 0 130.00'],
+        'Land Use': ['RESIDENTIAL CONDO', 'SINGLE FAMILY', 'SINGLE FAMILY'],
+        'Sale Price': [240000, 366000, 435000],
+        'Acreage': [0.17, 0.11, None],
+    })
+
+
+def write_arrow(df, path, stream=False):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with (ipc.new_stream if stream else ipc.new_file)(str(path), table.schema) as writer:
+        writer.write_table(table)
+
+
+@pytest.mark.parametrize('suffix', COMPRESSIONS)
+def test_plain_and_compressed_csv_read_the_same(tmp_path, parcels, suffix):
+    path = tmp_path / f"parcels{suffix}"
+    parcels.to_csv(path, index=False, compression=COMPRESSIONS[suffix])
+    assert detect_format(path) == 'csv'
+    pd.testing.assert_frame_equal(read_table(path), parcels)
+    assert read_column_names(path) == list(parcels.columns)
+
+
+def test_parquet_and_arrow_files_and_streams(tmp_path, parcels):
+    pytest.importorskip("pyarrow")
+    parcels.to_parquet(tmp_path / "parcels.parquet")
+    write_arrow(parcels, tmp_path / "parcels.arrow")
+    write_arrow(parcels, tmp_path / "parcels.ipc", stream=True)
+    for name in ("parcels.parquet", "parcels.arrow", "parcels.ipc"):
+        pd.testing.assert_frame_equal(read_table(tmp_path / name), parcels, check_dtype=False)
+        # The saved pandas index is not a column
+        assert read_column_names(tmp_path / name) == list(parcels.columns)
+
+
+def test_reader_resets_the_index(tmp_path, parcels):
+    pytest.importorskip("pyarrow")
+    parcels.index = [10, 20, 30]
+    parcels.to_parquet(tmp_path / "parcels.parquet")
+    assert Reader(str(tmp_path / "parcels.parquet")).load_data().index.tolist() == [0, 1, 2]
+
+
+def test_unsupported_formats_are_rejected(tmp_path):
+    path = tmp_path / "parcels.xlsx"
+    path.write_text("")
+    assert detect_format(path) is None
+    with pytest.raises(ValueError, match="Unsupported file format"):
+        read_table(path)
@@ -0,0 +1,92 @@
+import json
+import os
+import pandas as pd
+import pytest
+import rule_plan
+from rule_plan import compile_plan, load_rules
+from validation_errors import ErrorStore
+from validator import Validator, RULES_PATH
+
+
+def write_rules(path, definition):
+    path.write_text(json.dumps(definition))
+    return str(path)
+
+
+TEMPLATES = {
+    'mandatory': {'rule': 'mandatory:{column}', 'check': 'not_null', 'blank_is_null': True, 'fail_if_absent': True,
+                  'message': "Record {row}: Mandatory field '{column}' is missing or empty"},
+    'numeric': {'rule': 'numeric:{column}', 'check': 'convertible', 'to': ['float'],
+                'message': "Record {row}: {column} should be numeric"},
+}
+
+
+def test_groups_expand_their_templates_per_column(tmp_path):
+    path = write_rules(tmp_path / "rules.json", {'templates': TEMPLATES, 'rules': [
+        {'columns': ['Land Value', 'Total Value'], 'use': ['mandatory', 'numeric']},
+    ]})
+    rules = load_rules(path)
+    assert [rule['rule'] for rule in rules] == ['mandatory:Land Value', 'numeric:Land Value',
+                                                'mandatory:Total Value', 'numeric:Total Value']
+    assert rules[1]['message'] == "Record {row}: Land Value should be numeric"
+    assert rules[1]['column'] == 'Land Value'
+
+
+@pytest.mark.parametrize('rule, error', [
+    ({'rule': 'a', 'column': 'A', 'check': 'regex', 'message': ''}, "unknown check 'regex'"),
+    ({'rule': 'a', 'column': 'A', 'check': 'range', 'minimum': 0, 'message': ''}, r"unknown keys \['minimum'\]"),
+    ({'rule': 'a', 'column': 'A', 'check': 'range'}, "has no 'message'"),
+    ({'columns': ['A'], 'use': ['positive']}, "Unknown rule template 'positive'"),
+])
+def test_invalid_rule_files_are_rejected(tmp_path, rule, error):
+    path = write_rules(tmp_path / "rules.json", {'templates': TEMPLATES, 'rules': [rule]})
+    with pytest.raises(ValueError, match=error):
+        load_rules(path)
+
+
+def test_duplicate_rule_names_are_rejected(tmp_path):
+    path = write_rules(tmp_path / "rules.json", {'templates': TEMPLATES, 'rules': [
+        {'columns': ['A'], 'use': ['numeric']}, {'columns': ['A'], 'use': ['numeric']},
+    ]})
+    with pytest.raises(ValueError, match="Duplicate rule names"):
+        load_rules(path)
+
+
+def test_plans_are_compiled_once_per_set_of_rules(tmp_path, monkeypatch):
+    path = write_rules(tmp_path / "rules.json", {'templates': TEMPLATES, 'rules': [{'columns': ['A'], 'use': ['numeric']}]})
+    plan = compile_plan(load_rules(path))
+    assert compile_plan(load_rules(path)) is plan
+    assert Validator(rules_path=path).plan is plan
+
+    # An edited rule file is read again and gives a new plan
+    write_rules(tmp_path / "rules.json", {'templates': TEMPLATES, 'rules': [{'columns': ['B'], 'use': ['numeric']}]})
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10**9))
+    assert compile_plan(load_rules(path)).columns == ['B']
+
+    monkeypatch.setattr(rule_plan, 'MAX_PLANS', 1)
+    compile_plan([])
+    assert compile_plan(load_rules(path)) is not plan and len(rule_plan._plans) == 1
+
+
+def test_chunked_evaluation_matches_one_pass():
+    plan = compile_plan(load_rules(RULES_PATH))
+    data = pd.DataFrame({
+        'Sale Price': ['100', 'abc', None, 'bad', 'x'] * 4,
+        'Finished Area': [0, 1200, 1000, None, 900] * 4,
+        'Sold As Vacant': ['Yes', 'No', 'Maybe', 'Yes', ''] * 4,
+    }, dtype=object)
+
+    def evaluate(chunk_size):
+        errors = ErrorStore(plan.rules, index=data.index)
+        for start in range(0, len(data), chunk_size):
+            plan.evaluate(data.iloc[start:start + chunk_size], errors, offset=start)
+        return errors
+
+    single, chunked = evaluate(len(data)), evaluate(3)
+    assert chunked.counts_by_rule() == single.counts_by_rule()
+    assert [str(error) for error in chunked] == [str(error) for error in single]
+    counts = single.counts_by_rule()
+    # Sale Price is only checked where Finished Area is present ('bad' is not), and the other way round
+    assert counts['sale_price_numeric'] == 8 and counts['finished_area_zero'] == 4
+    # Missing mandatory columns fail every row
+    assert counts['mandatory:Parcel ID'] == len(data)
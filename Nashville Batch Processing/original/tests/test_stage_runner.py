@@ -0,0 +1,158 @@
+import os
+import datetime
+import pytest
+from stage_runner import Stage, StageRunner, CronSchedule, prune_caches
+
+
+def make_stages(tmp_path, calls, scale=2, stop=False):
+    """read -> transform -> write over a small input file, calls records every stage run"""
+    input_path = tmp_path / "input.txt"
+    code_path = tmp_path / "transform.py"
+    for path, text in ((input_path, "1 2 3"), (code_path, "# v1")):
+        if not path.exists():
+            path.write_text(text)
+
+    def read():
+        calls.append('read')
+        return [int(value) for value in input_path.read_text().split()]
+
+    def transform(values):
+        calls.append('transform')
+        return None if stop else [value * scale for value in values]
+
+    def write(values):
+        calls.append('write')
+        return {'total': sum(values)}
+
+    return [
+        Stage('read', read, input_files=[str(input_path)]),
+        Stage('transform', transform, after=['read'], params={'scale': scale}, code=[str(code_path)]),
+        Stage('write', write, after=['transform']),
+    ]
+
+
+def statuses(report):
+    return {name: entry['status'] for name, entry in report.items()}
+
+
+def test_second_run_is_cached(tmp_path):
+    calls = []
+    runner = StageRunner(make_stages(tmp_path, calls), cache_dir=str(tmp_path / "cache"))
+    assert statuses(runner.run()) == {'read': 'ran', 'transform': 'ran', 'write': 'ran'}
+    assert statuses(runner.run()) == {'read': 'cached', 'transform': 'cached', 'write': 'cached'}
+    assert calls == ['read', 'transform', 'write']
+    assert runner.status() == {'read': 'fresh', 'transform': 'fresh', 'write': 'fresh'}
+
+
+def test_changed_param_reruns_the_stage_and_the_ones_after_it(tmp_path):
+    calls = []
+    StageRunner(make_stages(tmp_path, calls), cache_dir=str(tmp_path / "cache")).run()
+    calls.clear()
+    runner = StageRunner(make_stages(tmp_path, calls, scale=3), cache_dir=str(tmp_path / "cache"))
+    assert runner.status() == {'read': 'fresh', 'transform': 'stale', 'write': 'stale'}
+    report = runner.run()
+    assert statuses(report) == {'read': 'cached', 'transform': 'ran', 'write': 'ran'}
+    # The cached read artifact is loaded for the transform
+    assert calls == ['transform', 'write']
+
+
+def test_changed_code_or_input_invalidates(tmp_path):
+    calls = []
+    cache_dir = str(tmp_path / "cache")
+    StageRunner(make_stages(tmp_path, calls), cache_dir=cache_dir).run()
+
+    (tmp_path / "transform.py").write_text("# v2")
+    runner = StageRunner(make_stages(tmp_path, calls), cache_dir=cache_dir)
+    assert runner.status() == {'read': 'fresh', 'transform': 'stale', 'write': 'stale'}
+    runner.run()
+
+    input_path = tmp_path / "input.txt"
+    input_path.write_text("1 2 3 4")
+    stat = os.stat(input_path)
+    os.utime(input_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    runner = StageRunner(make_stages(tmp_path, calls), cache_dir=cache_dir)
+    assert runner.status() == {'read': 'stale', 'transform': 'stale', 'write': 'stale'}
+
+
+def test_force_reruns_the_named_stages(tmp_path):
+    calls = []
+    cache_dir = str(tmp_path / "cache")
+    StageRunner(make_stages(tmp_path, calls), cache_dir=cache_dir).run()
+    calls.clear()
+    report = StageRunner(make_stages(tmp_path, calls), cache_dir=cache_dir).run(force=['transform'])
+    assert statuses(report) == {'read': 'cached', 'transform': 'ran', 'write': 'ran'}
+    assert calls == ['transform', 'write']
+
+
+def test_unknown_stage_names_are_rejected(tmp_path):
+    runner = StageRunner(make_stages(tmp_path, []), cache_dir=str(tmp_path / "cache"))
+    with pytest.raises(ValueError, match="Unknown stages"):
+        runner.run(force=['tranform'])
+    with pytest.raises(ValueError, match="Unknown stages"):
+        runner.status(force=['nope'])
+    with pytest.raises(ValueError, match="Unknown stages"):
+        runner.run(targets=['nope'])
+    assert not os.path.exists(runner.cache_dir)
+
+
+def test_stopped_stage_skips_the_rest_and_stays_stopped(tmp_path):
+    calls = []
+    cache_dir = str(tmp_path / "cache")
+    report = StageRunner(make_stages(tmp_path, calls, stop=True), cache_dir=cache_dir).run()
+    assert statuses(report) == {'read': 'ran', 'transform': 'stopped', 'write': 'skipped'}
+    report = StageRunner(make_stages(tmp_path, calls, stop=True), cache_dir=cache_dir).run()
+    assert statuses(report) == {'read': 'cached', 'transform': 'stopped', 'write': 'skipped'}
+    assert calls == ['read', 'transform']
+
+
+def test_prune_caches_keeps_the_most_recently_used(tmp_path):
+    for i in range(4):
+        path = tmp_path / f"cache{i}"
+        path.mkdir()
+        os.utime(path, (1000 + i, 1000 + i))
+    removed = prune_caches(str(tmp_path), keep=2)
+    assert sorted(os.path.basename(path) for path in removed) == ['cache0', 'cache1']
+    assert sorted(os.listdir(tmp_path)) == ['cache2', 'cache3']
+
+
+def next_runs(expression, start, count=4):
+    schedule, runs = CronSchedule(expression), []
+    for _ in range(count):
+        start = schedule.next_after(start)
+        runs.append(start)
+    return runs
+
+
+def test_cron_steps_ranges_and_lists():
+    start = datetime.datetime(2024, 1, 1, 0, 0)
+    assert next_runs('*/15 * * * *', start, 3) == [
+        datetime.datetime(2024, 1, 1, 0, 15), datetime.datetime(2024, 1, 1, 0, 30), datetime.datetime(2024, 1, 1, 0, 45)
+    ]
+    assert next_runs('0 8-18/5 * * *', start, 3) == [
+        datetime.datetime(2024, 1, 1, 8), datetime.datetime(2024, 1, 1, 13), datetime.datetime(2024, 1, 1, 18)
+    ]
+    assert next_runs('0 0 29 2 *', start, 2) == [datetime.datetime(2024, 2, 29), datetime.datetime(2028, 2, 29)]
+
+
+def test_cron_restricted_day_fields_match_either():
+    # The 13th or any Friday
+    runs = next_runs('0 0 13 * 5', datetime.datetime(2024, 1, 1), 3)
+    assert runs == [datetime.datetime(2024, 1, 5), datetime.datetime(2024, 1, 12), datetime.datetime(2024, 1, 13)]
+
+
+def test_cron_day_field_starting_with_a_star_narrows_the_other():
+    # Sundays on odd days of the month, not every Sunday plus every odd day
+    runs = next_runs('30 8 */2 * 0', datetime.datetime(2024, 1, 1), 3)
+    assert runs == [
+        datetime.datetime(2024, 1, 7, 8, 30), datetime.datetime(2024, 1, 21, 8, 30), datetime.datetime(2024, 2, 11, 8, 30)
+    ]
+    assert all(run.weekday() == 6 and run.day % 2 == 1 for run in runs)
+    # The first seven days of every month, */1 in day of week matches any day
+    runs = next_runs('0 9 1-7 * */1', datetime.datetime(2024, 1, 7, 9), 2)
+    assert runs == [datetime.datetime(2024, 2, 1, 9), datetime.datetime(2024, 2, 2, 9)]
+
+
+@pytest.mark.parametrize('expression', ['* * *', '60 * * * *', '0 24 * * *', '0 0 0 * *', '*/0 * * * *', '0 0 31 2 *'])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        next_runs(expression, datetime.datetime(2024, 1, 1), 1)
@@ -0,0 +1,70 @@
+import re
+import pandas as pd
+import pytest
+import rule_plan
+from rule_plan import ColumnValues, RulePlan
+from validation_errors import ErrorStore
+
+
+def failing_rows(rules, data):
+    plan = RulePlan(rules)
+    errors = ErrorStore(plan.rules, index=data.index)
+    plan.evaluate(data, errors)
+    return {name: [row for row in range(len(data)) if name in errors.rules_for_row(row)] for name, _ in plan.rules}
+
+
+def rule(name, check, **options):
+    return dict(rule=name, column='Grade', check=check, message="Record {row}: bad grade '{value}'", **options)
+
+
+def test_each_distinct_value_is_checked_once():
+    column = ColumnValues(pd.Series(['A', 'B+', 'A', None, 'B+', 'A']))
+    seen = []
+    results = column.map(lambda value: seen.append(value) or value == 'A')
+    assert seen == ['A', 'B+']
+    assert column.expand(results).tolist() == [True, False, True, False, True]
+    assert column.rows.tolist() == [0, 1, 2, 4, 5]
+
+
+def test_memo_keeps_results_across_chunks(monkeypatch):
+    seen = []
+    memo = {}
+    check = lambda value: seen.append(value) or False
+    ColumnValues(pd.Series(['A', 'B'])).map(check, memo)
+    ColumnValues(pd.Series(['B', 'C'])).map(check, memo)
+    assert seen == ['A', 'B', 'C']
+
+    # A full memo starts over rather than growing without bound
+    monkeypatch.setattr(rule_plan, 'MAX_MEMO_SIZE', 2)
+    ColumnValues(pd.Series(['A'])).map(check, memo)
+    assert seen == ['A', 'B', 'C', 'A'] and list(memo) == ['A']
+
+
+def test_string_checks_match_a_row_by_row_check():
+    grades = pd.Series(['A', ' B- ', 'b', 'AB', 7, None, 'A', ''] * 3, dtype=object)
+    data = pd.DataFrame({'Grade': grades})
+    rules = [
+        rule('grade_type', 'type', types=['str'], non_empty=True),
+        rule('grade_pattern', 'pattern', regex='[A-Z][+-]?', strip=True),
+        rule('grade_length', 'length', length=1),
+        rule('grade_enum', 'enum', values=['A', 'B']),
+        rule('grade_enum_ci', 'enum', values=['a', 'b'], case_insensitive=True),
+    ]
+    expected = {
+        'grade_type': lambda value: not (isinstance(value, str) and value.strip()),
+        'grade_pattern': lambda value: isinstance(value, str) and not re.fullmatch('[A-Z][+-]?', value.strip()),
+        'grade_length': lambda value: isinstance(value, str) and len(value) != 1,
+        'grade_enum': lambda value: value not in ('A', 'B'),
+        'grade_enum_ci': lambda value: str(value).strip().lower() not in ('a', 'b'),
+    }
+    actual = failing_rows(rules, data)
+    for name, fails in expected.items():
+        assert actual[name] == [row for row, value in enumerate(grades) if value is not None and fails(value)], name
+
+
+@pytest.mark.parametrize('dtype', [object, 'string'])
+def test_text_and_object_columns_give_the_same_errors(dtype):
+    data = pd.DataFrame({'Grade': pd.Series(['A', 'x', None, ' '], dtype=dtype)})
+    rules = [rule('grade_type', 'type', types=['str'], non_empty=True),
+             rule('grade_pattern', 'pattern', regex='[A-Z]')]
+    assert failing_rows(rules, data) == {'grade_type': [3], 'grade_pattern': [1, 3]}
@@ -0,0 +1,181 @@
+import numpy as np
+
+
+# ValidationError class
+# - One retained error sample, the message is only rendered when it is printed.
+class ValidationError:
+    __slots__ = ('store', 'row', 'rule_id', 'value_ref')
+
+    def __init__(self, store, row, rule_id, value_ref):
+        self.store = store
+        self.row = row
+        self.rule_id = rule_id
+        self.value_ref = value_ref
+
+    @property
+    def rule(self):
+        return self.store.rule_names[self.rule_id]
+
+    @property
+    def value(self):
+        return self.store.values[self.value_ref] if self.value_ref >= 0 else None
+
+    def render(self):
+        return self.store.render(self.row, self.rule_id, self.value_ref)
+
+    def __str__(self):
+        return self.render()
+
+    def __repr__(self):
+        return f"ValidationError(row={self.row}, rule='{self.rule}')"
+
+
+# ErrorStore class
+# - Keeps validation errors as compact columns: int32 row, uint8 rule id, int32 value reference.
+# - Every error is counted per rule, only the first max_samples in row order (file-level errors
+#   first, rule order within a row) are retained for rendering, whatever order the rules run in.
+# - Which rules fired on which row is kept in a packed bit matrix (one bit per rule per row),
+#   so memory is bounded by the row count and not by the error count.
+class ErrorStore:
+
+    max_rules = 256
+
+    def __init__(self, rules, index=None, max_samples=1000):
+        """rules is a list of (name, message template) pairs, the position is the rule id"""
+        if len(rules) > self.max_rules:
+            raise ValueError(f"At most {self.max_rules} rules are supported, got {len(rules)}")
+        self.rule_names = [name for name, _ in rules]
+        self.rule_templates = [template for _, template in rules]
+        self._rule_ids = {name: i for i, name in enumerate(self.rule_names)}
+
+        self.index = index
+        n_rows = len(index) if index is not None else 0
+        self.row_rules = np.zeros((n_rows, (len(rules) + 7) // 8), dtype=np.uint8)
+
+        self.counts = np.zeros(len(rules), dtype=np.int64)
+        self.max_samples = max_samples
+        self.sample_rows = np.empty(max_samples, dtype=np.int32)
+        self.sample_rules = np.empty(max_samples, dtype=np.uint8)
+        self.sample_values = np.empty(max_samples, dtype=np.int32)
+        self.n_samples = 0
+        self.values = []
+
+    def rule_id(self, rule):
+        return rule if isinstance(rule, (int, np.integer)) else self._rule_ids[rule]
+
+    def add(self, row, rule, value=None):
+        """Record a single error, row is a position (-1 for file-level errors)"""
+        rule_id = self.rule_id(rule)
+        self.counts[rule_id] += 1
+        if row >= 0 and len(self.row_rules):
+            self.row_rules[row, rule_id >> 3] |= np.uint8(1 << (rule_id & 7))
+        rows = np.array([row], dtype=np.int32)
+        if self.samples_wanted(rows, rule_id):
+            self._retain(rows, rule_id, None if value is None else [value])
+
+    def add_many(self, rows, rule, values=None):
+        """
+        Record the same rule failing on many rows (ascending) at once. values only needs to
+        cover the first samples_wanted(rows, rule) rows, the others can't be retained.
+        """
+        rows = np.asarray(rows, dtype=np.int32)
+        if len(rows) == 0:
+            return
+        rule_id = self.rule_id(rule)
+        self.counts[rule_id] += len(rows)
+        if len(self.row_rules):
+            self.row_rules[rows, rule_id >> 3] |= np.uint8(1 << (rule_id & 7))
+        wanted = self.samples_wanted(rows, rule_id)
+        if wanted:
+            self._retain(rows[:wanted], rule_id, None if values is None else values[:wanted])
+
+    def _keys(self, rows, rule_id):
+        # Row first, then rule: the order a row-by-row validation finds the errors in
+        return rows.astype(np.int64) * self.max_rules + rule_id
+
+    def _last_key(self):
+        return int(self.sample_rows[self.n_samples - 1]) * self.max_rules + int(self.sample_rules[self.n_samples - 1])
+
+    def samples_wanted(self, rows, rule):
+        """How many of rows (ascending) failing rule would be among the retained samples"""
+        wanted = min(len(rows), self.max_samples)
+        if not wanted or self.n_samples < self.max_samples:
+            return wanted
+        return min(wanted, int(np.searchsorted(self._keys(rows, self.rule_id(rule)), self._last_key())))
+
+    def _retain(self, rows, rule_id, values):
+        refs = np.full(len(rows), -1, dtype=np.int32)
+        if values is not None:
+            refs = np.arange(len(self.values), len(self.values) + len(rows), dtype=np.int32)
+            self.values.extend(values)
+        n = self.n_samples
+        new_keys = self._keys(rows, rule_id)
+        if n + len(rows) <= self.max_samples and (n == 0 or new_keys[0] > self._last_key()):
+            # Errors after every retained one (rules run chunk by chunk): append
+            self.sample_rows[n:n + len(rows)] = rows
+            self.sample_rules[n:n + len(rows)] = rule_id
+            self.sample_values[n:n + len(rows)] = refs
+            self.n_samples += len(rows)
+            return
+
+        # Merge with the retained samples and keep the first max_samples in row order
+        sample_rows = np.concatenate([self.sample_rows[:n], rows])
+        sample_rules = np.concatenate([self.sample_rules[:n], np.full(len(rows), rule_id, dtype=np.uint8)])
+        sample_values = np.concatenate([self.sample_values[:n], refs])
+        keep = np.argsort(self._keys(sample_rows, sample_rules), kind='stable')[:self.max_samples]
+        self.n_samples = len(keep)
+        self.sample_rows[:self.n_samples] = sample_rows[keep]
+        self.sample_rules[:self.n_samples] = sample_rules[keep]
+        # Values of dropped samples are released
+        kept_refs = sample_values[keep]
+        values = []
+        for i, ref in enumerate(kept_refs):
+            if ref >= 0:
+                values.append(self.values[ref])
+                kept_refs[i] = len(values) - 1
+        self.values = values
+        self.sample_values[:self.n_samples] = kept_refs
+
+    def render(self, row, rule_id, value_ref=-1):
+        label = self.index[row] if self.index is not None and row >= 0 else row
+        value = self.values[value_ref] if value_ref >= 0 else None
+        return self.rule_templates[rule_id].format(row=label, value=value)
+
+    def counts_by_rule(self):
+        """Error count per rule name, only rules that fired"""
+        return {self.rule_names[i]: int(c) for i, c in enumerate(self.counts) if c}
+
+    def invalid_mask(self, start=0, stop=None):
+        return self.row_rules[start:stop].any(axis=1)
+
+    def invalid_rows(self):
+        return np.flatnonzero(self.invalid_mask())
+
+    def rules_for_row(self, row):
+        bits = np.unpackbits(self.row_rules[row], bitorder='little')[:len(self.rule_names)]
+        return [self.rule_names[i] for i in np.flatnonzero(bits)]
+
+    def rule_codes(self, rows, sep=';'):
+        """Joined names of the rules that fired, one string per row"""
+        bits = np.unpackbits(self.row_rules[rows], axis=1, bitorder='little')[:, :len(self.rule_names)].astype(bool)
+        names = np.array(self.rule_names, dtype=object)
+        return [sep.join(names[row_bits]) for row_bits in bits]
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    def __bool__(self):
+        return bool(self.counts.any())
+
+    def __iter__(self):
+        for i in range(self.n_samples):
+            yield ValidationError(self, int(self.sample_rows[i]), int(self.sample_rules[i]), int(self.sample_values[i]))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(self.n_samples))]
+        if item < 0:
+            item += self.n_samples
+        if not 0 <= item < self.n_samples:
+            raise IndexError("Error sample index out of range")
+        return ValidationError(self, int(self.sample_rows[item]), int(self.sample_rules[item]), int(self.sample_values[item]))
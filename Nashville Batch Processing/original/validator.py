@@ -1,35 +1,39 @@
 
+import os
 import pandas as pd
-from datetime import datetime
-from reader import Reader
-import re
+from validation_errors import ErrorStore
+from rule_plan import load_rules, compile_plan, RuleStats, rule_report
+
+# The validation rules, as data, see rule_plan.py for the format
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'validation_rules.json')
 
 
 class Validator:
 
-    def __init__(self, data=None):
+    def __init__(self, data=None, max_error_samples=1000, error_budget=None, rules_path=None):
         self.data = data
+        self.max_error_samples = max_error_samples
+        self.error_budget = error_budget
         self.validation_results = {
             'valid_records': 0,
             'invalid_records': 0,
-            'validation_errors': []
+            'validation_errors': [],
+            'budget_exceeded': False,
+            'termination_reason': None
         }
-        
-        # Define non-mandatory columns that won't trigger errors when missing
-        self.non_mandatory_columns = [
-            'Suite/ Condo   #', 'Owner Name', 'Address', 'City', 'State', 
-            'Tax District', 'Foundation Type', 'Exterior Wall', 'Grade'
-        ]
 
-        # Define mandatory columns that will trigger errors when missing
-        self.mandatory_columns = [
-            'Parcel ID', 'Land Use', 'Property Address', 'Property City',
-            'Sale Date', 'Sale Price', 'Legal Reference',
-            'Sold As Vacant', 'Multiple Parcels Involved in Sale',
-            'Acreage', 'Neighborhood', 'Land Value',
-            'Building Value', 'Total Value', 'Finished Area',
-            'Year Built', 'Bedrooms', 'Full Bath', 'Half Bath'
-        ]
+        # Compiled once per set of rules and shared with every other Validator, so a
+        # Validator per file costs nothing; editing the rule file gives a new plan
+        self.plan = compile_plan(load_rules(rules_path or RULES_PATH))
+
+        # Error rules as (name, message template), the position in the list is the rule id
+        self.rules = self.plan.rules
+
+        # Columns with a mandatory rule, a record without a value in one of them is invalid
+        self.mandatory_columns = self.plan.columns_checked('not_null')
+
+        # Time spent and sample offending values per rule, for get_rule_report()
+        self.rule_stats = RuleStats()
     
     def validate_dataset(self):
         if self.data is None:
@@ -38,214 +42,50 @@ class Validator:
         self.validation_results = {
             'valid_records': 0,
             'invalid_records': 0,
-            'validation_errors': []
+            'validation_errors': [],
+            'budget_exceeded': False,
+            'termination_reason': None
         }
         
-        # Validate each record
-        for index, record in self.data.iterrows():
-            record_errors = self._validate_record(record, index)
-            
-            if record_errors:
-                self.validation_results['invalid_records'] += 1
-                self.validation_results['validation_errors'].extend(record_errors)
-            else:
-                self.validation_results['valid_records'] += 1
-        
-        return self
-    
-    def _validate_record(self, record, index):
-        errors = []
+        errors = ErrorStore(self.rules, index=self._row_labels(), max_samples=self.max_error_samples)
+        self.validation_results['validation_errors'] = errors
+        self.rule_stats = RuleStats()
 
-        # Check that mandatory columns have non-null and non-empty values
-        for col in self.mandatory_columns:
-            value = record.get(col)
-            if pd.isna(value) or (isinstance(value, str) and not value.strip()):
-                errors.append(f"Record {index}: Mandatory field '{col}' is missing or empty")
-        
-        # Non-mandatory field validations
-        
-        # Suite/Condo (non-mandatory)
-        if pd.notna(record.get('Suite/ Condo   #')):
-            if not isinstance(record['Suite/ Condo   #'], (str, int, float)):
-                errors.append(f"Record {index}: Suite/Condo should be string or numeric")
-        
-        # Validate Owner Name (non-mandatory)
-        if pd.notna(record.get('Owner Name')):
-            if not isinstance(record['Owner Name'], str):
-                errors.append(f"Record {index}: Owner Name should be a string")
-        
-        # Validate Address (non-mandatory)
-        if pd.notna(record.get('Address')):
-            if not isinstance(record['Address'], str):
-                errors.append(f"Record {index}: Address should be a string")
-        
-        # Validate City (non-mandatory)
-        if pd.notna(record.get('City')):
-            if not isinstance(record['City'], str):
-                errors.append(f"Record {index}: City should be a string")
-        
-        # Validate State (non-mandatory)
-        if pd.notna(record.get('State')):
-            if not isinstance(record['State'], str):
-                errors.append(f"Record {index}: State should be a string")
-            elif len(record['State']) != 2:  # 2-letter state codes
-                errors.append(f"Record {index}: State should be a 2-letter code")
-        
-        # Validate Tax District (non-mandatory)
-        if pd.notna(record.get('Tax District')):
-            if not isinstance(record['Tax District'], str):
-                errors.append(f"Record {index}: Tax District should be a string")
-        
-        # Validate Foundation Type (non-mandatory)
-        if pd.notna(record.get('Foundation Type')):
-            if not isinstance(record['Foundation Type'], str):
-                errors.append(f"Record {index}: Foundation Type should be a string")
-            # Check if the value is valid (case-insensitive)
-            elif not re.fullmatch(r'[A-Z ]+', record['Foundation Type'].strip()):
-                errors.append(f"Record {index}: Foundation Type '{record['Foundation Type']}' is invalid (must contain only uppercase letters and spaces)")
+        # Validate in chunks so the error budget can stop a hopeless file early
+        chunk_size = self.error_budget.chunk_size if self.error_budget is not None else max(len(self.data), 1)
+        rows_checked = 0
+        invalid_records = 0
+        for start in range(0, len(self.data), chunk_size):
+            chunk = self._chunk(start, start + chunk_size)
 
-        
-        # Validate Exterior Wall (non-mandatory)
-        if pd.notna(record.get('Exterior Wall')):
-            if not isinstance(record['Exterior Wall'], str):
-                errors.append(f"Record {index}: Exterior Wall should be a string")
-            # Check if the value is valid (case-insensitive)
-            elif not re.fullmatch(r'[A-Z/ ]+', record['Exterior Wall'].strip()):
-                errors.append(f"Record {index}: Exterior Wall '{record['Exterior Wall']}' is invalid (must contain only uppercase letters, spaces, or slashes)")
+            # Every rule over the whole chunk, one vectorized pass per column
+            self.plan.evaluate(chunk, errors, offset=start, stats=self.rule_stats)
 
-        
-        # Validate Grade (non-mandatory)
-        if pd.notna(record.get('Grade')):
-            if not isinstance(record['Grade'], str):
-                errors.append(f"Record {index}: Grade should be a string")
-            else:
-                # Handle grades with spaces (e.g., 'B   ')
-                grade_clean = record['Grade'].strip()
-                if not re.fullmatch(r'[A-Z][+-]?', grade_clean):
-                    errors.append(f"Record {index}: Grade '{record['Grade']}' is invalid (must be a single uppercase letter optionally followed by + or -)")
+            rows_checked = start + len(chunk)
+            invalid_records += int(errors.invalid_mask(start, rows_checked).sum())
 
-            
-        # Validate fields used in calculations (if present)
-        
-        # Sale Price and Finished Area for price per square foot calculation
-        if pd.notna(record.get('Sale Price')) and pd.notna(record.get('Finished Area')):
-            try:
-                float(record['Sale Price'])
-            except (ValueError, TypeError):
-                errors.append(f"Record {index}: Sale Price should be numeric")
-                
-            try:
-                float(record['Finished Area'])
-                if float(record['Finished Area']) == 0:
-                    errors.append(f"Record {index}: Finished Area cannot be zero (division by zero in price per sqft)")
-            except (ValueError, TypeError):
-                errors.append(f"Record {index}: Finished Area should be numeric")
-        
-        # Year Built for property age calculation
-        if pd.notna(record.get('Year Built')):
-            try:
-                year_built = float(record['Year Built'])
-                if year_built < 1700 or year_built > datetime.now().year:
-                    errors.append(f"Record {index}: Year Built ({year_built}) is outside reasonable range")
-            except (ValueError, TypeError):
-                errors.append(f"Record {index}: Year Built should be numeric")
-        
-        # Sale Date validation
-        if pd.notna(record.get('Sale Date')):
-            if isinstance(record['Sale Date'], str):
-                try:
-                    datetime.strptime(record['Sale Date'], '%Y-%m-%d')
-                except ValueError:
-                    errors.append(f"Record {index}: Sale Date should be in YYYY-MM-DD format")
-        
-        # Building Value for land-to-building ratio (avoid division by zero)
-        if pd.notna(record.get('Building Value')):
-            try:
-                building_value = float(record['Building Value'])
-                if building_value == 0:
-                    errors.append(f"Record {index}: Building Value is zero (potential division by zero in ratio)")
-            except (ValueError, TypeError):
-                errors.append(f"Record {index}: Building Value should be numeric")
-
-        # Validate Unnamed: 0
-        if pd.notna(record.get('Unnamed: 0')):
-            if not isinstance(record['Unnamed: 0'], (int, float)):
-                errors.append(f"Record {index}: Unnamed: 0 should be numeric")
-        
-        # Parcel ID
-        if pd.notna(record.get('Parcel ID')):
-            if not isinstance(record['Parcel ID'], str) or not record['Parcel ID'].strip():
-                errors.append(f"Record {index}: Parcel ID must be a non-empty string")
-
-        # Land Use
-        if pd.notna(record.get('Land Use')):
-            if not isinstance(record['Land Use'], str) or not record['Land Use'].strip():
-                errors.append(f"Record {index}: Land Use must be a non-empty string")
+            if self.error_budget is not None:
+                reason = self.error_budget.exceeded(rows_checked, invalid_records, len(errors))
+                if reason:
+                    self.validation_results['budget_exceeded'] = True
+                    self.validation_results['termination_reason'] = reason
+                    break
 
-        # Property Address
-        if pd.notna(record.get('Property Address')):
-            if not isinstance(record['Property Address'], str):
-                errors.append(f"Record {index}: Property Address should be a string")
-        
-        # Property City
-        if pd.notna(record.get('Property City')):
-            if not isinstance(record['Property City'], str):
-                errors.append(f"Record {index}: Property City should be a string")
-        
-        # Legal Reference
-        if pd.notna(record.get('Legal Reference')):
-            if not isinstance(record['Legal Reference'], str):
-                errors.append(f"Record {index}: Legal Reference should be a string")
-        
-        # Sold As Vacant
-        if pd.notna(record.get('Sold As Vacant')):
-            if record['Sold As Vacant'] not in ['Yes', 'No']:
-                errors.append(f"Record {index}: Sold As Vacant must be 'Yes' or 'No'")
+        self.validation_results['invalid_records'] = invalid_records
+        self.validation_results['valid_records'] = rows_checked - invalid_records
         
-        # Multiple Parcels Involved in Sale
-        if pd.notna(record.get('Multiple Parcels Involved in Sale')):
-            if record['Multiple Parcels Involved in Sale'] not in ['Yes', 'No']:
-                errors.append(f"Record {index}: Multiple Parcels must be 'Yes' or 'No'")
-
-        # Acreage
-        if pd.notna(record.get('Acreage')):
-            try:
-                if float(record['Acreage']) < 0:
-                    errors.append(f"Record {index}: Acreage cannot be negative")
-            except:
-                errors.append(f"Record {index}: Acreage should be numeric")
-        
-        # Neighborhood
-        if pd.notna(record.get('Neighborhood')):
-            if not isinstance(record['Neighborhood'], (int, float)):
-                errors.append(f"Record {index}: Neighborhood should be numeric")
-
-        # Image
-        if pd.notna(record.get('image')):
-            if not isinstance(record['image'], str):
-                errors.append(f"Record {index}: image should be a string")
-
-        # Land Value, Total Value
-        for field in ['Land Value', 'Total Value']:
-            if pd.notna(record.get(field)):
-                try:
-                    if float(record[field]) < 0:
-                        errors.append(f"Record {index}: {field} must be non-negative")
-                except:
-                    errors.append(f"Record {index}: {field} should be numeric")
+        return self
+    
+    def required_columns(self):
+        """Columns the Reader must load, every column with a rule is validated"""
+        return list(self.plan.columns)
 
-        # Bedrooms, Full Bath, Half Bath
-        for field in ['Bedrooms', 'Full Bath', 'Half Bath']:
-            if pd.notna(record.get(field)):
-                try:
-                    val = float(record[field])
-                    if val < 0 or not val.is_integer():
-                        errors.append(f"Record {index}: {field} must be a non-negative integer")
-                except:
-                    errors.append(f"Record {index}: {field} should be numeric")
+    def _row_labels(self):
+        return self.data.index
 
-                
-        return errors
+    def _chunk(self, start, stop):
+        """Rows start to stop of the data, as a pandas DataFrame"""
+        return self.data.iloc[start:stop]
 
     def get_validation_results(self):
         return self.validation_results
@@ -256,15 +96,45 @@ class Validator:
             'valid_records': self.validation_results['valid_records'],
             'invalid_records': self.validation_results['invalid_records'],
             'error_count': len(self.validation_results['validation_errors']),
+            'budget_exceeded': self.validation_results['budget_exceeded'],
         }
-    
-    def get_validated_data(self):
 
+    def get_rule_report(self):
+        """Hits, share of rows, time spent and sample values of every rule, as a JSON-ready dict"""
+        results = self.validation_results
+        rows_checked = results['valid_records'] + results['invalid_records']
+        report = rule_report(results['validation_errors'], rows_checked, self.rule_stats, self.plan)
+        report['budget_exceeded'] = results['budget_exceeded']
+        return report
+    
+    def get_validated_data(self, filter_invalid=False):
+        """
+        Return the validated data
+        If filter_invalid is True, rows with validation errors are removed
+        """
+        errors = self.validation_results['validation_errors']
+        if filter_invalid and errors:
+            valid_mask = ~errors.invalid_mask()
+            return self.data[valid_mask].copy().reset_index(drop=True)
         return self.data
 
+    def get_rejected_data(self):
+        """
+        Return the rows that failed validation, with a 'rule_codes' column
+        listing the rules each row failed
+        """
+        errors = self.validation_results['validation_errors']
+        if not errors:
+            return self.data.iloc[0:0].assign(rule_codes=pd.Series(dtype=object))
+        rows = errors.invalid_rows()
+        rejected = self.data.iloc[rows].copy()
+        rejected['rule_codes'] = errors.rule_codes(rows)
+        return rejected.reset_index(drop=True)
+
 
 # Example usage
 if __name__ == "__main__":
+    from reader import Reader
     # Example usage with reader
     reader = Reader()
     data = reader.load_data()
@@ -285,6 +155,9 @@ if __name__ == "__main__":
             print(error)
         if len(errors) > 10:
             print(f"...and {len(errors) - 10} more errors")
+        print("\nErrors by rule:")
+        for rule, count in errors.counts_by_rule().items():
+            print(f"{rule}: {count}")
     
     # Get validated data for processing
     validated_data = validator.get_validated_data()
\ No newline at end of file
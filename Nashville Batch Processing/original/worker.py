@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import datetime
+import traceback
+
+# pandas, numpy and the pipeline stages are imported once, when the worker starts
+from main import run_pipeline, PIPELINES, CONNECTION_STRING, CONTAINER_NAME
+
+
+# Worker class
+# - Long-lived process that keeps pandas, numpy and the Azure client loaded between runs,
+#   so a job only pays for its own compute.
+# - Jobs are JSON files dropped in <queue_dir>/incoming, e.g.
+#   {"file_path": "input/Nashville_housing_data_2013_2016.csv", "pipeline": "validate"}
+#   file_path may also be a directory or glob pattern of files to run as one batch.
+# - A job is claimed by renaming it into running/, its result ends up in done/ or failed/.
+class Worker:
+    def __init__(self, queue_dir=None, poll_interval=1.0):
+        if queue_dir is None:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            queue_dir = os.path.join(script_dir, "jobs")
+        self.queue_dir = queue_dir
+        self.poll_interval = poll_interval
+        self.writer = None
+
+        for folder in ("incoming", "running", "done", "failed"):
+            os.makedirs(os.path.join(queue_dir, folder), exist_ok=True)
+
+    def get_writer(self):
+        # The blob client is created on the first 'full' job and kept warm afterwards
+        if self.writer is None:
+            from writer import Writer
+            self.writer = Writer(CONNECTION_STRING, CONTAINER_NAME)
+        return self.writer
+
+    def claim_next_job(self):
+        """Move the oldest incoming job to running/ and return its path, None when idle"""
+        incoming = os.path.join(self.queue_dir, "incoming")
+        jobs = sorted(
+            (entry for entry in os.scandir(incoming) if entry.is_file() and entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for job in jobs:
+            running_path = os.path.join(self.queue_dir, "running", job.name)
+            try:
+                # Rename is atomic, so two workers on the same folder never run the same job
+                os.rename(job.path, running_path)
+                return running_path
+            except FileNotFoundError:
+                continue
+        return None
+
+    def run_job(self, job_path):
+        started = time.perf_counter()
+        result = {'job': os.path.basename(job_path), 'started_at': datetime.datetime.now().isoformat(timespec='seconds')}
+        try:
+            with open(job_path) as job_file:
+                job = json.load(job_file)
+            pipeline = job.get('pipeline', 'full')
+            writer = self.get_writer() if pipeline == 'full' else None
+            result['summary'] = run_pipeline(job.get('file_path'), pipeline, writer=writer, engine=job.get('engine'))
+            result['status'] = 'done'
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+            result['traceback'] = traceback.format_exc()
+        result['seconds'] = round(time.perf_counter() - started, 3)
+
+        target_dir = os.path.join(self.queue_dir, result['status'])
+        result_path = os.path.join(target_dir, os.path.splitext(result['job'])[0] + ".result.json")
+        with open(result_path, "w") as result_file:
+            json.dump(result, result_file, indent=2, default=str)
+        os.replace(job_path, os.path.join(target_dir, result['job']))
+        print(f"Job {result['job']} {result['status']} in {result['seconds']}s")
+        return result
+
+    def serve_forever(self):
+        print(f"Worker ready, waiting for jobs in {os.path.join(self.queue_dir, 'incoming')}")
+        try:
+            while True:
+                job_path = self.claim_next_job()
+                if job_path is None:
+                    time.sleep(self.poll_interval)
+                    continue
+                self.run_job(job_path)
+        except KeyboardInterrupt:
+            print("Worker stopped by user")
+
+
+def submit_job(file_path=None, pipeline='full', queue_dir=None, engine=None):
+    """Drop a job in the queue folder of a running worker, returns the job file path"""
+    if pipeline not in PIPELINES:
+        raise ValueError(f"Unknown pipeline '{pipeline}', expected one of {PIPELINES}")
+    if queue_dir is None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        queue_dir = os.path.join(script_dir, "jobs")
+    incoming = os.path.join(queue_dir, "incoming")
+    os.makedirs(incoming, exist_ok=True)
+
+    job_name = f"job_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+    tmp_path = os.path.join(queue_dir, "." + job_name)
+    with open(tmp_path, "w") as job_file:
+        json.dump({'file_path': file_path, 'pipeline': pipeline, 'engine': engine}, job_file)
+    # Write outside incoming/ and rename, so the worker never sees a half-written job
+    job_path = os.path.join(incoming, job_name)
+    os.replace(tmp_path, job_path)
+    return job_path
+
+
+if __name__ == "__main__":
+    # python worker.py                      -> run the worker
+    # python worker.py submit <file> [name] -> queue a job for a running worker
+    if len(sys.argv) > 1 and sys.argv[1] == "submit":
+        file_path = sys.argv[2] if len(sys.argv) > 2 else None
+        pipeline = sys.argv[3] if len(sys.argv) > 3 else 'full'
+        print(f"Queued {submit_job(file_path, pipeline)}")
+    else:
+        Worker().serve_forever()
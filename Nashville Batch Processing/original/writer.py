@@ -1,27 +1,95 @@
 # Added the imports
-from azure.storage.blob import BlobServiceClient
+import os
+import shutil
 import pandas as pd
-from processor import Processor
+from storage import get_storage
 
 # Writer class
 # - Writes to the local /output folder.
-# - Writes to Azure Blog Storage.
+# - Writes to Azure Blog Storage, or to the backend chosen with STORAGE_BACKEND (see storage.py).
+# - A partitioned output is a folder with one file per value of a column (Hive-style names).
 class Writer:
-    def __init__(self, connection_string, container_name):
+    def __init__(self, connection_string, container_name, storage=None):
         self.connection_string = connection_string
         self.container_name = container_name
-        self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
+        self.storage = storage or get_storage(connection_string, container_name)
 
-    def write(self, df: pd.DataFrame, filename, output_path):     
-        df.to_csv(output_path, index=False)
+    def write(self, df: pd.DataFrame, filename, output_path, rollups=None, partition_by=None):
+        if partition_by is None:
+            self._save_atomic(df, output_path)
 
-        # Upload to Azure Blob Storage
-        blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=filename)
-        with open(output_path, "rb") as data_file:
-            blob_client.upload_blob(data_file, overwrite=True)
-        print(f"☁️ Uploaded to Azure Blob Storage: {self.container_name}/{filename}")
+            # Upload to the storage backend
+            self.storage.upload(output_path, filename, overwrite=True)
+            print(f"☁️ Uploaded to {self.storage}: {self.container_name}/{filename}")
+        else:
+            self.write_partitions(df, filename, output_path, partition_by)
+
+        # Rollup tables next to the output: <output name>_<rollup name>.csv
+        output_base, output_ext = os.path.splitext(output_path)
+        filename_base, filename_ext = os.path.splitext(filename)
+        for name, table in (rollups or {}).items():
+            rollup_path = f"{output_base}_{name}{output_ext}"
+            rollup_filename = f"{filename_base}_{name}{filename_ext}"
+            self._save_atomic(table, rollup_path)
+            self.storage.upload(rollup_path, rollup_filename, overwrite=True)
+            print(f"☁️ Uploaded to {self.storage}: {self.container_name}/{rollup_filename}")
+
+    def write_partitions(self, df: pd.DataFrame, filename, output_path, partition_by):
+        """
+        One file per value of partition_by, e.g. output/processed_nashville_housing/Sale Year=2013/part-0.csv,
+        uploaded under the same relative name. Partitions of an earlier run that this one
+        doesn't have are removed, locally and from the storage backend. Returns the local paths.
+        """
+        output_dir, output_ext = os.path.splitext(output_path)
+        blob_dir = os.path.splitext(filename)[0]
+
+        # The partitions go into a fresh directory that then replaces the old one whole
+        staging_dir = f"{output_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        partitions = []
+        for value, part in df.groupby(partition_by, dropna=False, sort=True, observed=True):
+            # Rows without a value go to the partition Hive uses for them
+            partition = f"{partition_by}={'__HIVE_DEFAULT_PARTITION__' if pd.isna(value) else value}"
+            os.makedirs(os.path.join(staging_dir, partition))
+            part.to_csv(os.path.join(staging_dir, partition, f"part-0{output_ext}"), index=False)
+            partitions.append(partition)
+        self._replace_dir(staging_dir, output_dir)
+
+        paths = []
+        blob_names = set()
+        for partition in partitions:
+            path = os.path.join(output_dir, partition, f"part-0{output_ext}")
+            blob_name = f"{blob_dir}/{partition}/part-0{output_ext}"
+            self.storage.upload(path, blob_name, overwrite=True)
+            print(f"☁️ Uploaded to {self.storage}: {self.container_name}/{blob_name}")
+            paths.append(path)
+            blob_names.add(blob_name)
+
+        # Only once the new partitions are all up, so the output is never missing one
+        for blob_name in self.storage.list_blobs(f"{blob_dir}/"):
+            if blob_name not in blob_names:
+                self.storage.delete(blob_name)
+                print(f"Removed stale partition from {self.storage}: {self.container_name}/{blob_name}")
+        return paths
+
+    @staticmethod
+    def _replace_dir(new_dir, target_dir):
+        # Two renames, the old directory is only deleted once the new one is in place
+        old_dir = f"{target_dir}.{os.getpid()}.old"
+        if os.path.exists(target_dir):
+            os.replace(target_dir, old_dir)
+        os.replace(new_dir, target_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @staticmethod
+    def _save_atomic(df: pd.DataFrame, path):
+        # Save to a temp file and rename, readers never see a half-written output
+        tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
 
 if __name__ == "__main__":
+    from processor import Processor
     processor = Processor()
     processed_data = processor.process().get_processed_data()
     
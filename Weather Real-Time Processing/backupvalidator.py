@@ -1,7 +1,6 @@
 import pandas as pd
 import numpy as np
 import re
-from processor import Processor
 
 
 class BackupValidator:
@@ -124,6 +123,7 @@ class BackupValidator:
 
 
 if __name__ == "__main__":
+    from processor import Processor
     processor = Processor(proceed_with_errors=True)
     processor.process()
     processed_data = processor.get_processed_data()
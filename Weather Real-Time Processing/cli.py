@@ -0,0 +1,161 @@
+import os
+import sys
+import argparse
+
+
+# Command line entry point for the real-time pipeline.
+# Every subcommand imports only the stages it runs, so reading or validating a file
+# never loads the Azure SDK or watchdog:
+#   python cli.py read [file] [--engine polars]
+#   python cli.py validate [file] [--report-dir reports]
+#   python cli.py process [file]
+#   python cli.py run [file]
+#   python cli.py watch
+#   python cli.py serve [--port 8080]
+#   python cli.py nearby <lat> <lon> [--km 50]
+#   python cli.py profile
+# Without a file the most recent file in input/ is used. watch and serve parse with the
+# engine set in WEATHER_ENGINE.
+
+def default_input_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, "input")
+
+
+def resolve_file(file_path):
+    from reader import Reader
+    return file_path or Reader.find_last_file()
+
+
+def cmd_read(args):
+    from reader import get_reader
+    file_path = resolve_file(args.file)
+    data = get_reader(args.engine)(file_path).load_data() if file_path else None
+    if data is None:
+        print("Failed to load data.")
+        return 1
+    print(f"Data shape: {data.shape}")
+    print(f"Columns: {list(data.columns)}")
+    print("\nFirst 5 rows:")
+    print(data.head())
+    return 0
+
+
+def cmd_validate(args):
+    from reader import get_reader
+    from validator import Validator
+    file_path = resolve_file(args.file)
+    data = get_reader(args.engine)(file_path).load_data() if file_path else None
+    if data is None:
+        print("No data to validate.")
+        return 1
+    validator = Validator(data)
+    errors = validator.validate()
+    print("Validation Summary:")
+    for key, value in validator.summary().items():
+        print(f"{key}: {value}")
+    if errors:
+        print("\nSample validation errors (first 10):")
+        for error in errors[:10]:
+            print(error)
+        print("\nErrors by rule:")
+        for rule, count in errors.counts_by_rule().items():
+            print(f"{rule}: {count}")
+    if args.report_dir:
+        from rule_plan import write_rule_report
+        print(f"\nRule report: {write_rule_report(validator.get_rule_report(), file_path, args.report_dir)}")
+    return 0
+
+
+def cmd_process(args):
+    from main import process_file
+    file_path = resolve_file(args.file)
+    if not file_path:
+        return 1
+    result = process_file(file_path, engine=args.engine)
+    return 0 if result is not None else 1
+
+
+def cmd_run(args):
+    from main import main
+    main(args.file, args.engine)
+    return 0
+
+
+def cmd_watch(args):
+    from file_watcher import start_monitoring
+    start_monitoring(args.input_dir, read_workers=args.read_workers,
+                     process_workers=args.process_workers, upload_workers=args.upload_workers)
+    return 0
+
+
+def cmd_serve(args):
+    import asyncio
+    from service import IngestionService
+    asyncio.run(IngestionService(args.input_dir, workers=args.workers, metrics_port=args.port).run())
+    return 0
+
+
+def cmd_nearby(args):
+    import json
+    from spatial_index import SpatialIndex
+    records = SpatialIndex().nearby(args.lat, args.lon, args.km, limit=args.limit)
+    print(json.dumps(records, indent=2))
+    return 0
+
+
+def cmd_profile(args):
+    import json
+    from data_profile import DataProfile
+    print(json.dumps(DataProfile().summary(), indent=2))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Weather real-time processing pipeline")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    for name, handler, help_text in [
+        ("read", cmd_read, "read a file and show its shape"),
+        ("validate", cmd_validate, "validate a file"),
+        ("process", cmd_process, "read, validate and process a file without writing"),
+        ("run", cmd_run, "run the full pipeline on a file, including the upload"),
+    ]:
+        command = subcommands.add_parser(name, help=help_text)
+        command.add_argument("file", nargs="?", help="input file, defaults to the most recent file in input/")
+        command.set_defaults(handler=handler)
+        command.add_argument("--engine", choices=("pandas", "polars"), default=None,
+                             help="engine that parses the file, defaults to WEATHER_ENGINE or pandas")
+        if name == "validate":
+            command.add_argument("--report-dir", default=None,
+                                 help="write the per-rule JSON report (hits, time, sample values) to this folder")
+
+    watch = subcommands.add_parser("watch", help="watch the input folder with the staged pipeline")
+    watch.add_argument("--input-dir", default=default_input_dir())
+    watch.add_argument("--read-workers", type=int, default=2)
+    watch.add_argument("--process-workers", type=int, default=1)
+    watch.add_argument("--upload-workers", type=int, default=2)
+    watch.set_defaults(handler=cmd_watch)
+
+    serve = subcommands.add_parser("serve", help="run the asyncio ingestion service")
+    serve.add_argument("--input-dir", default=default_input_dir())
+    serve.add_argument("--workers", type=int, default=2)
+    serve.add_argument("--port", type=int, default=8080)
+    serve.set_defaults(handler=cmd_serve)
+
+    nearby = subcommands.add_parser("nearby", help="latest observations within a radius, from the spatial index")
+    nearby.add_argument("lat", type=float)
+    nearby.add_argument("lon", type=float)
+    nearby.add_argument("--km", type=float, default=50)
+    nearby.add_argument("--limit", type=int, default=None)
+    nearby.set_defaults(handler=cmd_nearby)
+
+    profile = subcommands.add_parser("profile", help="running profile of the data seen so far")
+    profile.set_defaults(handler=cmd_profile)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.handler(args))
@@ -0,0 +1,331 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+
+def _bit_length(words):
+    """Exact number of significant bits of every uint64 in words"""
+    words = words.copy()
+    lengths = np.zeros(len(words), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = words >= np.uint64(1 << shift)
+        lengths[big] += shift
+        words[big] >>= np.uint64(shift)
+    return lengths + (words > 0)
+
+
+# HyperLogLog class
+# - Approximate distinct count in 2**precision one-byte registers (4 KB by default,
+#   about 1.6% standard error), whatever the number of values.
+# - merge() is a register-wise max, so sketches built on different workers or files
+#   combine into the sketch of all their values.
+class HyperLogLog:
+    def __init__(self, precision=12, registers=None):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    def add(self, values):
+        values = pd.Series(values).dropna()
+        if values.empty:
+            return self
+        # Same hash for the same value in every process and file: numbers as floats
+        # (5 and 5.0 are one value), anything else by its text
+        values = values.astype(np.float64) if values.dtype.kind in 'biuf' else values.astype(str)
+        hashes = pd.util.hash_array(values.to_numpy(), categorize=False)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # Position of the first 1 bit in the remaining 64 - precision bits
+        ranks = (64 - self.precision - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, ranks)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Few values: linear counting is more accurate
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+# QuantileSketch class
+# - KLL sketch: levels of sorted compactors, an item on level h stands for 2**h values.
+#   A full level sorts itself and promotes every other item (random offset) to the next
+#   level, so memory stays around 3 * k items and the rank error around 1.7 / k.
+# - merge() concatenates the levels and compacts again, the result is a sketch of the
+#   values of both sides.
+class QuantileSketch:
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(8, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.n += len(values)
+            self._compact()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compact()
+        return self
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays on this level
+                kept, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+                promoted = items[self.rng.integers(2)::2]
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # A new top level lowers the capacity of every level below it
+                level = 0 if level + 2 == len(self.levels) else level + 1
+            else:
+                level += 1
+
+    def quantiles(self, qs):
+        """Approximate values at the quantiles qs (0 to 1), NaN when empty"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.n:
+            return np.full(len(qs), np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        return items[order][np.clip(positions, 0, len(items) - 1)]
+
+
+# ColumnProfile class
+# - Row and null counts, exact min, max, mean and variance (merged with Chan's formula),
+#   a QuantileSketch for numeric columns and a HyperLogLog for every column.
+class ColumnProfile:
+    def __init__(self, numeric, k=200, precision=12):
+        self.numeric = numeric
+        self.rows = 0
+        self.nulls = 0
+        self.count = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.distinct = HyperLogLog(precision)
+        self.sketch = QuantileSketch(k) if numeric else None
+
+    @classmethod
+    def of(cls, series, k=200, precision=12):
+        numeric = pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+        column = cls(numeric, k, precision)
+        column.rows = len(series)
+        column.nulls = int(series.isna().sum())
+        column.distinct.add(series)
+        if numeric:
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[np.isfinite(values)]
+            if len(values):
+                column.count = len(values)
+                column.minimum, column.maximum = float(values.min()), float(values.max())
+                column.mean = float(values.mean())
+                column.m2 = float(((values - column.mean) ** 2).sum())
+            column.sketch.add(values)
+        return column
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.distinct.merge(other.distinct)
+        if self.numeric and other.numeric and other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.count = count
+            self.minimum = min(self.minimum, other.minimum)
+            self.maximum = max(self.maximum, other.maximum)
+            self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def null_rate(self):
+        return self.nulls / self.rows if self.rows else 0.0
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+    def summary(self, qs=(0.01, 0.25, 0.5, 0.75, 0.99)):
+        summary = {'rows': self.rows, 'null_rate': round(self.null_rate, 4), 'distinct': self.distinct.estimate()}
+        if self.numeric and self.count:
+            quantiles = self.sketch.quantiles(qs)
+            summary.update({
+                'min': self.minimum, 'max': self.maximum, 'mean': self.mean, 'std': self.std,
+                'quantiles': {f"p{round(q * 100):02d}": float(value) for q, value in zip(qs, quantiles)}
+            })
+        return summary
+
+
+def profile_frame(df: pd.DataFrame, k=200, precision=12):
+    """ColumnProfile of every column of df"""
+    return {col: ColumnProfile.of(df[col], k, precision) for col in df.columns}
+
+
+# DataProfile class
+# - Running profile of every file seen, built from the ColumnProfiles of each file:
+#   no raw rows are kept and nothing is ever re-scanned.
+# - update() profiles a file without the lock (read workers run it in parallel), compares
+#   the drift_columns of the file with the running profile, then merges it in.
+# - Persisted to state/data_profile.npz, so the profile survives restarts.
+class DataProfile:
+
+    drift_columns = ['temperature_celsius', 'pressure_mb', 'air_quality_PM2.5']
+    # A file drifts when its mean is more than this many running standard deviations away, ...
+    max_mean_shift = 1.0
+    # ... a decile or the median moved by more than this many running interquartile ranges, ...
+    max_quantile_shift = 0.5
+    # ... or its null rate is this much higher than the running one
+    max_null_rate_increase = 0.2
+    # Values the running profile needs before a column is checked for drift
+    min_history = 1000
+
+    def __init__(self, store_path=None, drift_columns=None, k=200, precision=12):
+        if store_path is None:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            store_path = os.path.join(script_dir, "state", "data_profile.npz")
+        self.store_path = store_path
+        if drift_columns is not None:
+            self.drift_columns = list(drift_columns)
+        self.k = k
+        self.precision = precision
+        self.columns = {}
+        self.files = 0
+        # update() may be called from several worker threads
+        self.lock = threading.Lock()
+        self._load()
+
+    def update(self, df: pd.DataFrame, source=None):
+        """Merge the profile of df in, returns the drift found in it (see drift())"""
+        file_profile = profile_frame(df, self.k, self.precision)
+        with self.lock:
+            drift = self.drift(file_profile)
+            self.merge(file_profile)
+        for col, report in drift.items():
+            if report['drifted']:
+                print(f"Drift in {col}{f' ({source})' if source else ''}: mean shift {report['mean_shift']}, "
+                      f"quantile shift {report['quantile_shift']}, null rate {report['null_rate']}")
+        self.save()
+        return drift
+
+    def merge(self, columns):
+        """Merge a profile_frame() (or another DataProfile's columns) into this one"""
+        for col, column in columns.items():
+            if col in self.columns and self.columns[col].numeric == column.numeric:
+                self.columns[col].merge(column)
+            elif col not in self.columns:
+                self.columns[col] = column
+        self.files += 1
+        return self
+
+    def drift(self, file_profile):
+        """
+        Per drift column present in file_profile: the shift of its mean (in running standard
+        deviations), the largest shift of its deciles and median (in running interquartile
+        ranges), its null rate next to the running one and whether any passes its limit
+        """
+        drift = {}
+        for col in self.drift_columns:
+            new, running = file_profile.get(col), self.columns.get(col)
+            if new is None or running is None or not new.numeric or not running.numeric \
+                    or running.count < self.min_history or not new.count:
+                continue
+            mean_shift = (new.mean - running.mean) / running.std if running.std else 0.0
+            qs = (0.1, 0.5, 0.9)
+            low, high = running.sketch.quantiles((0.25, 0.75))
+            spread = (high - low) or running.std
+            shifts = np.abs(new.sketch.quantiles(qs) - running.sketch.quantiles(qs))
+            quantile_shift = float(shifts.max() / spread) if spread else 0.0
+            drift[col] = {
+                'mean_shift': round(float(mean_shift), 3),
+                'quantile_shift': round(quantile_shift, 3),
+                'null_rate': round(new.null_rate, 4),
+                'running_null_rate': round(running.null_rate, 4),
+                'drifted': bool(abs(mean_shift) > self.max_mean_shift or quantile_shift > self.max_quantile_shift
+                                or new.null_rate - running.null_rate > self.max_null_rate_increase)
+            }
+        return drift
+
+    def summary(self):
+        with self.lock:
+            return {'files': self.files, 'columns': {col: column.summary() for col, column in self.columns.items()}}
+
+    def _load(self):
+        if not os.path.exists(self.store_path):
+            return
+        try:
+            with np.load(self.store_path) as stored:
+                if int(stored['k']) != self.k or int(stored['precision']) != self.precision:
+                    print("Profile sketch settings changed, starting from an empty profile")
+                    return
+                columns = {}
+                for i, col in enumerate(stored['columns']):
+                    numeric, rows, nulls, count, minimum, maximum, mean, m2 = stored[f'{i}_stats']
+                    column = ColumnProfile(bool(numeric), self.k, self.precision)
+                    column.rows, column.nulls, column.count = int(rows), int(nulls), int(count)
+                    column.minimum, column.maximum, column.mean, column.m2 = minimum, maximum, mean, m2
+                    column.distinct.registers = stored[f'{i}_registers'].copy()
+                    if column.numeric:
+                        items, sizes = stored[f'{i}_items'], stored[f'{i}_sizes']
+                        column.sketch.levels = list(np.split(items, np.cumsum(sizes)[:-1]))
+                        column.sketch.n = column.count
+                    columns[str(col)] = column
+                self.columns = columns
+                self.files = int(stored['files'])
+        except Exception as e:
+            print(f"Could not load profile {self.store_path}: {str(e)}")
+            self.columns = {}
+            self.files = 0
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        with self.lock:
+            arrays = {'columns': np.array(list(self.columns), dtype=str), 'files': self.files,
+                      'k': self.k, 'precision': self.precision}
+            for i, column in enumerate(self.columns.values()):
+                arrays[f'{i}_stats'] = np.array([
+                    column.numeric, column.rows, column.nulls, column.count,
+                    column.minimum, column.maximum, column.mean, column.m2
+                ], dtype=np.float64)
+                arrays[f'{i}_registers'] = column.distinct.registers
+                if column.numeric:
+                    arrays[f'{i}_items'] = np.concatenate(column.sketch.levels)
+                    arrays[f'{i}_sizes'] = np.array([len(level) for level in column.sketch.levels])
+            tmp_path = self.store_path + ".tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, self.store_path)
+
+    def __len__(self):
+        return len(self.columns)
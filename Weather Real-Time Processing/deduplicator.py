@@ -0,0 +1,200 @@
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+NO_KEYS = np.empty(0, dtype=np.uint64)
+
+
+# BloomFilter class
+# - Fixed-size bit array in front of the seen-key store.
+# - A negative answer means "definitely never seen", so most new keys skip the store lookup.
+class BloomFilter:
+    def __init__(self, capacity=1_000_000, error_rate=0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.added = 0
+
+    def _positions(self, hashes):
+        """Bit positions for each hash (double hashing on the two 32-bit halves)"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add(self, hashes):
+        positions = self._positions(hashes).ravel()
+        masks = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), masks)
+        self.added += len(hashes)
+
+    def might_contain(self, hashes):
+        positions = self._positions(hashes)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    def clear(self):
+        self.bits[:] = 0
+        self.added = 0
+
+
+# Deduplicator class
+# - Hashes the location/date key of every record with pd.util.hash_pandas_object.
+# - Remembers seen keys in a bounded store with TTL eviction, persisted between runs.
+# - Drops records whose key was already seen in this file or in an earlier file.
+# - Keys are only remembered once the file was written (commit), so a failed write or
+#   upload can be retried without its records being taken for duplicates.
+class Deduplicator:
+
+    location_fields = ['location_name', 'country', 'latitude', 'longitude']
+    date_fields = ['last_updated', 'date']
+
+    def __init__(self, store_path=None, max_entries=500_000, ttl_seconds=48 * 3600, use_bloom=True):
+        if store_path is None:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            store_path = os.path.join(script_dir, "state", "dedup_store.npz")
+        self.store_path = store_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # Key hash -> time it was first seen, oldest first
+        self.seen = OrderedDict()
+        # Keys handed out by filter() that are not committed or released yet
+        self.pending = set()
+        self.bloom = BloomFilter(capacity=max_entries) if use_bloom else None
+        # filter() and commit() may be called from several worker threads
+        self.lock = threading.Lock()
+
+        self._load()
+
+    def key_columns(self, df):
+        """Location and date columns available in the data"""
+        location_cols = [col for col in self.location_fields if col in df.columns]
+        date_cols = [col for col in self.date_fields if col in df.columns]
+        if not location_cols or not date_cols:
+            return []
+        return location_cols + date_cols
+
+    def hash_keys(self, df, key_cols):
+        return pd.util.hash_pandas_object(df[key_cols], index=False).to_numpy(dtype=np.uint64)
+
+    def filter(self, df):
+        """
+        Keep mask for df, False for records whose key was already seen, and the key hashes
+        of the kept records. The kept keys are only reserved: commit(hashes) remembers them
+        once the records were written, release(hashes) gives them back after a failure.
+        """
+        key_cols = self.key_columns(df)
+        if not key_cols or df.empty:
+            return np.ones(len(df), dtype=bool), NO_KEYS
+
+        with self.lock:
+            return self._filter(df, key_cols)
+
+    def _filter(self, df, key_cols):
+        self._evict()
+
+        hashes = self.hash_keys(df, key_cols)
+
+        # Duplicates within this file
+        keep = ~pd.Series(hashes).duplicated(keep='first').to_numpy()
+
+        # Duplicates from earlier files, only the bloom positives need a store lookup
+        candidates = keep.copy()
+        if self.bloom is not None:
+            candidates &= self.bloom.might_contain(hashes)
+        for i in np.flatnonzero(candidates):
+            if int(hashes[i]) in self.seen:
+                keep[i] = False
+
+        # Keys of files still being written count as seen, so two files in flight
+        # don't both keep the same record
+        if self.pending:
+            reserved = np.fromiter(self.pending, dtype=np.uint64, count=len(self.pending))
+            keep &= ~np.isin(hashes, reserved)
+
+        new_hashes = hashes[keep]
+        self.pending.update(new_hashes.tolist())
+        return keep, new_hashes
+
+    def commit(self, hashes):
+        """Remember the keys filter() returned, once their records were written"""
+        if len(hashes) == 0:
+            return
+        with self.lock:
+            now = time.time()
+            for h in hashes.tolist():
+                self.pending.discard(h)
+                self.seen.setdefault(h, now)
+            if self.bloom is not None:
+                self.bloom.add(hashes)
+            self._enforce_size()
+            self.save()
+
+    def release(self, hashes):
+        """Forget the keys filter() reserved, their records were not written"""
+        with self.lock:
+            self.pending.difference_update(hashes.tolist())
+
+    def _evict(self):
+        """Drop keys older than the TTL (the store is kept in first-seen order)"""
+        cutoff = time.time() - self.ttl_seconds
+        evicted = 0
+        while self.seen:
+            oldest_key = next(iter(self.seen))
+            if self.seen[oldest_key] >= cutoff:
+                break
+            self.seen.popitem(last=False)
+            evicted += 1
+        if evicted:
+            self._maybe_rebuild_bloom()
+
+    def _enforce_size(self):
+        evicted = 0
+        while len(self.seen) > self.max_entries:
+            self.seen.popitem(last=False)
+            evicted += 1
+        if evicted:
+            self._maybe_rebuild_bloom()
+
+    def _maybe_rebuild_bloom(self):
+        # Evicted keys stay set in the bloom filter, rebuild once it has absorbed
+        # more keys than it was sized for so the false positive rate stays low
+        if self.bloom is not None and self.bloom.added > self.bloom.capacity:
+            self.bloom.clear()
+            if self.seen:
+                self.bloom.add(np.fromiter(self.seen.keys(), dtype=np.uint64, count=len(self.seen)))
+
+    def _load(self):
+        if not os.path.exists(self.store_path):
+            return
+        try:
+            with np.load(self.store_path) as stored:
+                keys = stored['keys']
+                times = stored['times']
+        except Exception as e:
+            print(f"Could not load dedup store {self.store_path}: {str(e)}")
+            return
+        self.seen = OrderedDict(zip(keys.tolist(), times.tolist()))
+        self._evict()
+        self._enforce_size()
+        if self.bloom is not None and self.seen:
+            self.bloom.add(np.fromiter(self.seen.keys(), dtype=np.uint64, count=len(self.seen)))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        keys = np.fromiter(self.seen.keys(), dtype=np.uint64, count=len(self.seen))
+        times = np.fromiter(self.seen.values(), dtype=np.float64, count=len(self.seen))
+        tmp_path = self.store_path + ".tmp.npz"
+        np.savez(tmp_path, keys=keys, times=times)
+        os.replace(tmp_path, self.store_path)
+
+    def __len__(self):
+        return len(self.seen)
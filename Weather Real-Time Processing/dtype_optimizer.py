@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+
+# DtypeOptimizer class
+# - Shrinks a processed frame before it is written:
+#   integers to the smallest type that holds their range, integral floats to (nullable)
+#   integers, other floats to float32 when every value survives the round trip, and
+#   repetitive text columns to categoricals.
+# - Every converted column is cast back and compared to the original, a column that would
+#   not round-trip exactly is left as it was.
+class DtypeOptimizer:
+    def __init__(self, categorical_threshold=0.5, exclude=()):
+        # Text columns with at most this share of distinct values become categoricals
+        self.categorical_threshold = categorical_threshold
+        self.exclude = set(exclude)
+        self.report = {}
+
+    def _candidate(self, series):
+        """The smaller version of series, or None when there is nothing to gain"""
+        dtype = series.dtype
+        if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+            return None
+
+        if pd.api.types.is_integer_dtype(dtype):
+            if pd.api.types.is_extension_array_dtype(dtype) and series.isna().any():
+                return None
+            downcast = 'unsigned' if series.min() >= 0 else 'integer'
+            return pd.to_numeric(series, downcast=downcast)
+
+        if pd.api.types.is_float_dtype(dtype):
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            present = values[~np.isnan(values)]
+            if len(present) and np.isfinite(present).all() and (present == np.round(present)).all() \
+                    and np.abs(present).max() < 2**31:
+                smallest = pd.to_numeric(pd.Series(present), downcast='unsigned' if present.min() >= 0 else 'integer')
+                if len(present) == len(values):
+                    return series.astype(smallest.dtype)
+                # Missing values need the nullable integer type of the same width
+                return series.astype(smallest.dtype.name.replace('u', 'U').replace('i', 'I'))
+            if dtype != np.float32:
+                return series.astype(np.float32)
+            return None
+
+        # Text columns are object dtype, or the string dtype on newer pandas
+        if (dtype == object or isinstance(dtype, pd.StringDtype)) and len(series):
+            if series.nunique(dropna=True) <= self.categorical_threshold * len(series):
+                return series.astype('category')
+        return None
+
+    @staticmethod
+    def _round_trips(original, converted):
+        restored = converted.astype(original.dtype)
+        return restored.equals(original)
+
+    def optimize(self, df: pd.DataFrame):
+        """Return an optimized copy of df, the changes are described in self.report"""
+        before = int(df.memory_usage(deep=True).sum())
+        optimized = df.copy()
+        changed = {}
+        for col in df.columns:
+            if col in self.exclude:
+                continue
+            try:
+                converted = self._candidate(df[col])
+            except (TypeError, ValueError):
+                converted = None
+            if converted is None or converted.dtype == df[col].dtype:
+                continue
+            if self._round_trips(df[col], converted):
+                optimized[col] = converted
+                changed[col] = (str(df[col].dtype), str(converted.dtype))
+
+        after = int(optimized.memory_usage(deep=True).sum())
+        self.report = {
+            'memory_before_bytes': before,
+            'memory_after_bytes': after,
+            'reduction': round(1 - after / before, 3) if before else 0.0,
+            'columns': changed
+        }
+        print(f"Dtype optimization: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB "
+              f"({self.report['reduction']:.0%} smaller, {len(changed)} columns converted)")
+        return optimized
+
+    def get_report(self):
+        return self.report
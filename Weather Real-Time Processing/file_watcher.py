@@ -5,7 +5,14 @@ import pandas as pd
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
-from main import main
+from main import CONNECTION_STRING, CONTAINER_NAME, OUTPUT_PATH
+from writer import Writer
+from deduplicator import Deduplicator
+from spatial_index import SpatialIndex
+from rolling_window import RollingWindow
+from data_profile import DataProfile
+from quarantine import DeadLetterSink
+from pipeline import build_weather_pipeline
 
 # Set up logging
 logging.basicConfig(
@@ -17,22 +24,35 @@ logger = logging.getLogger(__name__)
 
 class FileWatcher(FileSystemEventHandler):
     
-    def __init__(self):
+    def __init__(self, pipeline):
         self.detected_files = set()
+        self.pipeline = pipeline
     
     def on_created(self, event):        
+        if event.is_directory:
+            return
         file_path = event.src_path
             
         # Add to detected files set
         self.detected_files.add(file_path)
         
-        main()
+        # Hand the file to the staged pipeline, blocks only when the first stage is full
+        self.pipeline.submit(file_path)
         
         logger.info(f"  > {file_path}")
-        time.sleep(2)
         
-def start_monitoring(input_dir):  
-    event_handler = FileWatcher()
+def start_monitoring(input_dir, read_workers=2, process_workers=1, upload_workers=2):  
+    dead_letter_sink = DeadLetterSink()
+    spatial_index = SpatialIndex()
+    rolling_window = RollingWindow()
+    pipeline = build_weather_pipeline(
+        Writer(CONNECTION_STRING, CONTAINER_NAME), OUTPUT_PATH,
+        deduplicator=Deduplicator(), dead_letter_sink=dead_letter_sink,
+        spatial_index=spatial_index, rolling_window=rolling_window, data_profile=DataProfile(),
+        read_workers=read_workers, process_workers=process_workers, upload_workers=upload_workers
+    ).start()
+    
+    event_handler = FileWatcher(pipeline)
     observer = Observer()
     observer.schedule(event_handler, input_dir, recursive=False)
     observer.start()
@@ -60,6 +80,13 @@ def start_monitoring(input_dir):
         observer.stop()
     
     observer.join()
+    
+    # Finish the files that are already in the pipeline
+    pipeline.close()
+    dead_letter_sink.close()
+    spatial_index.flush()
+    rolling_window.flush()
+    logger.info(f"Pipeline stats: {pipeline.stats}")
 
 if __name__ == "__main__":
     # Get the absolute path to the input directory
@@ -1,44 +1,164 @@
-from reader import Reader
+from reader import Reader, get_reader
 from validator import Validator 
 from processor import Processor 
 from backupvalidator import BackupValidator 
 from writer import Writer 
+from deduplicator import Deduplicator
+from spatial_index import SpatialIndex
+from rolling_window import RollingWindow
+from data_profile import DataProfile
+from dtype_optimizer import DtypeOptimizer
+from error_budget import ErrorBudget
+from quarantine import quarantine_file, DeadLetterSink
+from rule_plan import write_rule_report
 
-def main():
-    
-    
+# Output spec: extra input columns to keep in the output. Columns that are not
+# validated, derived from or listed here are never parsed.
+OUTPUT_COLUMNS = []
+
+
+def needed_columns(output_columns=OUTPUT_COLUMNS):
+    """
+    Column predicate for the Reader: only columns needed by the Validator, the Processor
+    or the output spec are parsed
+    """
+    needed = set(Validator(None).required_columns()) | set(Processor.required_columns()) | set(output_columns)
+    return lambda name: name in needed
+
+
+# Write the Processor's rollup tables next to each output
+WRITE_ROLLUPS = True
+
+# Downcast the processed data (lossless) before it is handed to the Writer
+OPTIMIZE_DTYPES = True
+
+# Write a JSON report per input file with the hits, time and sample values of every
+# validation rule (reports/ next to this module)
+WRITE_RULE_REPORTS = True
+
+CONNECTION_STRING = "DefaultEndpointsProtocol=https;AccountName=uiiauiiau;AccountKey=ZxKBlPoSrGjlXyHwFUQLe1l7Ps74FVGs4j27S2QBCeOtYnGO+be0020Krs37xlOFMaXiGQN23s4++ASt+O0Tpg==;EndpointSuffix=core.windows.net"
+CONTAINER_NAME = "weather"
+OUTPUT_PATH = 'Weather Real-Time Processing/output/processed_weather.csv'
+
+
+def process_file(file_path, deduplicator=None, dead_letter_sink=None, rolling_window=None, engine=None):
+    """
+    Run the read, validate, process and backup validation steps on one input file.
+    Returns (processed data, dedup keys) like process_data, or None when the file could not
+    be read or was quarantined.
+    """
+    valid_data = read_and_validate(file_path, dead_letter_sink, engine)
+    if valid_data is None:
+        return None
+    return process_data(valid_data, deduplicator, rolling_window)
+
+
+def read_and_validate(file_path, dead_letter_sink=None, engine=None):
+    """
+    Read and validate one input file, returns the clean rows or None when the file was rejected.
+    engine picks the Reader (reader.ENGINE when None).
+    """
     # Reader step
-    reader = Reader.read_last_file()  
+    data = get_reader(engine)(file_path, columns=needed_columns()).load_data()
+    if data is None:
+        return None
     
     # Validation step
-    validator = Validator(reader)
-    validator.get_validated_data()
-    
+    validator = Validator(data, error_budget=ErrorBudget(max_error_rate=0.5, chunk_size=1000))
+    validator.validate()
+    print("Validation Summary:")
+    print(validator.summary())
+    if WRITE_RULE_REPORTS:
+        write_rule_report(validator.get_rule_report(), file_path)
+    if validator.budget_exceeded:
+        # Stop before processing and uploading a file that would be rejected anyway
+        quarantine_file(file_path, validator.termination_reason)
+        return None
     
+    # Rejected rows go to the dead-letter sink in the background, clean rows go on
+    if dead_letter_sink is not None:
+        dead_letter_sink.submit(validator.get_rejected_data(), file_path)
+    return validator.get_validated_data(filter_invalid=True)
+
+
+def process_data(valid_data, deduplicator=None, rolling_window=None):
+    """
+    Process validated data and double-check the derived fields, returns the processed data and
+    the keys the deduplicator reserved for it: pass them to commit_written once the data was
+    written, or to deduplicator.release when the write failed.
+    """
     # Processor step
-    processor = Processor()
-    processor.process()
-    processed_data = processor.get_processed_data()
-    print(processed_data.info())
+    processor = Processor(deduplicator=deduplicator, data=valid_data, rolling_window=rolling_window)
+    try:
+        processor.process()
+        processed_data = processor.get_processed_data()
+        print(processed_data.info())
+
+        # Back-up Validator step
+        backup_validator = BackupValidator(processed_data=processed_data)
+        backup_validator.validate()
+        print("Backup Validation Summary:")
+        print(backup_validator.get_validation_summary())
+        flags = backup_validator.get_validation_results()['validation_flags']
+        if flags:
+            print("\nSample validation flags (first 10):")
+            for i, flag in enumerate(flags[:10]):
+                print(flag)
+            if len(flags) > 10:
+                print(f"...and {len(flags) - 10} more flags")
+
+        if OPTIMIZE_DTYPES:
+            processed_data = DtypeOptimizer().optimize(processed_data)
+    except Exception:
+        # Nothing of this file gets written, its records may come again
+        if deduplicator is not None:
+            deduplicator.release(processor.dedup_keys)
+        raise
+    return processed_data, processor.dedup_keys
+
+
+def commit_written(processed_data, dedup_keys, source=None, deduplicator=None, data_profile=None,
+                   spatial_index=None, rolling_window=None):
+    """
+    Record a file whose output was written: its records count as seen by the deduplicator,
+    the data profile is updated with the written rows and reports drift, the spatial index
+    with the latest observation per location and the rolling windows with every observation
+    (each when given).
+    """
+    if deduplicator is not None:
+        deduplicator.commit(dedup_keys)
+    if data_profile is not None:
+        data_profile.update(processed_data, source=source)
+    if spatial_index is not None:
+        spatial_index.update(processed_data)
+    if rolling_window is not None:
+        rolling_window.update(processed_data)
+
+
+def main(file_path=None, engine=None):
     
+    if file_path is None:
+        file_path = Reader.find_last_file()
+    if file_path is None:
+        return
     
-    # Back-up Validator step
-    backup_validator = BackupValidator(processed_data=processed_data)
-    backup_validator.validate()
-    print("Backup Validation Summary:")
-    print(backup_validator.get_validation_summary())
-    flags = backup_validator.get_validation_results()['validation_flags']
-    if flags:
-        print("\nSample validation flags (first 10):")
-        for i, flag in enumerate(flags[:10]):
-            print(flag)
-        if len(flags) > 10:
-            print(f"...and {len(flags) - 10} more flags")
-           
-           
-    #Writer step 
-    writer = Writer("DefaultEndpointsProtocol=https;AccountName=uiiauiiau;AccountKey=ZxKBlPoSrGjlXyHwFUQLe1l7Ps74FVGs4j27S2QBCeOtYnGO+be0020Krs37xlOFMaXiGQN23s4++ASt+O0Tpg==;EndpointSuffix=core.windows.net", "weather")
-    writer.write(processed_data, "processed_weather.csv", 'Weather Real-Time Processing/output/processed_weather.csv')
+    deduplicator = Deduplicator()
+    spatial_index = SpatialIndex()
+    rolling_window = RollingWindow()
+    with DeadLetterSink() as dead_letter_sink:
+        result = process_file(file_path, deduplicator, dead_letter_sink, rolling_window, engine=engine)
+
+        #Writer step 
+        if result is not None:
+            processed_data, dedup_keys = result
+            writer = Writer(CONNECTION_STRING, CONTAINER_NAME)
+            rollups = Processor.compute_rollups(processed_data) if WRITE_ROLLUPS else None
+            writer.write(processed_data, "processed_weather.csv", OUTPUT_PATH, source_id=file_path, rollups=rollups)
+            # Only a written file marks its records as seen and joins the data profile, index and windows
+            commit_written(processed_data, dedup_keys, file_path, deduplicator, DataProfile(), spatial_index,
+                           rolling_window)
+    spatial_index.flush()
+    rolling_window.flush()
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import os
+import heapq
+import queue
+import logging
+import threading
+
+from main import read_and_validate, process_data, commit_written, WRITE_ROLLUPS
+from processor import Processor
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+# Stage class
+# - One step of the pipeline: func(payload) returns the payload for the next stage,
+#   or None to drop the item (e.g. a quarantined file).
+# - workers threads take items from a bounded input queue, so a slow stage holds back
+#   the stages before it instead of piling up data in memory.
+# - An ordered stage handles items strictly in submission order (it runs on one worker).
+class Stage:
+    def __init__(self, name, func, workers=1, queue_size=2, ordered=False):
+        self.name = name
+        self.func = func
+        self.workers = 1 if ordered else workers
+        self.ordered = ordered
+        self.queue = queue.Queue(maxsize=queue_size)
+
+
+# StagedPipeline class
+# - Runs every stage on its own threads, connected by the bounded queues, so file N+1
+#   can be read and validated while file N is still being written or uploaded.
+# - Every item carries the sequence number it was submitted with, dropped items are
+#   passed on empty so ordered stages never wait for them.
+class StagedPipeline:
+    def __init__(self, stages):
+        self.stages = stages
+        self.threads = []
+        self.next_seq = 0
+        self.submit_lock = threading.Lock()
+        self.stats = {stage.name: {'done': 0, 'dropped': 0, 'failed': 0} for stage in stages}
+        self.stats_lock = threading.Lock()
+        self._running = [0] * len(stages)
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            self._running[index] = stage.workers
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._run_worker, args=(index,), name=f"{stage.name}-{worker}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+        return self
+
+    def submit(self, payload):
+        """Queue an item for the first stage, blocks while that stage is full. Returns its sequence number"""
+        with self.submit_lock:
+            seq = self.next_seq
+            self.next_seq += 1
+        self.stages[0].queue.put((seq, payload))
+        return seq
+
+    def close(self):
+        """Let every queued item run through all stages, then stop the workers"""
+        for _ in range(self.stages[0].workers):
+            self.stages[0].queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+    def _run_worker(self, index):
+        stage = self.stages[index]
+        # Items that arrived ahead of their turn (ordered stages only)
+        waiting = []
+        next_seq = 0
+
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                break
+            if not stage.ordered:
+                self._handle(index, *item)
+                continue
+
+            heapq.heappush(waiting, item)
+            while waiting and waiting[0][0] == next_seq:
+                self._handle(index, *heapq.heappop(waiting))
+                next_seq += 1
+
+        # Last worker of this stage out passes the stop on to the next stage
+        with self.stats_lock:
+            self._running[index] -= 1
+            last = self._running[index] == 0
+        if last and index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                self.stages[index + 1].queue.put(_STOP)
+
+    def _handle(self, index, seq, payload):
+        stage = self.stages[index]
+        result = None
+        if payload is not None:
+            try:
+                result = stage.func(payload)
+                outcome = 'done' if result is not None else 'dropped'
+            except Exception:
+                logger.exception(f"Stage '{stage.name}' failed on item {seq}")
+                outcome = 'failed'
+            with self.stats_lock:
+                self.stats[stage.name][outcome] += 1
+
+        if index + 1 < len(self.stages):
+            self.stages[index + 1].queue.put((seq, result))
+
+
+def build_weather_pipeline(writer, output_path, deduplicator=None, dead_letter_sink=None,
+                           spatial_index=None, rolling_window=None, data_profile=None, read_workers=2, process_workers=1, upload_workers=2, queue_size=2):
+    """
+    Read+validate -> process -> write -> upload, with the local write ordered so
+    output names follow the order the input files arrived in. Dedup keys are committed,
+    and the data profile, spatial index and rolling windows updated, after the upload of their file.
+    """
+    filename = os.path.basename(output_path)
+
+    def settle(processed_data, dedup_keys, written):
+        # Records count as seen once their file is uploaded, a failed file may come again
+        if written:
+            commit_written(processed_data, dedup_keys, deduplicator=deduplicator, data_profile=data_profile,
+                           spatial_index=spatial_index, rolling_window=rolling_window)
+        elif deduplicator is not None:
+            deduplicator.release(dedup_keys)
+
+    def write_outputs(processed):
+        # The output and its rollup tables, as [(local path, blob name)]
+        processed_data, dedup_keys = processed
+        try:
+            written = [writer.save_local(processed_data, filename, output_path)]
+            if WRITE_ROLLUPS:
+                written += writer.save_rollups(Processor.compute_rollups(processed_data), written[0][0])
+        except Exception:
+            settle(processed_data, dedup_keys, False)
+            raise
+        return written, processed_data, dedup_keys
+
+    def upload_outputs(saved):
+        written, processed_data, dedup_keys = saved
+        try:
+            for local_path, blob_name in written:
+                writer.upload(local_path, blob_name)
+        except Exception:
+            settle(processed_data, dedup_keys, False)
+            raise
+        settle(processed_data, dedup_keys, True)
+        return written
+
+    stages = [
+        Stage("read_validate", lambda file_path: read_and_validate(file_path, dead_letter_sink),
+              workers=read_workers, queue_size=queue_size),
+        Stage("process", lambda valid_data: process_data(valid_data, deduplicator, rolling_window),
+              workers=process_workers, queue_size=queue_size),
+        Stage("write", write_outputs, queue_size=queue_size, ordered=True),
+        Stage("upload", upload_outputs, workers=upload_workers, queue_size=queue_size),
+    ]
+    return StagedPipeline(stages)
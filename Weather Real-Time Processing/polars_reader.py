@@ -0,0 +1,52 @@
+import polars as pl
+from reader import Reader, detect_format, select_columns
+from polars_io import PANDAS_NA_VALUES, open_compressed
+
+
+def read_table(file_path, columns=None):
+    """
+    Read a CSV, Parquet or Arrow IPC/Feather file with Polars into a pandas DataFrame.
+    Only the selected columns are parsed, see select_columns.
+    """
+    file_format = detect_format(file_path)
+    if file_format == 'csv':
+        source = file_path
+        if not str(file_path).lower().endswith('.csv'):
+            # Compressed CSV is decompressed first, Polars can't read bz2, xz or zip
+            with open_compressed(file_path) as compressed:
+                source = compressed.read()
+        options = dict(infer_schema_length=None, null_values=PANDAS_NA_VALUES)
+        if columns is not None:
+            names = pl.read_csv(source, n_rows=0).columns
+            options['columns'] = select_columns(names, columns)
+        frame = pl.read_csv(source, **options)
+    elif file_format == 'parquet':
+        frame = pl.scan_parquet(file_path)
+        if columns is not None:
+            frame = frame.select(select_columns(frame.collect_schema().names(), columns))
+        frame = frame.collect()
+    elif file_format == 'arrow':
+        try:
+            frame = pl.scan_ipc(file_path)
+            names = frame.collect_schema().names()
+        except Exception:
+            # Not the file format, try the streaming format
+            frame = pl.read_ipc_stream(file_path).lazy()
+            names = frame.collect_schema().names()
+        if columns is not None:
+            frame = frame.select(select_columns(names, columns))
+        frame = frame.collect()
+    else:
+        raise ValueError(f"Unsupported file format: {file_path}")
+    return frame.to_pandas()
+
+
+# PolarsReader class
+# - Reader that parses with Polars: only the selected columns are parsed and parsing runs
+#   on all cores.
+# - load_data() still returns a pandas DataFrame, the Validator, the Processor and the
+#   state kept across files (dedup store, rolling windows, spatial index) work on pandas.
+class PolarsReader(Reader):
+
+    def _read(self):
+        return read_table(self.file_path, self.columns)
@@ -2,13 +2,40 @@ import pandas as pd
 import numpy as np
 import os
 from datetime import datetime
-from reader import Reader
-from validator import Validator
+from deduplicator import NO_KEYS
 
 class Processor:
+
+    # Input columns used for the derived fields and for deduplication
+    derived_from_columns = ['temperature_celsius', 'temperature_fahrenheit', 'air_quality_us-epa-index',
+                            'location_name', 'country', 'latitude', 'longitude', 'last_updated', 'date']
+
+    # Pre-aggregated tables written next to the output:
+    # name -> (group by columns, {output column: (input column, aggregation)})
+    rollups = {
+        'by_country_temperature': (['country', 'temperature_category'], {
+            'records': ('temperature_celsius', 'size'),
+            'mean_temperature_celsius': ('temperature_celsius', 'mean'),
+            'min_temperature_celsius': ('temperature_celsius', 'min'),
+            'max_temperature_celsius': ('temperature_celsius', 'max'),
+            'mean_air_quality_us-epa-index': ('air_quality_us-epa-index', 'mean'),
+        }),
+        'by_country_air_quality': (['country', 'air_quality_category'], {
+            'records': ('air_quality_us-epa-index', 'size'),
+            'mean_temperature_celsius': ('temperature_celsius', 'mean'),
+        }),
+    }
     
-    def __init__(self, proceed_with_errors=False):
-        self.data = Reader.read_last_file()
+    def __init__(self, proceed_with_errors=False, deduplicator=None, data=None, rolling_window=None):
+        self.deduplicator = deduplicator
+        self.rolling_window = rolling_window
+        # Keys the deduplicator reserved for the kept records, committed once they are written
+        self.dedup_keys = NO_KEYS
+        # Use already validated data when given, otherwise read the last input file
+        if data is None:
+            from reader import Reader
+            data = Reader.read_last_file()
+        self.data = data
         if self.data is None:
             raise FileNotFoundError("No file found in the input directory.")
 
@@ -75,6 +102,16 @@ class Processor:
     
     def _remove_duplicates(self):
         """Remove duplicate records from the dataset"""
+        # Hash-based path, also drops records already seen in earlier files
+        if self.deduplicator is not None and self.deduplicator.key_columns(self.data):
+            original_count = len(self.data)
+            keep, self.dedup_keys = self.deduplicator.filter(self.data)
+            self.data = self.data[keep].reset_index(drop=True)
+            duplicates_removed = original_count - len(self.data)
+            if duplicates_removed > 0:
+                print(f"Removed {duplicates_removed} duplicate records (within file or seen in earlier files)")
+            return self
+
         # Check for exact duplicates first
         original_count = len(self.data)
         self.data.drop_duplicates(inplace=True)
@@ -118,14 +155,41 @@ class Processor:
             self.data['air_quality_category'] = np.select(conditions, choices, default='Unknown')
         return self
     
+    def _add_rolling_windows(self):
+        """Rolling mean/min/max and change per location, over the windows kept across files"""
+        if self.rolling_window is not None:
+            self.data = self.rolling_window.apply(self.data)
+        return self
+
     def process(self):
         self._add_temperature_category()
         self._add_temperature_deviation()
         self._remove_duplicates()
         self._add_air_quality_category()
+        self._add_rolling_windows()
         self.data = self.data.reset_index(drop=True)
         return self
 
+    @classmethod
+    def required_columns(cls):
+        """Columns the Reader must load for process() to work"""
+        return list(cls.derived_from_columns)
+
+    @classmethod
+    def compute_rollups(cls, data):
+        """One groupby pass per rollup over the processed data, rollups whose columns are missing are skipped"""
+        tables = {}
+        for name, (group_by, aggregations) in cls.rollups.items():
+            if not set(group_by).issubset(data.columns):
+                continue
+            available = {out: spec for out, spec in aggregations.items() if spec[0] in data.columns}
+            if available:
+                tables[name] = data.groupby(group_by, observed=True).agg(**available).reset_index()
+        return tables
+
+    def get_rollups(self):
+        return self.compute_rollups(self.data)
+
     def get_processed_data(self):
         return self.data
 
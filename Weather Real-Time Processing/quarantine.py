@@ -0,0 +1,124 @@
+import os
+import json
+import shutil
+import datetime
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+def default_quarantine_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, "quarantine")
+
+
+def default_dead_letter_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, "dead_letter")
+
+
+# Move (or copy) a rejected input file into the quarantine folder,
+# next to a small JSON file that records why it was rejected.
+# The name gets a timestamp, so sources sharing a basename don't overwrite each other.
+def quarantine_file(file_path, reason, quarantine_dir=None, move=True):
+    quarantine_dir = quarantine_dir or default_quarantine_dir()
+    os.makedirs(quarantine_dir, exist_ok=True)
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    # <name>_<timestamp>.<extensions>, so weather.csv.gz stays a .csv.gz
+    base, dot, extensions = os.path.basename(file_path).partition('.')
+    target_path = os.path.join(quarantine_dir, f"{base}_{timestamp}{dot}{extensions}")
+    if move:
+        shutil.move(file_path, target_path)
+    else:
+        shutil.copy2(file_path, target_path)
+
+    with open(target_path + ".reason.json", "w") as reason_file:
+        json.dump({
+            'source_path': file_path,
+            'reason': reason,
+            'quarantined_at': datetime.datetime.now().isoformat(timespec='seconds')
+        }, reason_file, indent=2)
+
+    print(f"Quarantined {file_path}: {reason}")
+    return target_path
+
+
+# DeadLetterSink class
+# - Collects rejected rows together with the codes of the rules they failed.
+# - Writes them in bulk on a background thread, as compressed Parquet when pyarrow
+#   is installed and as gzipped CSV otherwise, so the clean rows are not held up.
+# - An optional uploader(local_path, blob_name) also ships each file under blob_prefix.
+# - A failed write is reported as soon as it happens, close() raises the first one.
+# - Used as a context manager it is closed (queued writes finished) even when the step fails.
+class DeadLetterSink:
+    def __init__(self, dead_letter_dir=None, uploader=None, blob_prefix="dead_letter/"):
+        self.dead_letter_dir = dead_letter_dir or default_dead_letter_dir()
+        self.uploader = uploader
+        self.blob_prefix = blob_prefix
+        self.use_parquet = importlib.util.find_spec("pyarrow") is not None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dead-letter")
+        self.pending = []
+        self.error = None
+
+    def submit(self, rejected, source_name):
+        """Queue rejected rows (with a 'rule_codes' column) for writing, returns a future"""
+        if rejected is None or rejected.empty:
+            return None
+        future = self.executor.submit(self._write, rejected, source_name)
+        future.add_done_callback(self._report)
+        # Only writes still running are kept, a long-running sink doesn't pile up futures
+        self.pending = [pending for pending in self.pending if not pending.done()]
+        self.pending.append(future)
+        return future
+
+    def _report(self, future):
+        error = future.exception()
+        if error is not None:
+            print(f"Dead-letter write failed: {error}")
+            if self.error is None:
+                self.error = error
+
+    def _write(self, rejected, source_name):
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        base = os.path.splitext(os.path.basename(source_name))[0]
+
+        if self.use_parquet:
+            filename = f"{base}_rejected_{timestamp}.parquet"
+            path = os.path.join(self.dead_letter_dir, filename)
+            # Rejected rows often mix types in one column, keep them as text for replay
+            rejected = rejected.copy()
+            for col in rejected.columns[rejected.dtypes == object]:
+                rejected[col] = rejected[col].astype("string")
+            rejected.to_parquet(path, index=False, compression="zstd")
+        else:
+            filename = f"{base}_rejected_{timestamp}.csv.gz"
+            path = os.path.join(self.dead_letter_dir, filename)
+            rejected.to_csv(path, index=False, compression="gzip")
+
+        if self.uploader is not None:
+            self.uploader(path, self.blob_prefix + filename)
+
+        print(f"Dead-lettered {len(rejected)} rejected rows to {path}")
+        return path
+
+    def close(self):
+        """Wait for all queued writes and stop the background thread, raises the first failed write"""
+        pending, self.pending = self.pending, []
+        wait(pending)
+        self.executor.shutdown(wait=True)
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        # The step's own error is the one to report, a failed write was already logged
+        try:
+            self.close()
+        except Exception:
+            pass
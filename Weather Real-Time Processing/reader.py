@@ -2,9 +2,93 @@ import pandas as pd
 import os
 from pathlib import Path
 
+# Engine that parses the input files: 'pandas', or 'polars' for multi-threaded parsing
+# (needs the polars package). Both hand a pandas DataFrame to the Validator.
+ENGINE = os.environ.get('WEATHER_ENGINE', 'pandas')
+ENGINES = ('pandas', 'polars')
+
+# Supported input formats, by file suffix
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz', '.csv.zst', '.csv.zip')
+PARQUET_SUFFIXES = ('.parquet', '.pq')
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+
+
+def detect_format(file_path):
+    name = str(file_path).lower()
+    if name.endswith(CSV_SUFFIXES):
+        return 'csv'
+    if name.endswith(PARQUET_SUFFIXES):
+        return 'parquet'
+    if name.endswith(ARROW_SUFFIXES):
+        return 'arrow'
+    return None
+
+
+def select_columns(names, columns):
+    """Names to keep, columns is None (all), a list of names or a predicate on the name"""
+    if columns is None:
+        return list(names)
+    if callable(columns):
+        return [name for name in names if columns(name)]
+    return [name for name in names if name in set(columns)]
+
+
+def read_table(file_path, columns=None):
+    """
+    Read a CSV (plain or compressed), Parquet or Arrow IPC/Feather file into a DataFrame.
+    Only the selected columns are parsed, see select_columns.
+    """
+    file_format = detect_format(file_path)
+    if file_format == 'csv':
+        usecols = None
+        if columns is not None:
+            usecols = columns if callable(columns) else (lambda name: name in set(columns))
+        if str(file_path).lower().endswith('.csv'):
+            # Plain CSV is parsed straight from the OS page cache
+            return pd.read_csv(file_path, memory_map=True, usecols=usecols)
+        # Compression is taken from the suffix (.zst needs the zstandard package)
+        return pd.read_csv(file_path, compression='infer', usecols=usecols)
+    if file_format == 'parquet':
+        if columns is None:
+            return pd.read_parquet(file_path)
+        import pyarrow.parquet as pq
+        names = pq.read_schema(file_path).names
+        return pd.read_parquet(file_path, columns=select_columns(names, columns))
+    if file_format == 'arrow':
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        # Memory-map the file so Arrow buffers point into the page cache instead of being copied
+        source = pa.memory_map(str(file_path), 'r')
+        try:
+            table = ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            # Not the file format, try the streaming format
+            source.seek(0)
+            table = ipc.open_stream(source).read_all()
+        if columns is not None:
+            # Unselected columns stay untouched in the mapped file
+            table = table.select(select_columns(table.column_names, columns))
+        # split_blocks keeps null-free numeric columns zero-copy
+        return table.to_pandas(split_blocks=True)
+    raise ValueError(f"Unsupported file format: {file_path}")
+
+
+def get_reader(engine=None):
+    """Reader class of the engine (ENGINE when None)"""
+    engine = engine or ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if engine == 'polars':
+        from polars_reader import PolarsReader
+        return PolarsReader
+    return Reader
+
+
 class Reader:
-    def __init__(self, file_path):
+    def __init__(self, file_path, columns=None):
         self.file_path = file_path
+        # Columns to parse: None for all, a list of names or a predicate on the name
+        self.columns = columns
         self.data = None
         
     def load_data(self):
@@ -14,11 +98,11 @@ class Reader:
                 raise FileNotFoundError(f"File not found: {self.file_path}")
             
             # Check file extension
-            if not self.file_path.lower().endswith('.csv'):
-                raise ValueError(f"File must be a CSV: {self.file_path}")
+            if detect_format(self.file_path) is None:
+                raise ValueError(f"File must be CSV (optionally compressed), Parquet or Arrow: {self.file_path}")
             
-            # Read the CSV file
-            self.data = pd.read_csv(self.file_path)
+            # Read the file
+            self.data = self._read()
             return self.data
         except pd.errors.EmptyDataError:
             print(f"Error: The file {self.file_path} is empty")
@@ -30,10 +114,13 @@ class Reader:
             print(f"Error reading file {self.file_path}: {str(e)}")
             return None
     
+    def _read(self):
+        return read_table(self.file_path, self.columns)
+
     @staticmethod
-    def read_last_file():
+    def find_last_file():
         """
-        Read the most recent file from the input directory based on modification time
+        Find the most recent file in the input directory based on modification time
         """
         script_dir = os.path.dirname(os.path.abspath(__file__))
         input_dir = os.path.join(script_dir, "input")
@@ -43,14 +130,14 @@ class Reader:
             print(f"Input directory does not exist: {input_dir}")
             return None
         
-        # Get all CSV files in the input directory
+        # Get all supported files in the input directory
         input_files = [
-            f for f in Path(input_dir).glob("*.csv") 
-            if os.path.isfile(os.path.join(input_dir, f))
+            f for f in Path(input_dir).iterdir()
+            if f.is_file() and detect_format(f) is not None
         ]
         
         if not input_files:
-            print("No CSV files found in the input directory")
+            print("No supported input files found in the input directory")
             return None
         
         # Sort files by modification time (newest last)
@@ -58,9 +145,18 @@ class Reader:
         
         # Get the most recent file
         last_file = input_files[-1]
-        last_file_path = os.path.join(input_dir, last_file)
+        return os.path.join(input_dir, last_file)
+
+    @staticmethod
+    def read_last_file():
+        """
+        Read the most recent file from the input directory based on modification time
+        """
+        last_file_path = Reader.find_last_file()
+        if last_file_path is None:
+            return None
         
-        print(f"Reading most recent file: {last_file}")
+        print(f"Reading most recent file: {os.path.basename(last_file_path)}")
         
         # Create reader and load data
         reader = Reader(last_file_path)
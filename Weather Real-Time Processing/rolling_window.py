@@ -0,0 +1,262 @@
+import os
+import time
+import warnings
+import threading
+import numpy as np
+import pandas as pd
+
+
+# RollingWindow class
+# - Per location_name, the last window_size observations of each tracked column, oldest
+#   first and sorted by time, kept in NumPy arrays (locations x window_size [x columns]).
+# - apply() adds <column>_rolling_mean/min/max and <column>_change (current value minus the
+#   oldest one in the window) computed over the observations of the last window_seconds,
+#   from the stored windows and the rows of the file, without changing the windows.
+# - update() merges the rows of a written file in by time, so rows arriving late (files
+#   read and processed concurrently) still land in their place. The cost per file is
+#   O(new rows x window_size).
+# - Persisted to state/rolling_window.npz at most every save_interval seconds, flush()
+#   saves pending updates, so windows survive restarts.
+class RollingWindow:
+
+    default_columns = ['temperature_celsius', 'humidity', 'air_quality_PM2.5']
+    statistics = ('rolling_mean', 'rolling_min', 'rolling_max', 'change')
+    # Rows per block of apply(), bounds its memory to chunk_rows x window_size x columns
+    chunk_rows = 8192
+
+    def __init__(self, store_path=None, columns=None, window_size=48, window_seconds=24 * 3600, save_interval=30.0):
+        if store_path is None:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            store_path = os.path.join(script_dir, "state", "rolling_window.npz")
+        self.store_path = store_path
+        self.columns = list(columns or self.default_columns)
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        self.save_interval = save_interval
+        self.last_saved = time.monotonic()
+        self.dirty = False
+        # apply() and update() may be called from several worker threads
+        self.lock = threading.Lock()
+
+        self.slots = {}
+        self._allocate(0)
+        self._load()
+
+    def _allocate(self, capacity):
+        self.names = np.empty(capacity, dtype=object)
+        self.times = np.zeros((capacity, self.window_size), dtype=np.int64)
+        self.values = np.full((capacity, self.window_size, len(self.columns)), np.nan)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+
+    def _grow(self, needed):
+        capacity = len(self.counts)
+        if needed <= capacity:
+            return
+        old = (self.names, self.times, self.values, self.counts)
+        self._allocate(max(needed, 2 * capacity, 64))
+        for new_array, old_array in zip((self.names, self.times, self.values, self.counts), old):
+            new_array[:capacity] = old_array
+
+    def _slots_for(self, names):
+        """Window row of every name, new locations get a fresh row"""
+        new_names = [name for name in pd.unique(names) if name not in self.slots]
+        if new_names:
+            start = len(self.slots)
+            self._grow(start + len(new_names))
+            for offset, name in enumerate(new_names):
+                self.slots[name] = start + offset
+                self.names[start + offset] = name
+        return np.fromiter((self.slots[name] for name in names), dtype=np.int64, count=len(names))
+
+    @staticmethod
+    def observation_times(df):
+        if 'last_updated_epoch' in df.columns:
+            return pd.to_numeric(df['last_updated_epoch'], errors='coerce')
+        if 'last_updated' in df.columns:
+            times = pd.to_datetime(df['last_updated'], errors='coerce')
+            return pd.Series(times.astype('int64') // 10**9, index=df.index).where(times.notna())
+        return None
+
+    def _observations(self, df):
+        """Positions, names, times and values of the rows of df with a location and a time"""
+        columns = [col for col in self.columns if col in df.columns]
+        times = self.observation_times(df) if 'location_name' in df.columns else None
+        if df.empty or times is None or not columns:
+            return None
+        usable = (times.notna() & df['location_name'].notna()).to_numpy()
+        values = np.column_stack([
+            pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan) if col in df.columns
+            else np.full(len(df), np.nan)
+            for col in self.columns
+        ])
+        return (np.flatnonzero(usable), df['location_name'].to_numpy(dtype=object)[usable],
+                times.to_numpy()[usable].astype(np.int64), values[usable])
+
+    def _stored(self, slots):
+        """Slot, time and values of every stored observation of the slots, oldest first per slot"""
+        counts = self.counts[slots]
+        entry_slots = np.repeat(slots, counts)
+        entries = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return entry_slots, self.times[entry_slots, entries], self.values[entry_slots, entries]
+
+    def apply(self, df: pd.DataFrame):
+        """
+        Returns df with the rolling columns added, over the stored windows and the rows of df.
+        The windows are not changed: update() them once the file was written.
+        """
+        observations = self._observations(df)
+        if observations is None:
+            return df
+        positions, names, row_times, row_values = observations
+        results = np.full((len(df), len(self.columns), len(self.statistics)), np.nan)
+
+        if len(positions):
+            # Location codes shared by the file rows and the stored observations of their locations
+            codes, unique_names = pd.factorize(pd.Series(names, dtype=object))
+            with self.lock:
+                known = [i for i, name in enumerate(unique_names) if name in self.slots]
+                slots = np.array([self.slots[unique_names[i]] for i in known], dtype=np.int64)
+                entry_slots, entry_times, entry_values = self._stored(slots)
+            code_by_slot = dict(zip(slots.tolist(), known))
+            entry_codes = np.fromiter((code_by_slot[slot] for slot in entry_slots.tolist()),
+                                      dtype=np.int64, count=len(entry_slots))
+
+            # Sorted by location and time, a stored observation comes before a file row of the
+            # same time and only the first of each (location, time) is part of the windows
+            locs = np.concatenate([entry_codes, codes])
+            all_times = np.concatenate([entry_times, row_times])
+            all_values = np.concatenate([entry_values, row_values])
+            sources = np.concatenate([np.full(len(entry_codes), -1), np.arange(len(codes))])
+            order = np.lexsort((sources, all_times, locs))
+            locs, all_times, all_values, sources = locs[order], all_times[order], all_values[order], sources[order]
+            kept = np.ones(len(order), dtype=bool)
+            kept[1:] = (locs[1:] != locs[:-1]) | (all_times[1:] != all_times[:-1])
+            compact = np.cumsum(kept) - 1
+            locs, all_times, all_values = locs[kept], all_times[kept], all_values[kept]
+            first = np.ones(len(locs), dtype=bool)
+            first[1:] = locs[1:] != locs[:-1]
+            group_starts = np.maximum.accumulate(np.where(first, np.arange(len(locs)), 0))
+
+            from_file = sources >= 0
+            rows, at = sources[from_file], compact[from_file]
+            for start in range(0, len(rows), self.chunk_rows):
+                chunk = slice(start, start + self.chunk_rows)
+                results[positions[rows[chunk]]] = self._aggregate(
+                    at[chunk], group_starts[at[chunk]], all_times, all_values, row_values[rows[chunk]]
+                )
+
+        df = df.copy()
+        for i, col in enumerate(self.columns):
+            if col not in df.columns:
+                continue
+            for j, statistic in enumerate(self.statistics):
+                df[f"{col}_{statistic}"] = results[:, i, j]
+        return df
+
+    def _aggregate(self, at, group_starts, all_times, all_values, row_values):
+        # The window of a row: the observations of its location up to its time, at most
+        # window_size of them and none older than window_seconds
+        entries = at[:, None] - np.arange(self.window_size)[None, :]
+        in_window = entries >= group_starts[:, None]
+        entries = np.maximum(entries, 0)
+        in_window &= all_times[entries] > (all_times[at] - self.window_seconds)[:, None]
+        windowed = np.where(in_window[:, :, None], all_values[entries], np.nan)
+
+        # Oldest observation in the window, for the change over the window
+        oldest = entries[np.arange(len(at)), in_window.sum(axis=1) - 1]
+        change = row_values - all_values[oldest]
+
+        with warnings.catch_warnings():
+            # Windows without any value give NaN, that's expected
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.stack([
+                np.nanmean(windowed, axis=1), np.nanmin(windowed, axis=1), np.nanmax(windowed, axis=1), change
+            ], axis=2)
+
+    def update(self, df: pd.DataFrame):
+        """Merge the rows of df into the windows, in time order, the newest window_size per location are kept"""
+        observations = self._observations(df)
+        if observations is None or not len(observations[0]):
+            return self
+        _, names, row_times, row_values = observations
+
+        with self.lock:
+            row_slots = self._slots_for(names)
+            slots = np.unique(row_slots)
+            entry_slots, entry_times, entry_values = self._stored(slots)
+
+            # A stored observation wins over a row of the same time, so a file written twice changes nothing
+            all_slots = np.concatenate([entry_slots, row_slots])
+            all_times = np.concatenate([entry_times, row_times])
+            all_values = np.concatenate([entry_values, row_values])
+            sources = np.concatenate([np.full(len(entry_slots), -1), np.arange(len(row_slots))])
+            order = np.lexsort((sources, all_times, all_slots))
+            all_slots, all_times, all_values = all_slots[order], all_times[order], all_values[order]
+            kept = np.ones(len(order), dtype=bool)
+            kept[1:] = (all_slots[1:] != all_slots[:-1]) | (all_times[1:] != all_times[:-1])
+            all_slots, all_times, all_values = all_slots[kept], all_times[kept], all_values[kept]
+
+            # Newest window_size per slot, written back oldest first
+            first = np.ones(len(all_slots), dtype=bool)
+            first[1:] = all_slots[1:] != all_slots[:-1]
+            group_starts = np.maximum.accumulate(np.where(first, np.arange(len(all_slots)), 0))
+            sizes = np.bincount(all_slots, minlength=len(self.counts))
+            ranks = np.arange(len(all_slots)) - group_starts - np.maximum(sizes[all_slots] - self.window_size, 0)
+            keep = ranks >= 0
+            self.times[all_slots[keep], ranks[keep]] = all_times[keep]
+            self.values[all_slots[keep], ranks[keep]] = all_values[keep]
+            self.counts[slots] = np.minimum(sizes[slots], self.window_size)
+
+            self.dirty = True
+            if time.monotonic() - self.last_saved >= self.save_interval:
+                self.save()
+        return self
+
+    def flush(self):
+        """Save the updates made since the last save"""
+        with self.lock:
+            if self.dirty:
+                self.save()
+
+    def _load(self):
+        if not os.path.exists(self.store_path):
+            return
+        try:
+            with np.load(self.store_path) as stored:
+                if list(stored['columns']) != self.columns or stored['times'].shape[1] != self.window_size:
+                    print("Rolling window settings changed, starting from empty windows")
+                    return
+                names = stored['names'].astype(object)
+                self._allocate(len(names))
+                self.names[:] = names
+                self.times[:] = stored['times']
+                self.values[:] = stored['values']
+                self.counts[:] = stored['counts']
+                if 'heads' in stored:
+                    # Stores of the former ring buffers: full windows start at their head
+                    full = np.flatnonzero(self.counts == self.window_size)
+                    entries = (np.arange(self.window_size)[None, :] + stored['heads'][full][:, None]) % self.window_size
+                    self.times[full] = self.times[full[:, None], entries]
+                    self.values[full] = self.values[full[:, None], entries]
+        except Exception as e:
+            print(f"Could not load rolling window store {self.store_path}: {str(e)}")
+            self.slots = {}
+            self._allocate(0)
+            return
+        self.slots = {name: slot for slot, name in enumerate(names)}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        used = len(self.slots)
+        self.dirty = False
+        self.last_saved = time.monotonic()
+        arrays = {
+            'names': self.names[:used].astype(str), 'times': self.times[:used], 'values': self.values[:used],
+            'counts': self.counts[:used], 'columns': np.array(self.columns)
+        }
+        tmp_path = self.store_path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.store_path)
+
+    def __len__(self):
+        return len(self.slots)
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import signal
+import asyncio
+import logging
+import functools
+import contextlib
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+from main import process_file, commit_written, CONNECTION_STRING, CONTAINER_NAME, OUTPUT_PATH, WRITE_ROLLUPS
+from processor import Processor
+from writer import Writer
+from deduplicator import Deduplicator
+from spatial_index import SpatialIndex
+from rolling_window import RollingWindow
+from data_profile import DataProfile
+from quarantine import DeadLetterSink
+from storage import AsyncAzureBlobStorage
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+
+# QueueingHandler class
+# - Watchdog calls on_created on its own thread, this hands the path to the event loop.
+class QueueingHandler(FileSystemEventHandler):
+    def __init__(self, loop, submit):
+        self.loop = loop
+        self.submit = submit
+
+    def on_created(self, event):
+        if event.is_directory:
+            return
+        self.loop.call_soon_threadsafe(self.submit, event.src_path)
+
+
+# IngestionService class
+# - Watchdog events are bridged into an asyncio.Queue.
+# - The CPU-bound pandas stages run in a thread pool executor.
+# - Uploads to Azure use the async client (azure.storage.blob.aio), other storage backends run
+#   on their own pool of max_uploads threads. Both paths retry, resume block uploads and share
+#   the bandwidth limit, so several uploads can be in flight while the next file is parsed.
+# - /health, /metrics, /nearby, /bbox and /profile are served as JSON, and the queue is drained on shutdown.
+class IngestionService:
+    def __init__(self, input_dir, connection_string=CONNECTION_STRING, container_name=CONTAINER_NAME,
+                 output_path=OUTPUT_PATH, workers=2, max_uploads=4, metrics_host="127.0.0.1", metrics_port=8080):
+        self.input_dir = input_dir
+        self.connection_string = connection_string
+        self.container_name = container_name
+        self.output_path = output_path
+        self.workers = workers
+        self.max_uploads = max_uploads
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        self.upload_executor = ThreadPoolExecutor(max_workers=max_uploads, thread_name_prefix="upload")
+        self.writer = Writer(connection_string, container_name)
+        # Set by run() when the Writer's backend is Azure
+        self.async_storage = None
+        self.deduplicator = Deduplicator()
+        self.spatial_index = SpatialIndex()
+        self.rolling_window = RollingWindow()
+        self.data_profile = DataProfile()
+        self.dead_letter_sink = DeadLetterSink()
+
+        self.uploads = set()
+        self.metrics = {
+            'started_at': time.time(),
+            'files_received': 0,
+            'files_processed': 0,
+            'files_rejected': 0,
+            'files_failed': 0,
+            'uploads_completed': 0,
+            'uploads_skipped': 0,
+            'uploads_failed': 0,
+            'last_error': None
+        }
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        self.upload_slots = asyncio.Semaphore(self.max_uploads)
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stopping.set)
+            except NotImplementedError:
+                # Not available on Windows, Ctrl+C still raises KeyboardInterrupt there
+                pass
+
+        observer = Observer()
+        observer.schedule(QueueingHandler(loop, self.submit), self.input_dir, recursive=False)
+        observer.start()
+        logger.info(f"Watching {self.input_dir}")
+
+        metrics_server = await asyncio.start_server(self._serve_metrics, self.metrics_host, self.metrics_port)
+        logger.info(f"Health and metrics on http://{self.metrics_host}:{self.metrics_port}/health")
+
+        async with contextlib.AsyncExitStack() as stack:
+            if self.writer.storage.name == 'azure':
+                # Azure uploads use the async client, with the retry policy and transfer limiter
+                # of the Writer's backend
+                self.async_storage = await stack.enter_async_context(AsyncAzureBlobStorage(
+                    self.connection_string, self.container_name,
+                    retry=self.writer.storage.retry, limiter=self.writer.storage.limiter
+                ))
+            workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+            await self.stopping.wait()
+            logger.info("Shutting down, draining queued files and uploads...")
+
+            # Stop accepting new files, then finish everything already queued
+            observer.stop()
+            await loop.run_in_executor(None, observer.join)
+            await self.queue.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self.uploads:
+                await asyncio.gather(*self.uploads, return_exceptions=True)
+
+        metrics_server.close()
+        await metrics_server.wait_closed()
+        await loop.run_in_executor(None, self.dead_letter_sink.close)
+        await loop.run_in_executor(None, self.spatial_index.flush)
+        await loop.run_in_executor(None, self.rolling_window.flush)
+        self.executor.shutdown(wait=True)
+        self.upload_executor.shutdown(wait=True)
+        logger.info("Monitoring stopped")
+
+    def submit(self, file_path):
+        """Queue a file for processing, must be called on the event loop"""
+        self.metrics['files_received'] += 1
+        self.queue.put_nowait(file_path)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            file_path = await self.queue.get()
+            try:
+                logger.info(f"  > {file_path}")
+                result = await loop.run_in_executor(
+                    self.executor, process_file, file_path, self.deduplicator, self.dead_letter_sink, self.rolling_window
+                )
+                if result is None:
+                    self.metrics['files_rejected'] += 1
+                    continue
+                processed_data, dedup_keys = result
+
+                try:
+                    local_path, blob_name = await loop.run_in_executor(
+                        self.executor, self.writer.save_local, processed_data, os.path.basename(self.output_path),
+                        self.output_path, file_path
+                    )
+                    written = [(local_path, blob_name)]
+                    if WRITE_ROLLUPS:
+                        written += await loop.run_in_executor(
+                            self.executor,
+                            lambda: self.writer.save_rollups(Processor.compute_rollups(processed_data), local_path)
+                        )
+                except Exception:
+                    self.deduplicator.release(dedup_keys)
+                    raise
+                self.metrics['files_processed'] += 1
+
+                # Don't wait for the uploads, the worker can start on the next file
+                upload = asyncio.create_task(self._upload_file(written, processed_data, dedup_keys, file_path))
+                self.uploads.add(upload)
+                upload.add_done_callback(self.uploads.discard)
+            except Exception as e:
+                self.metrics['files_failed'] += 1
+                self.metrics['last_error'] = f"{file_path}: {str(e)}"
+                logger.exception(f"Failed to process {file_path}")
+            finally:
+                self.queue.task_done()
+
+    async def _upload_file(self, written, processed_data, dedup_keys, file_path):
+        """
+        Upload the outputs of one file, once all of them are stored its dedup keys are committed
+        and its rows join the data profile, spatial index and rolling windows
+        """
+        uploaded = await asyncio.gather(*(self._upload(local_path, blob_name) for local_path, blob_name in written))
+        if all(uploaded):
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, commit_written, processed_data, dedup_keys, file_path, self.deduplicator, self.data_profile,
+                self.spatial_index, self.rolling_window
+            )
+        else:
+            self.deduplicator.release(dedup_keys)
+
+    async def _upload(self, local_path, blob_name):
+        """Returns whether the blob is stored"""
+        try:
+            # Conditional upload, a blob with the same name already holds the same content
+            if self.async_storage is not None:
+                async with self.upload_slots:
+                    await self.async_storage.upload(local_path, blob_name, overwrite=False)
+            else:
+                await asyncio.get_running_loop().run_in_executor(
+                    self.upload_executor,
+                    functools.partial(self.writer.storage.upload, local_path, blob_name, overwrite=False)
+                )
+            self.metrics['uploads_completed'] += 1
+            logger.info(f"☁️ Uploaded to {self.writer.storage}: {self.container_name}/{blob_name}")
+        except FileExistsError:
+            self.metrics['uploads_skipped'] += 1
+            logger.info(f"Already uploaded, skipped: {self.container_name}/{blob_name}")
+        except Exception as e:
+            self.metrics['uploads_failed'] += 1
+            self.metrics['last_error'] = f"{blob_name}: {str(e)}"
+            logger.exception(f"Failed to upload {blob_name}")
+            return False
+        return True
+
+    def get_metrics(self):
+        return dict(
+            self.metrics,
+            uptime_seconds=round(time.time() - self.metrics['started_at'], 1),
+            queue_size=self.queue.qsize(),
+            uploads_in_flight=len(self.uploads),
+            stopping=self.stopping.is_set()
+        )
+
+    async def _serve_metrics(self, reader, writer):
+        # Minimal HTTP: GET /health, /metrics, /nearby?lat=&lon=&km= or
+        # /bbox?min_lat=&min_lon=&max_lat=&max_lon=, /profile, anything else is a 404
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode(errors="replace").split()
+            url = urlsplit(parts[1] if len(parts) > 1 else "/")
+            route = url.path
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+            if route == "/health":
+                status = "503 Service Unavailable" if self.stopping.is_set() else "200 OK"
+                body = {'status': 'draining' if self.stopping.is_set() else 'ok'}
+            elif route == "/metrics":
+                status, body = "200 OK", self.get_metrics()
+            elif route == "/profile":
+                status, body = "200 OK", self.data_profile.summary()
+            elif route in ("/nearby", "/bbox"):
+                try:
+                    if route == "/nearby":
+                        records = self.spatial_index.nearby(float(params['lat']), float(params['lon']),
+                                                            float(params.get('km', 50)))
+                    else:
+                        records = self.spatial_index.within_bbox(
+                            *(float(params[key]) for key in ('min_lat', 'min_lon', 'max_lat', 'max_lon'))
+                        )
+                    status, body = "200 OK", {'count': len(records), 'records': records}
+                except (KeyError, ValueError) as e:
+                    status, body = "400 Bad Request", {'error': f"Invalid query parameters: {str(e)}"}
+            else:
+                status, body = "404 Not Found", {'error': f"Unknown route {route}"}
+
+            payload = json.dumps(body).encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+if __name__ == "__main__":
+    # Get the absolute path to the input directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    input_dir = os.path.join(script_dir, "input")
+    asyncio.run(IngestionService(input_dir).run())
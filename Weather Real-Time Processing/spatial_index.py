@@ -0,0 +1,243 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from (lat, lon) to every (lats, lons), in km"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+# SpatialIndex class
+# - Latest observation per location_name, kept in flat NumPy arrays sorted by grid cell.
+# - A cell is cell_degrees x cell_degrees, its id is row * n_cols + col, so the cells of
+#   one grid row are a contiguous range of ids and a bounding box is one searchsorted per row.
+# - update() merges every new file in (newest observation wins): only the locations of the
+#   file are looked up (in their own cell) and replaced, moved or inserted, nothing is re-sorted.
+#   Queries only look at the cells the box or radius overlaps.
+# - The index is saved at most every save_interval seconds, flush() saves pending updates.
+class SpatialIndex:
+
+    value_columns = ['temperature_celsius', 'humidity', 'wind_kph', 'precip_mm', 'air_quality_us-epa-index']
+
+    def __init__(self, store_path=None, cell_degrees=1.0, save_interval=30.0):
+        if store_path is None:
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            store_path = os.path.join(script_dir, "state", "spatial_index.npz")
+        self.store_path = store_path
+        self.cell_degrees = cell_degrees
+        self.n_rows = int(np.ceil(180 / cell_degrees)) + 1
+        self.n_cols = int(np.ceil(360 / cell_degrees)) + 1
+        self.save_interval = save_interval
+        self.last_saved = time.monotonic()
+        self.dirty = False
+        # update() may run on several worker threads while the service queries
+        self.lock = threading.Lock()
+
+        self._set_arrays(
+            names=np.empty(0, dtype=object), countries=np.empty(0, dtype=object),
+            lats=np.empty(0), lons=np.empty(0), times=np.empty(0, dtype=np.int64),
+            values=np.empty((0, len(self.value_columns)))
+        )
+        self._load()
+
+    def _cell_rows_cols(self, lats, lons):
+        rows = np.floor((np.asarray(lats) + 90) / self.cell_degrees).astype(np.int64)
+        cols = np.floor((np.asarray(lons) + 180) / self.cell_degrees).astype(np.int64)
+        return np.clip(rows, 0, self.n_rows - 1), np.clip(cols, 0, self.n_cols - 1)
+
+    def _set_arrays(self, names, countries, lats, lons, times, values):
+        rows, cols = self._cell_rows_cols(lats, lons)
+        cells = rows * self.n_cols + cols
+        order = np.argsort(cells, kind='stable')
+        # Swap in a complete new set of arrays, queries see either the old or the new one
+        self.arrays = {
+            'names': names[order], 'countries': countries[order],
+            'lats': lats[order], 'lons': lons[order], 'times': times[order],
+            'values': values[order], 'cells': cells[order]
+        }
+        # Cell of every location, update() finds a location in its cell's range of the arrays
+        self.cell_by_name = dict(zip(self.arrays['names'].tolist(), self.arrays['cells'].tolist()))
+
+    def _position(self, arrays, name, cell):
+        """Position of name in the arrays, looked up within its cell"""
+        start = np.searchsorted(arrays['cells'], cell, side='left')
+        stop = np.searchsorted(arrays['cells'], cell, side='right')
+        return start + int(np.flatnonzero(arrays['names'][start:stop] == name)[0])
+
+    def update(self, df: pd.DataFrame):
+        """Merge the latest observation of every location in df into the index"""
+        if df is None or df.empty or not {'location_name', 'latitude', 'longitude'}.issubset(df.columns):
+            return self
+        if 'last_updated_epoch' in df.columns:
+            times = pd.to_numeric(df['last_updated_epoch'], errors='coerce')
+        elif 'last_updated' in df.columns:
+            times = pd.to_datetime(df['last_updated'], errors='coerce').astype('int64') // 10**9
+        else:
+            times = pd.Series(0, index=df.index)
+        new = pd.DataFrame({
+            'names': df['location_name'].astype(str),
+            'countries': df['country'].astype(str) if 'country' in df.columns else '',
+            'lats': pd.to_numeric(df['latitude'], errors='coerce'),
+            'lons': pd.to_numeric(df['longitude'], errors='coerce'),
+            'times': times.fillna(0).astype(np.int64),
+        })
+        for col in self.value_columns:
+            new[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else np.nan
+        new = new.dropna(subset=['lats', 'lons'])
+        # Stable sort by time, the newest observation of each location in the file is the last one
+        new = new.sort_values('times', kind='stable').drop_duplicates('names', keep='last')
+        rows, cols = self._cell_rows_cols(new['lats'].to_numpy(), new['lons'].to_numpy())
+        new['cells'] = rows * self.n_cols + cols
+
+        with self.lock:
+            current = self.arrays
+            replace, replace_rows, remove, insert_rows = [], [], [], []
+            for i, (name, cell, when) in enumerate(zip(new['names'], new['cells'], new['times'])):
+                old_cell = self.cell_by_name.get(name)
+                if old_cell is None:
+                    insert_rows.append(i)
+                    continue
+                position = self._position(current, name, old_cell)
+                if when < current['times'][position]:
+                    # An older observation than the indexed one
+                    continue
+                if cell == old_cell:
+                    replace.append(position)
+                    replace_rows.append(i)
+                else:
+                    remove.append(position)
+                    insert_rows.append(i)
+            if not replace and not insert_rows:
+                return self
+
+            columns = {
+                'names': new['names'].to_numpy(dtype=object), 'countries': new['countries'].to_numpy(dtype=object),
+                'lats': new['lats'].to_numpy(dtype=np.float64), 'lons': new['lons'].to_numpy(dtype=np.float64),
+                'times': new['times'].to_numpy(dtype=np.int64),
+                'values': new[self.value_columns].to_numpy(dtype=np.float64), 'cells': new['cells'].to_numpy()
+            }
+            # Copies, so queries running on the current arrays see either the old or the new ones
+            arrays = {key: array.copy() for key, array in current.items()}
+            for key, array in arrays.items():
+                array[replace] = columns[key][replace_rows]
+            if remove:
+                arrays = {key: np.delete(array, remove, axis=0) for key, array in arrays.items()}
+            if insert_rows:
+                # Inserted after the locations already in their cell, the cells stay sorted
+                insert_rows = np.asarray(insert_rows)[np.argsort(columns['cells'][insert_rows], kind='stable')]
+                at = np.searchsorted(arrays['cells'], columns['cells'][insert_rows], side='right')
+                arrays = {key: np.insert(array, at, columns[key][insert_rows], axis=0) for key, array in arrays.items()}
+            self.arrays = arrays
+            self.cell_by_name.update(zip(columns['names'][insert_rows].tolist(), columns['cells'][insert_rows].tolist()))
+            self.dirty = True
+            if time.monotonic() - self.last_saved >= self.save_interval:
+                self.save()
+        return self
+
+    def flush(self):
+        """Save the updates made since the last save"""
+        with self.lock:
+            if self.dirty:
+                self.save()
+
+    def _candidates(self, arrays, min_lat, max_lat, lon_ranges):
+        """Positions of the locations in the cells overlapping the latitude band and longitude ranges"""
+        row_lo, _ = self._cell_rows_cols(max(min_lat, -90), 0)
+        row_hi, _ = self._cell_rows_cols(min(max_lat, 90), 0)
+        rows = np.arange(row_lo, row_hi + 1)
+        starts, stops = [], []
+        for lon_lo, lon_hi in lon_ranges:
+            _, col_lo = self._cell_rows_cols(0, lon_lo)
+            _, col_hi = self._cell_rows_cols(0, lon_hi)
+            starts.append(np.searchsorted(arrays['cells'], rows * self.n_cols + col_lo, side='left'))
+            stops.append(np.searchsorted(arrays['cells'], rows * self.n_cols + col_hi, side='right'))
+        starts, stops = np.concatenate(starts), np.concatenate(stops)
+        keep = stops > starts
+        if not keep.any():
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(a, b) for a, b in zip(starts[keep], stops[keep])])
+
+    @staticmethod
+    def _lon_ranges(min_lon, max_lon):
+        # A box crossing the antimeridian is two longitude ranges
+        if max_lon - min_lon >= 360:
+            return [(-180, 180)]
+        min_lon = (min_lon + 180) % 360 - 180
+        max_lon = (max_lon + 180) % 360 - 180
+        if min_lon <= max_lon:
+            return [(min_lon, max_lon)]
+        return [(min_lon, 180), (-180, max_lon)]
+
+    def _records(self, arrays, positions, distances=None):
+        records = []
+        for n, i in enumerate(positions):
+            record = {
+                'location_name': arrays['names'][i], 'country': arrays['countries'][i],
+                'latitude': float(arrays['lats'][i]), 'longitude': float(arrays['lons'][i]),
+                'last_updated_epoch': int(arrays['times'][i]),
+            }
+            for col, value in zip(self.value_columns, arrays['values'][i]):
+                record[col] = None if np.isnan(value) else float(value)
+            if distances is not None:
+                record['distance_km'] = round(float(distances[n]), 3)
+            records.append(record)
+        return records
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Latest observation of every location inside the box, as a list of dicts"""
+        arrays = self.arrays
+        positions = self._candidates(arrays, min_lat, max_lat, self._lon_ranges(min_lon, max_lon))
+        lats, lons = arrays['lats'][positions], arrays['lons'][positions]
+        inside = (lats >= min_lat) & (lats <= max_lat)
+        in_lon_range = np.zeros(len(positions), dtype=bool)
+        for lon_lo, lon_hi in self._lon_ranges(min_lon, max_lon):
+            in_lon_range |= (lons >= lon_lo) & (lons <= lon_hi)
+        inside &= in_lon_range
+        return self._records(arrays, positions[inside])
+
+    def nearby(self, lat, lon, radius_km, limit=None):
+        """Latest observation of every location within radius_km of (lat, lon), nearest first"""
+        arrays = self.arrays
+        lat_delta = radius_km / KM_PER_DEGREE
+        cos_lat = np.cos(np.radians(min(abs(lat) + lat_delta, 90)))
+        lon_delta = 360 if cos_lat < 1e-6 else radius_km / (KM_PER_DEGREE * cos_lat)
+        positions = self._candidates(arrays, lat - lat_delta, lat + lat_delta,
+                                     self._lon_ranges(lon - lon_delta, lon + lon_delta))
+        distances = haversine_km(lat, lon, arrays['lats'][positions], arrays['lons'][positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')[:limit]
+        return self._records(arrays, positions[order], distances[order])
+
+    def _load(self):
+        if not os.path.exists(self.store_path):
+            return
+        try:
+            with np.load(self.store_path) as stored:
+                self._set_arrays(stored['names'].astype(object), stored['countries'].astype(object), stored['lats'],
+                                 stored['lons'], stored['times'], stored['values'])
+        except Exception as e:
+            print(f"Could not load spatial index {self.store_path}: {str(e)}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        arrays = self.arrays
+        self.dirty = False
+        self.last_saved = time.monotonic()
+        tmp_path = self.store_path + ".tmp.npz"
+        # Names as fixed-width strings, so loading never needs pickle
+        np.savez(tmp_path, names=arrays['names'].astype(str), countries=arrays['countries'].astype(str), lats=arrays['lats'],
+                 lons=arrays['lons'], times=arrays['times'], values=arrays['values'])
+        os.replace(tmp_path, self.store_path)
+
+    def __len__(self):
+        return len(self.arrays['names'])
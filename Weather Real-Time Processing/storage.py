@@ -0,0 +1,460 @@
+import os
+import time
+import asyncio
+import base64
+import random
+import shutil
+import hashlib
+import threading
+import contextlib
+
+
+# Storage backends for the Writer.
+# Every backend takes a finished local file and stores it under a blob name, with the
+# same overwrite semantics as Azure: overwrite=False raises FileExistsError when the
+# blob is already there. list_blobs(prefix) and delete(blob_name) let a writer remove
+# blobs of an earlier run. The backend is picked with STORAGE_BACKEND (azure, local or
+# memory), so tests and benchmarks can run the write path without the cloud account.
+# Uploads are retried with exponential backoff and go through a process-wide transfer
+# limiter, configured with UPLOAD_MAX_ATTEMPTS, UPLOAD_MAX_BYTES_PER_SECOND and
+# UPLOAD_MAX_CONCURRENCY.
+
+STORAGE_BACKENDS = ('azure', 'local', 'memory')
+
+# Files above this size are uploaded as a block list
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def default_storage_dir():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, "storage")
+
+
+# RetryPolicy class
+# - Calls a function again after a transient failure, waiting base_delay * 2^attempt
+#   (capped at max_delay, with jitter) between attempts.
+# - Only connection errors, timeouts and 408, 429 and 5xx responses are retried. Conflicts,
+#   auth and other 4xx errors, and any other exception, are raised straight away.
+class RetryPolicy:
+    def __init__(self, max_attempts=5, base_delay=0.5, max_delay=30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def transient_errors():
+        """Exception types of failed connections and timeouts, Azure's only when the SDK is installed"""
+        try:
+            from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+        except ImportError:
+            return (ConnectionError, TimeoutError)
+        return (ConnectionError, TimeoutError, ServiceRequestError, ServiceResponseError)
+
+    def is_retryable(self, error):
+        if isinstance(error, FileExistsError):
+            return False
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            return status in (408, 429) or status >= 500
+        # No status code: only connection and timeout errors, anything else is a bug or a bad request
+        return isinstance(error, self.transient_errors())
+
+    def delay(self, attempt):
+        return min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def call(self, func, *args, **kwargs):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts or not self.is_retryable(e):
+                    raise
+                delay = self.delay(attempt)
+                print(f"Upload attempt {attempt} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    async def call_async(self, func, *args, **kwargs):
+        """call() for coroutine functions, waits with asyncio.sleep"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts or not self.is_retryable(e):
+                    raise
+                delay = self.delay(attempt)
+                print(f"Upload attempt {attempt} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+# TransferLimiter class
+# - Token bucket on bytes sent plus a cap on concurrent uploads.
+# - One limiter is shared by every Writer in the process (see get_transfer_limiter), so
+#   a batch job can be capped to leave room for the real-time uploads on the same link.
+class TransferLimiter:
+    def __init__(self, max_bytes_per_second=None, max_concurrent=None):
+        self.max_bytes_per_second = max_bytes_per_second
+        self.max_concurrent = max_concurrent
+        self.slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        # Allow bursts of up to one second of traffic
+        self.tokens = max_bytes_per_second or 0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self, nbytes):
+        """Take nbytes from the bucket, returns the seconds to wait before sending them"""
+        if not self.max_bytes_per_second:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.max_bytes_per_second,
+                              self.tokens + (now - self.updated) * self.max_bytes_per_second)
+            self.updated = now
+            # Reserve the bytes now, callers that go into debt wait it off in order
+            self.tokens -= nbytes
+            return -self.tokens / self.max_bytes_per_second if self.tokens < 0 else 0
+
+    def acquire(self, nbytes):
+        """Block until nbytes may be sent"""
+        wait = self._reserve(nbytes)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, nbytes):
+        """acquire() for the event loop"""
+        wait = self._reserve(nbytes)
+        if wait:
+            await asyncio.sleep(wait)
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Hold one of the concurrent upload slots"""
+        if self.slots is None:
+            yield
+            return
+        with self.slots:
+            yield
+
+    @contextlib.asynccontextmanager
+    async def slot_async(self):
+        """slot() for the event loop, polls so a cancelled upload never holds a slot"""
+        if self.slots is None:
+            yield
+            return
+        while not self.slots.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+
+_transfer_limiter = None
+_transfer_limiter_lock = threading.Lock()
+
+
+def get_transfer_limiter():
+    """The process-wide limiter, from UPLOAD_MAX_BYTES_PER_SECOND and UPLOAD_MAX_CONCURRENCY"""
+    global _transfer_limiter
+    with _transfer_limiter_lock:
+        if _transfer_limiter is None:
+            max_bytes_per_second = os.environ.get("UPLOAD_MAX_BYTES_PER_SECOND")
+            max_concurrent = os.environ.get("UPLOAD_MAX_CONCURRENCY")
+            _transfer_limiter = TransferLimiter(
+                float(max_bytes_per_second) if max_bytes_per_second else None,
+                int(max_concurrent) if max_concurrent else None
+            )
+        return _transfer_limiter
+
+
+def _block_id(index, data):
+    # The id covers position and content, so a staged block is only reused
+    # when it holds exactly these bytes
+    return base64.b64encode(f"{index:06d}-{hashlib.md5(data).hexdigest()}".encode()).decode()
+
+
+# AzureBlobStorage class
+# - Uploads to a container of an Azure Storage account.
+# - Small files go up in one request, larger ones as a block list: every block is retried
+#   on its own, and blocks already staged by an earlier failed attempt are not sent again.
+class AzureBlobStorage:
+    name = 'azure'
+
+    def __init__(self, connection_string, container_name, retry=None, limiter=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.connection_string = connection_string
+        self.container_name = container_name
+        self.retry = retry or RetryPolicy()
+        self.limiter = limiter or get_transfer_limiter()
+        self.block_size = block_size
+        # The Azure SDK is only imported by runs that actually upload
+        from azure.storage.blob import BlobServiceClient
+        # Retries are handled by self.retry, per request or per block
+        self.blob_service_client = BlobServiceClient.from_connection_string(connection_string, retry_total=0)
+
+    def __str__(self):
+        return "Azure Blob Storage"
+
+    def get_blob_client(self, blob_name):
+        return self.blob_service_client.get_blob_client(container=self.container_name, blob=blob_name)
+
+    def upload(self, local_path, blob_name, overwrite=True):
+        from azure.core.exceptions import ResourceExistsError
+        blob_client = self.get_blob_client(blob_name)
+        try:
+            with self.limiter.slot():
+                if os.path.getsize(local_path) <= self.block_size:
+                    self.retry.call(self._upload_single, blob_client, local_path, overwrite)
+                else:
+                    self._upload_blocks(blob_client, local_path, overwrite)
+        except ResourceExistsError:
+            raise FileExistsError(f"Blob already exists: {self.container_name}/{blob_name}")
+
+    def _upload_single(self, blob_client, local_path, overwrite):
+        with open(local_path, "rb") as data_file:
+            data = data_file.read()
+        self.limiter.acquire(len(data))
+        blob_client.upload_blob(data, overwrite=overwrite)
+
+    def _upload_blocks(self, blob_client, local_path, overwrite):
+        from azure.core import MatchConditions
+        from azure.storage.blob import BlobBlock
+        if not overwrite and self.retry.call(blob_client.exists):
+            raise FileExistsError(blob_client.blob_name)
+
+        staged = self._staged_block_ids(blob_client)
+        blocks = []
+        with open(local_path, "rb") as data_file:
+            index = 0
+            while True:
+                data = data_file.read(self.block_size)
+                if not data:
+                    break
+                block_id = _block_id(index, data)
+                if block_id not in staged:
+                    self.limiter.acquire(len(data))
+                    self.retry.call(blob_client.stage_block, block_id, data, length=len(data))
+                blocks.append(BlobBlock(block_id=block_id))
+                index += 1
+
+        # Commit is the only step that makes the blob visible, still If-None-Match: *
+        # without overwrite in case another writer got there first
+        conditions = {} if overwrite else {'match_condition': MatchConditions.IfMissing}
+        self.retry.call(blob_client.commit_block_list, blocks, **conditions)
+        if staged:
+            print(f"Resumed upload of {blob_client.blob_name}, {len(staged)} blocks were already staged")
+
+    def _staged_block_ids(self, blob_client):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            _, uncommitted = self.retry.call(blob_client.get_block_list, 'uncommitted')
+        except ResourceNotFoundError:
+            return set()
+        return {block.id for block in uncommitted}
+
+    def exists(self, blob_name):
+        return self.get_blob_client(blob_name).exists()
+
+    def list_blobs(self, prefix):
+        container_client = self.blob_service_client.get_container_client(self.container_name)
+        return [blob.name for blob in self.retry.call(lambda: list(container_client.list_blobs(name_starts_with=prefix)))]
+
+    def delete(self, blob_name):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            self.retry.call(self.get_blob_client(blob_name).delete_blob)
+        except ResourceNotFoundError:
+            pass
+
+
+# AsyncAzureBlobStorage class
+# - The uploads of AzureBlobStorage on the async client (azure.storage.blob.aio), for the
+#   asyncio ingestion service: same retry policy, block resume and transfer limiter, but
+#   waiting never blocks the event loop.
+# - Used as an async context manager, which opens and closes the client session.
+class AsyncAzureBlobStorage:
+    name = 'azure'
+
+    def __init__(self, connection_string, container_name, retry=None, limiter=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.connection_string = connection_string
+        self.container_name = container_name
+        self.retry = retry or RetryPolicy()
+        self.limiter = limiter or get_transfer_limiter()
+        self.block_size = block_size
+        self.blob_service_client = None
+
+    def __str__(self):
+        return "Azure Blob Storage"
+
+    async def __aenter__(self):
+        from azure.storage.blob.aio import BlobServiceClient
+        self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string, retry_total=0)
+        await self.blob_service_client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.blob_service_client.close()
+
+    def get_blob_client(self, blob_name):
+        return self.blob_service_client.get_blob_client(container=self.container_name, blob=blob_name)
+
+    async def upload(self, local_path, blob_name, overwrite=True):
+        from azure.core.exceptions import ResourceExistsError
+        blob_client = self.get_blob_client(blob_name)
+        try:
+            async with self.limiter.slot_async():
+                if os.path.getsize(local_path) <= self.block_size:
+                    await self.retry.call_async(self._upload_single, blob_client, local_path, overwrite)
+                else:
+                    await self._upload_blocks(blob_client, local_path, overwrite)
+        except ResourceExistsError:
+            raise FileExistsError(f"Blob already exists: {self.container_name}/{blob_name}")
+
+    async def _upload_single(self, blob_client, local_path, overwrite):
+        with open(local_path, "rb") as data_file:
+            data = data_file.read()
+        await self.limiter.acquire_async(len(data))
+        await blob_client.upload_blob(data, overwrite=overwrite)
+
+    async def _upload_blocks(self, blob_client, local_path, overwrite):
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceNotFoundError
+        from azure.storage.blob import BlobBlock
+        if not overwrite and await self.retry.call_async(blob_client.exists):
+            raise FileExistsError(blob_client.blob_name)
+
+        try:
+            _, uncommitted = await self.retry.call_async(blob_client.get_block_list, 'uncommitted')
+            staged = {block.id for block in uncommitted}
+        except ResourceNotFoundError:
+            staged = set()
+
+        blocks = []
+        with open(local_path, "rb") as data_file:
+            index = 0
+            while True:
+                data = data_file.read(self.block_size)
+                if not data:
+                    break
+                block_id = _block_id(index, data)
+                if block_id not in staged:
+                    await self.limiter.acquire_async(len(data))
+                    await self.retry.call_async(blob_client.stage_block, block_id, data, length=len(data))
+                blocks.append(BlobBlock(block_id=block_id))
+                index += 1
+
+        conditions = {} if overwrite else {'match_condition': MatchConditions.IfMissing}
+        await self.retry.call_async(blob_client.commit_block_list, blocks, **conditions)
+        if staged:
+            print(f"Resumed upload of {blob_client.blob_name}, {len(staged)} blocks were already staged")
+
+
+# LocalDirectoryStorage class
+# - Stores blobs as files under <root_dir>/<container_name>/<blob_name>.
+class LocalDirectoryStorage:
+    name = 'local'
+
+    def __init__(self, container_name, root_dir=None, limiter=None):
+        self.container_name = container_name
+        self.root_dir = root_dir or default_storage_dir()
+        self.container_dir = os.path.join(self.root_dir, container_name)
+        self.limiter = limiter or get_transfer_limiter()
+        os.makedirs(self.container_dir, exist_ok=True)
+
+    def __str__(self):
+        return f"local storage ({self.root_dir})"
+
+    def blob_path(self, blob_name):
+        return os.path.join(self.container_dir, *blob_name.split("/"))
+
+    def upload(self, local_path, blob_name, overwrite=True):
+        target_path = self.blob_path(blob_name)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # Copy next to the target, then publish it with a single rename or link,
+        # so other processes never see a partial blob
+        tmp_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self.limiter.slot():
+            self.limiter.acquire(os.path.getsize(local_path))
+            shutil.copyfile(local_path, tmp_path)
+        try:
+            if overwrite:
+                os.replace(tmp_path, target_path)
+            else:
+                # link fails when the target exists, like If-None-Match: *
+                os.link(tmp_path, target_path)
+        except FileExistsError:
+            raise FileExistsError(f"Blob already exists: {self.container_name}/{blob_name}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def exists(self, blob_name):
+        return os.path.exists(self.blob_path(blob_name))
+
+    def list_blobs(self, prefix):
+        names = []
+        for dir_path, _, file_names in os.walk(self.container_dir):
+            relative_dir = os.path.relpath(dir_path, self.container_dir).replace(os.sep, "/")
+            for file_name in file_names:
+                name = file_name if relative_dir == "." else f"{relative_dir}/{file_name}"
+                if name.startswith(prefix) and not name.endswith(".tmp"):
+                    names.append(name)
+        return sorted(names)
+
+    def delete(self, blob_name):
+        path = self.blob_path(blob_name)
+        if os.path.exists(path):
+            os.remove(path)
+        # Blob stores have no directories, drop the ones left empty
+        parent = os.path.dirname(path)
+        while parent != self.container_dir and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+
+# MemoryStorage class
+# - Keeps blob contents in a dict, for tests and for benchmarking the write path
+#   without any upload latency.
+class MemoryStorage:
+    name = 'memory'
+
+    def __init__(self, container_name=None, limiter=None):
+        self.container_name = container_name
+        self.limiter = limiter or get_transfer_limiter()
+        self.blobs = {}
+        self.lock = threading.Lock()
+
+    def __str__(self):
+        return "memory storage"
+
+    def upload(self, local_path, blob_name, overwrite=True):
+        with self.limiter.slot():
+            with open(local_path, "rb") as data_file:
+                content = data_file.read()
+            self.limiter.acquire(len(content))
+        with self.lock:
+            if not overwrite and blob_name in self.blobs:
+                raise FileExistsError(f"Blob already exists: {self.container_name}/{blob_name}")
+            self.blobs[blob_name] = content
+
+    def exists(self, blob_name):
+        return blob_name in self.blobs
+
+    def list_blobs(self, prefix):
+        with self.lock:
+            return sorted(name for name in self.blobs if name.startswith(prefix))
+
+    def delete(self, blob_name):
+        with self.lock:
+            self.blobs.pop(blob_name, None)
+
+
+def get_storage(connection_string, container_name, backend=None):
+    """Create the storage backend, from the backend argument or the STORAGE_BACKEND variable (default azure)"""
+    backend = backend or os.environ.get("STORAGE_BACKEND", "azure")
+    if backend == 'azure':
+        retry = RetryPolicy(max_attempts=int(os.environ.get("UPLOAD_MAX_ATTEMPTS", 5)))
+        return AzureBlobStorage(connection_string, container_name, retry=retry)
+    if backend == 'local':
+        return LocalDirectoryStorage(container_name, os.environ.get("STORAGE_DIR"))
+    if backend == 'memory':
+        return MemoryStorage(container_name)
+    raise ValueError(f"Unknown storage backend '{backend}', expected one of {STORAGE_BACKENDS}")
@@ -0,0 +1,42 @@
+import os
+import sys
+
+# The pipeline modules are flat scripts next to this folder
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules of this pipeline loaded so far, by name
+_modules = {}
+
+
+def _activate():
+    # Both pipelines have a main.py, reader.py, validator.py...: this folder goes first on the
+    # path, modules of the same name loaded from the other pipeline are dropped and the ones
+    # of this pipeline brought back, so the tests of both can run in one session
+    if PIPELINE_DIR in sys.path:
+        sys.path.remove(PIPELINE_DIR)
+    sys.path.insert(0, PIPELINE_DIR)
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        if not path or not os.path.exists(os.path.join(PIPELINE_DIR, name + '.py')):
+            continue
+        if os.path.dirname(os.path.abspath(path)) == PIPELINE_DIR:
+            _modules[name] = module
+        else:
+            del sys.modules[name]
+    for name, module in _modules.items():
+        sys.modules.setdefault(name, module)
+
+
+def pytest_pycollect_makemodule(module_path, parent):
+    # Before a test module of this pipeline is imported
+    _activate()
+
+
+def pytest_itemcollected(item):
+    # Keeps the modules a test module imported before the other pipeline is collected
+    _activate()
+
+
+def pytest_runtest_setup(item):
+    # Modules imported inside a test (a stage loaded on demand, a pickled function) resolve here
+    _activate()
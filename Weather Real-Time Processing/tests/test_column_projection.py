@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+from main import needed_columns
+from processor import Processor
+from reader import Reader, read_table, select_columns
+from validator import Validator
+
+
+@pytest.fixture
+def weather():
+    return pd.DataFrame({
+        'location_name': ['Brussels', 'Paris'], 'temperature_celsius': [13.9, 21.5],
+        'station_notes': ['new sensor', ''], 'uv_index': [3.0, 5.0],
+    })
+
+
+def test_needed_columns_cover_the_validator_and_the_processor():
+    needed = needed_columns()
+    for column in Validator(None).required_columns() + Processor.required_columns():
+        assert needed(column), column
+    assert not needed('station_notes')
+    assert needed_columns(['uv_index'])('uv_index')
+
+
+def test_select_columns_keeps_the_file_order():
+    names = ['a', 'b', 'c']
+    assert select_columns(names, None) == names
+    assert select_columns(names, ['c', 'a']) == ['a', 'c']
+    assert select_columns(names, lambda name: name != 'b') == ['a', 'c']
+
+
+@pytest.mark.parametrize('name', ['weather.csv', 'weather.csv.gz', 'weather.parquet', 'weather.feather'])
+def test_only_the_selected_columns_are_read(tmp_path, weather, name):
+    path = tmp_path / name
+    if name.endswith('.parquet'):
+        pytest.importorskip("pyarrow")
+        weather.to_parquet(path, index=False)
+    elif name.endswith('.feather'):
+        pytest.importorskip("pyarrow")
+        weather.to_feather(path)
+    else:
+        weather.to_csv(path, index=False)
+    assert list(read_table(path, ['temperature_celsius', 'location_name']).columns) == \
+        ['location_name', 'temperature_celsius']
+    data = Reader(str(path), columns=needed_columns()).load_data()
+    assert 'station_notes' not in data.columns and 'temperature_celsius' in data.columns
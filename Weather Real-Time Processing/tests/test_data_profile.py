@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data_profile import HyperLogLog, QuantileSketch, ColumnProfile, DataProfile
+
+
+def rank_error(sketch, values, qs):
+    """Largest distance between the wanted ranks and the true ranks of the sketch's answers"""
+    values = np.sort(values)
+    ranks = np.searchsorted(values, sketch.quantiles(qs), side='right') / len(values)
+    return float(np.max(np.abs(ranks - np.asarray(qs))))
+
+
+@pytest.mark.parametrize('distinct', [10, 1000, 200_000])
+def test_hyperloglog_estimate(distinct):
+    sketch = HyperLogLog().add(np.arange(distinct))
+    assert abs(sketch.estimate() - distinct) <= max(1, 0.05 * distinct)
+
+
+def test_hyperloglog_merge_equals_the_sketch_of_all_values():
+    left = HyperLogLog().add(np.arange(0, 60_000))
+    right = HyperLogLog().add(np.arange(40_000, 100_000))
+    both = HyperLogLog().add(np.arange(0, 100_000))
+    merged = left.merge(right)
+    assert np.array_equal(merged.registers, both.registers)
+    assert abs(merged.estimate() - 100_000) <= 5_000
+
+
+def test_hyperloglog_counts_equal_numbers_and_texts_once():
+    sketch = HyperLogLog().add(pd.Series([5, 5.0, None, 7]))
+    sketch.add(pd.Series(['a', 'b', 'a']))
+    assert sketch.estimate() == 4
+
+
+def test_quantile_sketch_stays_small_and_accurate():
+    values = np.random.default_rng(0).normal(size=200_000)
+    sketch = QuantileSketch(k=200)
+    for chunk in np.array_split(values, 50):
+        sketch.add(chunk)
+    assert sketch.n == len(values)
+    assert sum(len(level) for level in sketch.levels) < 4 * 200
+    assert rank_error(sketch, values, [0.01, 0.1, 0.5, 0.9, 0.99]) < 0.02
+
+
+def test_quantile_sketch_merge():
+    rng = np.random.default_rng(1)
+    left_values, right_values = rng.uniform(0, 1, 100_000), rng.uniform(0.5, 2, 50_000)
+    left = QuantileSketch(k=200, seed=1).add(left_values)
+    right = QuantileSketch(k=200, seed=2).add(right_values)
+    merged = left.merge(right)
+    assert merged.n == 150_000
+    assert rank_error(merged, np.concatenate([left_values, right_values]), [0.1, 0.25, 0.5, 0.75, 0.9]) < 0.02
+
+
+def test_quantile_sketch_ignores_missing_values():
+    sketch = QuantileSketch().add([np.nan, 1.0, 2.0, 3.0])
+    assert sketch.n == 3
+    assert sketch.quantiles([0.5])[0] == 2.0
+    assert np.isnan(QuantileSketch().quantiles([0.5])).all()
+
+
+def test_column_profiles_merge_to_the_profile_of_all_rows():
+    values = pd.Series(np.random.default_rng(2).normal(10, 3, 10_000))
+    values[::100] = np.nan
+    merged = ColumnProfile.of(values[:3000]).merge(ColumnProfile.of(values[3000:]))
+    whole = ColumnProfile.of(values)
+    assert (merged.rows, merged.nulls, merged.count) == (whole.rows, whole.nulls, whole.count)
+    assert merged.mean == pytest.approx(whole.mean)
+    assert merged.std == pytest.approx(whole.std)
+    assert (merged.minimum, merged.maximum) == (whole.minimum, whole.maximum)
+    assert np.array_equal(merged.distinct.registers, whole.distinct.registers)
+
+
+def test_data_profile_reports_drift_and_persists(tmp_path):
+    store_path = str(tmp_path / "data_profile.npz")
+    rng = np.random.default_rng(3)
+    profile = DataProfile(store_path=store_path, drift_columns=['temperature_celsius'])
+    profile.update(pd.DataFrame({'temperature_celsius': rng.normal(20, 2, 5000), 'country': 'Belgium'}))
+
+    same = profile.update(pd.DataFrame({'temperature_celsius': rng.normal(20, 2, 500)}))
+    assert not same['temperature_celsius']['drifted']
+    shifted = profile.update(pd.DataFrame({'temperature_celsius': rng.normal(35, 2, 500)}))
+    assert shifted['temperature_celsius']['drifted']
+
+    restarted = DataProfile(store_path=store_path, drift_columns=['temperature_celsius'])
+    assert restarted.files == 3
+    assert restarted.summary() == profile.summary()
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+import pytest
+import deduplicator as deduplicator_module
+import pipeline
+from deduplicator import BloomFilter, Deduplicator
+
+
+def frame(names, last_updated='2024-05-16 08:45'):
+    return pd.DataFrame({
+        'location_name': names, 'country': 'Belgium', 'latitude': 50.85, 'longitude': 4.35,
+        'last_updated': last_updated
+    })
+
+
+def kept_names(deduplicator, df):
+    keep, keys = deduplicator.filter(df)
+    return df['location_name'][keep].tolist(), keys
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "dedup_store.npz")
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    hashes = np.random.default_rng(0).integers(0, 2**63, 10_000, dtype=np.uint64)
+    bloom.add(hashes)
+    assert bloom.might_contain(hashes).all()
+    others = np.random.default_rng(1).integers(0, 2**63, 10_000, dtype=np.uint64)
+    assert bloom.might_contain(others).mean() < 0.03
+
+
+def test_duplicates_within_a_file_are_dropped(store_path):
+    deduplicator = Deduplicator(store_path=store_path)
+    names, keys = kept_names(deduplicator, frame(['A', 'B', 'A', 'C', 'B']))
+    assert names == ['A', 'B', 'C']
+    assert len(keys) == 3
+
+
+def test_committed_keys_drop_records_of_later_files(store_path):
+    deduplicator = Deduplicator(store_path=store_path)
+    _, keys = kept_names(deduplicator, frame(['A', 'B']))
+    deduplicator.commit(keys)
+    names, _ = kept_names(deduplicator, frame(['A', 'B', 'C']))
+    assert names == ['C']
+    # Another observation time of the same location is a new record
+    names, _ = kept_names(deduplicator, frame(['A'], last_updated='2024-05-16 09:00'))
+    assert names == ['A']
+
+
+def test_keys_of_a_file_in_flight_count_as_seen(store_path):
+    deduplicator = Deduplicator(store_path=store_path)
+    kept_names(deduplicator, frame(['A', 'B']))
+    names, _ = kept_names(deduplicator, frame(['A', 'B', 'C']))
+    assert names == ['C']
+
+
+def test_released_keys_are_kept_again_after_a_failed_write(store_path):
+    deduplicator = Deduplicator(store_path=store_path)
+    _, keys = kept_names(deduplicator, frame(['A', 'B']))
+    deduplicator.release(keys)
+    names, keys = kept_names(deduplicator, frame(['A', 'B']))
+    assert names == ['A', 'B']
+    assert len(deduplicator) == 0
+
+
+def test_committed_keys_survive_a_restart(store_path):
+    deduplicator = Deduplicator(store_path=store_path)
+    _, keys = kept_names(deduplicator, frame(['A', 'B']))
+    deduplicator.commit(keys)
+    # Reserved but never committed keys are not persisted
+    kept_names(deduplicator, frame(['C']))
+    restarted = Deduplicator(store_path=store_path)
+    assert len(restarted) == 2
+    names, _ = kept_names(restarted, frame(['A', 'C']))
+    assert names == ['C']
+
+
+def test_keys_expire_after_the_ttl(store_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(deduplicator_module.time, 'time', lambda: now[0])
+    deduplicator = Deduplicator(store_path=store_path, ttl_seconds=3600)
+    _, keys = kept_names(deduplicator, frame(['A']))
+    deduplicator.commit(keys)
+    now[0] += 1800
+    _, keys = kept_names(deduplicator, frame(['B']))
+    deduplicator.commit(keys)
+
+    now[0] += 1801
+    names, _ = kept_names(deduplicator, frame(['A', 'B']))
+    assert names == ['A']
+    assert len(deduplicator) == 1
+
+
+def test_store_keeps_the_newest_max_entries(store_path):
+    deduplicator = Deduplicator(store_path=store_path, max_entries=3)
+    for name in ['A', 'B', 'C', 'D', 'E']:
+        _, keys = kept_names(deduplicator, frame([name]))
+        deduplicator.commit(keys)
+    assert len(deduplicator) == 3
+    names, _ = kept_names(deduplicator, frame(['A', 'B', 'C', 'D', 'E']))
+    assert names == ['A', 'B']
+
+
+def test_data_without_key_columns_is_kept(store_path):
+    deduplicator = Deduplicator(store_path=store_path)
+    keep, keys = deduplicator.filter(pd.DataFrame({'location_name': ['A', 'A']}))
+    assert keep.all() and len(keys) == 0
+
+
+# FakeWriter class
+# - save_local/upload of the Writer, the first fail_uploads uploads raise.
+class FakeWriter:
+    def __init__(self, fail_uploads=0):
+        self.fail_uploads = fail_uploads
+        self.uploaded = []
+
+    def save_local(self, df, filename, output_path):
+        return output_path, filename
+
+    def upload(self, local_path, blob_name):
+        if self.fail_uploads:
+            self.fail_uploads -= 1
+            raise ConnectionError("upload failed")
+        self.uploaded.append(blob_name)
+
+
+def run_pipeline(writer, deduplicator, files, monkeypatch):
+    """Run files (name -> DataFrame) through the weather pipeline, returns the rows each write kept"""
+    written = []
+    monkeypatch.setattr(pipeline, 'WRITE_ROLLUPS', False)
+    monkeypatch.setattr(pipeline, 'read_and_validate', lambda file_path, dead_letter_sink: files[file_path])
+
+    def process_data(valid_data, deduplicator, *state):
+        keep, keys = deduplicator.filter(valid_data)
+        written.append(valid_data['location_name'][keep].tolist())
+        return valid_data[keep], keys
+
+    monkeypatch.setattr(pipeline, 'process_data', process_data)
+    weather_pipeline = pipeline.build_weather_pipeline(writer, "out/processed_weather.csv", deduplicator=deduplicator)
+    weather_pipeline.start()
+    for file_path in files:
+        weather_pipeline.submit(file_path)
+    weather_pipeline.close()
+    return written
+
+
+def test_records_of_a_failed_upload_are_not_taken_for_duplicates(store_path, monkeypatch):
+    deduplicator = Deduplicator(store_path=store_path)
+    writer = FakeWriter(fail_uploads=1)
+    assert run_pipeline(writer, deduplicator, {'a.csv': frame(['A', 'B'])}, monkeypatch) == [['A', 'B']]
+    assert writer.uploaded == [] and len(deduplicator) == 0
+
+    # The same file again: its records were never stored, so they go through this time
+    assert run_pipeline(writer, deduplicator, {'a.csv': frame(['A', 'B'])}, monkeypatch) == [['A', 'B']]
+    assert writer.uploaded == ['processed_weather.csv'] and len(deduplicator) == 2
+    assert run_pipeline(writer, deduplicator, {'b.csv': frame(['A', 'C'])}, monkeypatch) == [['C']]
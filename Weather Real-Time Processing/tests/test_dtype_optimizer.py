@@ -0,0 +1,48 @@
+import io
+import numpy as np
+import pandas as pd
+from dtype_optimizer import DtypeOptimizer
+
+
+def weather():
+    return pd.DataFrame({
+        'humidity': np.array([80, 64, 55, 70], dtype=np.int64),
+        'wind_degree': [-10, 200, 340, 90],
+        'cloud': [25.0, np.nan, 0.0, 100.0],
+        'uv_index': [0.5, 1.25, 3.0, 2.5],
+        'temperature_celsius': [13.9, 21.5, 18.2, 9.1],
+        'country': ['Belgium', 'Belgium', 'Belgium', 'France'],
+        'location_name': ['Brussels', 'Ghent', 'Bruges', 'Paris'],
+    })
+
+
+def test_columns_get_the_smallest_lossless_type():
+    optimizer = DtypeOptimizer()
+    optimized = optimizer.optimize(weather())
+    assert optimized.dtypes.astype(str).to_dict() == {
+        'humidity': 'uint8', 'wind_degree': 'int16', 'cloud': 'UInt8', 'uv_index': 'float32',
+        # 13.9 and friends are not exact in float32
+        'temperature_celsius': 'float64',
+        'country': 'category', 'location_name': str(weather()['location_name'].dtype),
+    }
+    report = optimizer.get_report()
+    assert report['memory_after_bytes'] < report['memory_before_bytes']
+    assert set(report['columns']) == {'humidity', 'wind_degree', 'cloud', 'uv_index', 'country'}
+
+
+def test_optimized_frame_round_trips():
+    original = weather()
+    optimized = DtypeOptimizer().optimize(original)
+    for col in original.columns:
+        restored = optimized[col].astype(original[col].dtype)
+        pd.testing.assert_series_equal(restored, original[col])
+    # The written file reads back to the same values
+    written = pd.read_csv(io.StringIO(optimized.to_csv(index=False)))
+    pd.testing.assert_frame_equal(written, pd.read_csv(io.StringIO(original.to_csv(index=False))), check_dtype=False)
+
+
+def test_excluded_columns_and_the_input_are_left_alone():
+    original = weather()
+    optimized = DtypeOptimizer(exclude=['humidity']).optimize(original)
+    assert optimized['humidity'].dtype == np.int64
+    assert original['country'].dtype != 'category'
@@ -0,0 +1,60 @@
+import json
+import pandas as pd
+import pytest
+from error_budget import ErrorBudget
+from validator import Validator
+
+
+@pytest.fixture
+def rules_path(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({'rules': [
+        {'rule': 'missing:humidity', 'column': 'humidity', 'check': 'not_null',
+         'message': "Record {row}: Missing value in 'humidity'"},
+        {'rule': 'format:humidity', 'column': 'humidity', 'check': 'convertible', 'to': ['float'],
+         'message': "Record {row}: 'humidity' is not a number"},
+    ]}))
+    return str(path)
+
+
+def weather(bad_rows, good_rows):
+    return pd.DataFrame({'humidity': ['wet'] * bad_rows + [50] * good_rows}, dtype=object)
+
+
+def test_budget_limits():
+    assert ErrorBudget(max_error_rate=0.5).exceeded(100, 50, 50) is None
+    assert "51.0% invalid rows after 100 rows" in ErrorBudget(max_error_rate=0.5).exceeded(100, 51, 51)
+    assert "11 errors after 20 rows" in ErrorBudget(max_errors=10).exceeded(20, 1, 11)
+    assert ErrorBudget().exceeded(10, 10, 10) is None
+    with pytest.raises(ValueError):
+        ErrorBudget(max_error_rate=1.5)
+    with pytest.raises(ValueError):
+        ErrorBudget(chunk_size=0)
+
+
+def test_validation_stops_after_the_chunk_that_blows_the_budget(rules_path):
+    validator = Validator(weather(bad_rows=30, good_rows=70), rules_path=rules_path,
+                          error_budget=ErrorBudget(max_error_rate=0.5, chunk_size=10))
+    errors = validator.validate()
+    assert validator.budget_exceeded and validator.rows_checked == 10
+    assert "100.0% invalid rows after 10 rows" in validator.termination_reason
+    # The rows after the stop were never checked
+    assert len(errors) == 10
+    assert validator.summary()['total_records'] == 10
+
+
+def test_a_file_within_budget_is_validated_to_the_end(rules_path):
+    validator = Validator(weather(bad_rows=3, good_rows=97), rules_path=rules_path,
+                          error_budget=ErrorBudget(max_error_rate=0.5, chunk_size=10))
+    validator.validate()
+    assert not validator.budget_exceeded and validator.rows_checked == 100
+    assert validator.summary()['invalid_records'] == 3
+    assert len(validator.get_validated_data(filter_invalid=True)) == 97
+
+
+def test_chunked_validation_finds_the_errors_of_a_single_pass(rules_path):
+    data = pd.DataFrame({'humidity': ['wet', 50, None, 'dry', 70, 'x', 80] * 5}, dtype=object)
+    chunked = Validator(data, rules_path=rules_path, error_budget=ErrorBudget(chunk_size=3))
+    single = Validator(data, rules_path=rules_path)
+    assert [str(error) for error in chunked.validate()] == [str(error) for error in single.validate()]
+    assert chunked.get_rejected_data()['rule_codes'].tolist() == single.get_rejected_data()['rule_codes'].tolist()
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+from reader import get_reader
+
+pytest.importorskip("polars")
+
+COMPRESSIONS = {
+    '.csv': None, '.csv.gz': 'gzip', '.csv.bz2': 'bz2', '.csv.xz': 'xz', '.csv.zip': 'zip',
+}
+
+
+@pytest.fixture
+def weather():
+    return pd.DataFrame({
+        'location_name': ['Brussels', 'Paris', 'NA', 'Lyon'],
+        'country': ['Belgium', 'France', 'France', None],
+        'latitude': [50.85, 48.86, 45.0, 45.76],
+        'temperature_celsius': [13.9, None, 21.5, 18.0],
+        'humidity': [80, 64, 55, 70],
+    })
+
+
+def read(engine, path, columns=None):
+    return get_reader(engine)(str(path), columns=columns).load_data()
+
+
+@pytest.mark.parametrize('suffix', COMPRESSIONS)
+def test_both_engines_read_every_csv_compression(tmp_path, weather, suffix):
+    path = tmp_path / f"weather{suffix}"
+    weather.to_csv(path, index=False, compression=COMPRESSIONS[suffix])
+    expected = read('pandas', path)
+    actual = read('polars', path)
+    assert actual is not None, f"polars could not read {suffix}"
+    assert len(expected) == len(weather)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.csv.bz2'])
+def test_both_engines_parse_only_the_selected_columns(tmp_path, weather, suffix):
+    path = tmp_path / f"weather{suffix}"
+    weather.to_csv(path, index=False, compression=COMPRESSIONS[suffix])
+    columns = lambda name: name in ('location_name', 'humidity')
+    for engine in ('pandas', 'polars'):
+        assert list(read(engine, path, columns).columns) == ['location_name', 'humidity']
+
+
+def test_both_engines_read_parquet_and_arrow(tmp_path, weather):
+    pytest.importorskip("pyarrow")
+    for path in (tmp_path / "weather.parquet", tmp_path / "weather.arrow"):
+        if path.suffix == '.parquet':
+            weather.to_parquet(path, index=False)
+        else:
+            weather.to_feather(path)
+        pd.testing.assert_frame_equal(read('polars', path), read('pandas', path), check_dtype=False)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError, match="Unknown engine"):
+        get_reader('duckdb')
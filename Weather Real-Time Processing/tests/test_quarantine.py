@@ -0,0 +1,64 @@
+import json
+import threading
+import pandas as pd
+import pytest
+from quarantine import quarantine_file, DeadLetterSink
+
+
+def rejected_rows():
+    return pd.DataFrame({'location_name': ['Brussels'], 'temperature_celsius': ['hot'], 'rule_codes': ['T01']})
+
+
+def test_sources_sharing_a_basename_are_both_quarantined(tmp_path):
+    quarantine_dir = str(tmp_path / "quarantine")
+    targets = []
+    for folder in ('east', 'west'):
+        source = tmp_path / folder / "weather.csv.gz"
+        source.parent.mkdir()
+        source.write_bytes(folder.encode())
+        targets.append(quarantine_file(str(source), f"{folder} failed", quarantine_dir=quarantine_dir))
+
+    assert targets[0] != targets[1]
+    for folder, target in zip(('east', 'west'), targets):
+        assert target.endswith(".csv.gz")
+        with open(target, 'rb') as quarantined:
+            assert quarantined.read() == folder.encode()
+        with open(target + ".reason.json") as reason_file:
+            assert json.load(reason_file)['reason'] == f"{folder} failed"
+
+
+def test_copy_leaves_the_source_in_place(tmp_path):
+    source = tmp_path / "weather.csv"
+    source.write_text("location_name\n")
+    target = quarantine_file(str(source), "bad", quarantine_dir=str(tmp_path / "quarantine"), move=False)
+    assert source.exists() and target != str(source)
+
+
+def test_finished_writes_are_not_kept(tmp_path):
+    with DeadLetterSink(dead_letter_dir=str(tmp_path)) as sink:
+        for i in range(5):
+            sink.submit(rejected_rows(), f"weather_{i}.csv").result()
+        assert len(sink.pending) == 1
+    assert len(list(tmp_path.iterdir())) == 5
+
+
+def test_failed_writes_are_reported_when_they_happen(tmp_path, capsys):
+    started, release = threading.Event(), threading.Event()
+
+    def uploader(local_path, blob_name):
+        if 'first' in blob_name:
+            raise ConnectionError("upload failed")
+        started.set()
+        release.wait()
+
+    sink = DeadLetterSink(dead_letter_dir=str(tmp_path), uploader=uploader)
+    failed = sink.submit(rejected_rows(), "first.csv")
+    with pytest.raises(ConnectionError):
+        failed.result()
+    sink.submit(rejected_rows(), "second.csv")
+    started.wait()
+    # Reported while the sink is still running, not only at close
+    assert "Dead-letter write failed: upload failed" in capsys.readouterr().out
+    release.set()
+    with pytest.raises(ConnectionError):
+        sink.close()
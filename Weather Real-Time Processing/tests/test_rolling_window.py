@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+import pipeline
+from rolling_window import RollingWindow
+from test_deduplicator import FakeWriter
+
+HOUR = 3600
+
+
+def frame(names, hours, temperatures):
+    return pd.DataFrame({
+        'location_name': names, 'last_updated_epoch': [hour * HOUR for hour in hours],
+        'temperature_celsius': temperatures
+    })
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "rolling_window.npz")
+
+
+def window(store_path, **options):
+    return RollingWindow(store_path=store_path, columns=['temperature_celsius'], **options)
+
+
+def statistics(df, row):
+    return [df[f"temperature_celsius_{name}"].iloc[row] for name in RollingWindow.statistics]
+
+
+def test_statistics_cover_the_stored_windows_and_the_file(store_path):
+    rolling_window = window(store_path)
+    rolling_window.update(frame(['A', 'A', 'B'], [1, 2, 1], [10.0, 20.0, 5.0]))
+    result = rolling_window.apply(frame(['A', 'B', 'A'], [4, 2, 3], [60.0, 7.0, 30.0]))
+    # mean, min, max and change against the oldest observation of the window
+    assert statistics(result, 0) == [30.0, 10.0, 60.0, 50.0]
+    assert statistics(result, 1) == [6.0, 5.0, 7.0, 2.0]
+    assert statistics(result, 2) == [20.0, 10.0, 30.0, 20.0]
+
+
+def test_apply_leaves_the_windows_unchanged(store_path):
+    rolling_window = window(store_path)
+    rolling_window.apply(frame(['A'], [1], [10.0]))
+    assert len(rolling_window) == 0
+    rolling_window.update(frame(['A'], [1], [10.0]))
+    rolling_window.apply(frame(['A'], [2], [20.0]))
+    assert rolling_window.counts[rolling_window.slots['A']] == 1
+
+
+def test_late_rows_are_inserted_by_time(store_path):
+    rolling_window = window(store_path)
+    # Files processed concurrently may be written out of order
+    rolling_window.update(frame(['A'], [3], [30.0]))
+    rolling_window.update(frame(['A', 'A'], [1, 2], [10.0, 20.0]))
+    slot = rolling_window.slots['A']
+    assert rolling_window.times[slot, :3].tolist() == [HOUR, 2 * HOUR, 3 * HOUR]
+    result = rolling_window.apply(frame(['A'], [4], [40.0]))
+    assert statistics(result, 0) == [25.0, 10.0, 40.0, 30.0]
+
+
+def test_a_file_written_twice_does_not_repeat_its_observations(store_path):
+    rolling_window = window(store_path)
+    rolling_window.update(frame(['A', 'A'], [1, 2], [10.0, 20.0]))
+    rolling_window.update(frame(['A', 'A'], [1, 2], [10.0, 20.0]))
+    assert rolling_window.counts[rolling_window.slots['A']] == 2
+
+
+def test_windows_keep_window_size_observations_of_window_seconds(store_path):
+    rolling_window = window(store_path, window_size=3, window_seconds=10 * HOUR)
+    rolling_window.update(frame(['A'] * 5, [5, 1, 4, 2, 3], [50.0, 10.0, 40.0, 20.0, 30.0]))
+    slot = rolling_window.slots['A']
+    assert rolling_window.counts[slot] == 3
+    assert rolling_window.values[slot, :, 0].tolist() == [30.0, 40.0, 50.0]
+    # The window of hour 14 is its row and the two stored before it, hour 4 is out of its 10 hours
+    result = rolling_window.apply(frame(['A'], [14], [60.0]))
+    assert statistics(result, 0) == [55.0, 50.0, 60.0, 10.0]
+
+
+def test_rows_without_time_or_location_get_no_statistics(store_path):
+    rolling_window = window(store_path)
+    df = frame(['A', None], [1, 2], [10.0, 20.0])
+    df.loc[0, 'last_updated_epoch'] = np.nan
+    result = rolling_window.apply(df)
+    assert result['temperature_celsius_rolling_mean'].isna().all()
+
+
+def test_updates_are_saved_by_flush(store_path):
+    rolling_window = window(store_path, save_interval=3600)
+    rolling_window.update(frame(['A', 'A'], [2, 1], [20.0, 10.0]))
+    assert len(window(store_path)) == 0
+    rolling_window.flush()
+    restarted = window(store_path)
+    assert restarted.values[restarted.slots['A'], :2, 0].tolist() == [10.0, 20.0]
+
+
+def test_ring_buffer_stores_are_loaded_oldest_first(store_path):
+    np.savez(store_path, names=np.array(['A']), times=np.array([[3, 1, 2]]), values=np.array([[[30.0], [10.0], [20.0]]]),
+             heads=np.array([1]), counts=np.array([3]), columns=np.array(['temperature_celsius']))
+    rolling_window = window(store_path, window_size=3)
+    assert rolling_window.times[0].tolist() == [1, 2, 3]
+    assert rolling_window.values[0, :, 0].tolist() == [10.0, 20.0, 30.0]
+
+
+def test_windows_only_advance_once_the_file_is_uploaded(store_path, monkeypatch):
+    rolling_window = window(store_path)
+    files = {'a.csv': frame(['A'], [1], [10.0])}
+    monkeypatch.setattr(pipeline, 'WRITE_ROLLUPS', False)
+    monkeypatch.setattr(pipeline, 'read_and_validate', lambda file_path, dead_letter_sink: files[file_path])
+
+    def run(writer):
+        weather_pipeline = pipeline.build_weather_pipeline(writer, "out/processed_weather.csv", rolling_window=rolling_window)
+        weather_pipeline.start()
+        weather_pipeline.submit('a.csv')
+        weather_pipeline.close()
+
+    run(FakeWriter(fail_uploads=1))
+    assert len(rolling_window) == 0
+    run(FakeWriter())
+    assert rolling_window.counts[rolling_window.slots['A']] == 1
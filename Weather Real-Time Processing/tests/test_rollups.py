@@ -0,0 +1,40 @@
+import os
+import pandas as pd
+from processor import Processor
+from storage import MemoryStorage
+from writer import Writer
+
+
+def processed():
+    return pd.DataFrame({
+        'country': ['Belgium', 'Belgium', 'France', 'France'],
+        'temperature_category': ['Mild', 'Mild', 'Warm', 'Mild'],
+        'air_quality_category': ['Good', 'Moderate', 'Good', 'Good'],
+        'temperature_celsius': [12.0, 14.0, 25.0, 15.0],
+        'air_quality_us-epa-index': [1, 2, 1, 1],
+    })
+
+
+def test_rollups_match_a_groupby_of_the_output():
+    tables = Processor.compute_rollups(processed())
+    by_temperature = tables['by_country_temperature'].set_index(['country', 'temperature_category'])
+    assert by_temperature.loc[('Belgium', 'Mild')].tolist() == [2, 13.0, 12.0, 14.0, 1.5]
+    assert by_temperature.loc[('France', 'Warm'), 'records'] == 1
+    by_air_quality = tables['by_country_air_quality'].set_index(['country', 'air_quality_category'])
+    assert by_air_quality.loc[('France', 'Good')].tolist() == [2, 20.0]
+
+
+def test_rollups_and_aggregations_without_their_columns_are_skipped():
+    tables = Processor.compute_rollups(processed().drop(columns=['air_quality_category', 'air_quality_us-epa-index']))
+    assert list(tables) == ['by_country_temperature']
+    assert 'mean_air_quality_us-epa-index' not in tables['by_country_temperature'].columns
+
+
+def test_rollups_are_written_and_uploaded_next_to_the_output(tmp_path):
+    writer = Writer(None, "weather", storage=MemoryStorage("weather"))
+    path, name = writer.write(processed(), "processed_weather.csv", str(tmp_path / "processed_weather.csv"),
+                              rollups=Processor.compute_rollups(processed()))
+    base = os.path.splitext(name)[0]
+    expected = {name, f"{base}_by_country_temperature.csv", f"{base}_by_country_air_quality.csv"}
+    assert set(writer.storage.blobs) == expected
+    assert set(os.listdir(tmp_path)) == expected
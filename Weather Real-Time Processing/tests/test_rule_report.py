@@ -0,0 +1,62 @@
+import json
+import pandas as pd
+import pytest
+from rule_plan import write_rule_report
+from validator import Validator
+
+
+@pytest.fixture
+def rules_path(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({'rules': [
+        {'rule': 'missing:humidity', 'column': 'humidity', 'check': 'not_null',
+         'message': "Record {row}: Missing value in 'humidity'"},
+        {'rule': 'format:humidity', 'column': 'humidity', 'check': 'convertible', 'to': ['float'],
+         'message': "Record {row}: 'humidity' is not a number"},
+        {'rule': 'format:moon_phase', 'column': 'moon_phase', 'check': 'enum', 'values': ['Full Moon'],
+         'message': "Record {row}: invalid moon phase '{value}'"},
+    ]}))
+    return str(path)
+
+
+def report_of(rules_path, data):
+    validator = Validator(data, rules_path=rules_path)
+    validator.validate()
+    return validator.get_rule_report()
+
+
+def test_report_has_the_hits_share_and_sample_values_of_every_rule(rules_path):
+    data = pd.DataFrame({
+        'humidity': ['wet', 50, None, 'dry', 'wet', 70, 60, 80],
+        'moon_phase': ['Full Moon'] * 8,
+    }, dtype=object)
+    report = report_of(rules_path, data)
+    rules = {rule['rule']: rule for rule in report['rules']}
+
+    assert report['rows_checked'] == 8 and report['error_count'] == 4 and report['rules_fired'] == 2
+    assert rules['format:humidity']['hits'] == 3 and rules['format:humidity']['row_percentage'] == 37.5
+    assert rules['format:humidity']['column'] == 'humidity' and rules['format:humidity']['check'] == 'convertible'
+    # Distinct offending values, in the order they were found
+    assert rules['format:humidity']['sample_values'] == ['wet', 'dry']
+    assert rules['missing:humidity']['hits'] == 1
+    assert rules['format:moon_phase']['hits'] == 0 and rules['format:moon_phase']['sample_values'] == []
+    assert all(rule['seconds'] >= 0 for rule in report['rules'])
+    assert report['plan_fingerprint'] and report['budget_exceeded'] is False
+
+
+def test_file_level_errors_are_reported_without_a_column(rules_path):
+    report = report_of(rules_path, pd.DataFrame({'humidity': [50, 60]}))
+    missing = report['rules'][0]
+    assert missing['rule'] == 'missing_columns' and missing['hits'] == 1
+    assert missing['column'] is None and missing['sample_values'] == ['moon_phase']
+
+
+def test_reports_are_written_as_json_per_source(rules_path, tmp_path):
+    report = report_of(rules_path, pd.DataFrame({'humidity': ['wet'], 'moon_phase': ['Full Moon']}, dtype=object))
+    report_dir = str(tmp_path / "reports")
+    first = write_rule_report(report, "/input/weather.csv", report_dir)
+    second = write_rule_report(report, "/input/weather.csv", report_dir)
+    assert first != second
+    with open(first) as report_file:
+        written = json.load(report_file)
+    assert written['source'] == "/input/weather.csv" and written['rules'] == report['rules']
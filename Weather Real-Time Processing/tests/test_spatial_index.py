@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+import pipeline
+from spatial_index import SpatialIndex
+from test_deduplicator import FakeWriter
+
+
+def frame(names, lats, lons, epoch=1_715_849_100, temperature=20.0):
+    return pd.DataFrame({
+        'location_name': names, 'country': 'Belgium', 'latitude': lats, 'longitude': lons,
+        'last_updated_epoch': epoch, 'temperature_celsius': temperature
+    })
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SpatialIndex(store_path=str(tmp_path / "spatial_index.npz"))
+
+
+def names(records):
+    return [record['location_name'] for record in records]
+
+
+def test_bbox_and_radius_queries_only_return_locations_inside(index):
+    index.update(frame(['Brussels', 'Paris', 'Lyon'], [50.85, 48.86, 45.76], [4.35, 2.35, 4.84]))
+    assert sorted(names(index.within_bbox(48, 2, 51, 5))) == ['Brussels', 'Paris']
+    # Nearest first
+    assert names(index.nearby(50.0, 3.5, 300)) == ['Brussels', 'Paris']
+    assert names(index.nearby(50.0, 3.5, 10)) == []
+
+
+def test_newest_observation_wins_and_a_moved_location_changes_cell(index):
+    index.update(frame(['Brussels'], [50.85], [4.35], epoch=200, temperature=15.0))
+    index.update(frame(['Brussels'], [50.85], [4.35], epoch=100, temperature=10.0))
+    assert index.nearby(50.85, 4.35, 1)[0]['temperature_celsius'] == 15.0
+
+    index.update(frame(['Brussels'], [45.76], [4.84], epoch=300))
+    assert names(index.within_bbox(50, 4, 51, 5)) == []
+    assert names(index.within_bbox(45, 4, 46, 5)) == ['Brussels']
+    assert len(index) == 1
+
+
+def test_box_across_the_antimeridian(index):
+    index.update(frame(['Suva', 'Apia', 'Lima'], [-18.14, -13.83, -12.05], [178.44, -171.76, -77.04]))
+    assert sorted(names(index.within_bbox(-20, 170, -10, -170))) == ['Apia', 'Suva']
+
+
+def test_updates_are_saved_by_flush(tmp_path):
+    store_path = str(tmp_path / "spatial_index.npz")
+    index = SpatialIndex(store_path=store_path, save_interval=3600)
+    index.update(frame(['Brussels'], [50.85], [4.35]))
+    assert len(SpatialIndex(store_path=store_path)) == 0
+    index.flush()
+    assert names(SpatialIndex(store_path=store_path).within_bbox(50, 4, 51, 5)) == ['Brussels']
+
+
+def test_index_is_only_updated_once_the_file_is_uploaded(index, monkeypatch):
+    files = {'a.csv': frame(['Brussels'], [50.85], [4.35])}
+    monkeypatch.setattr(pipeline, 'WRITE_ROLLUPS', False)
+    monkeypatch.setattr(pipeline, 'read_and_validate', lambda file_path, dead_letter_sink: files[file_path])
+    monkeypatch.setattr(pipeline, 'process_data', lambda valid_data, deduplicator, *state: (valid_data, []))
+
+    def run(writer):
+        weather_pipeline = pipeline.build_weather_pipeline(writer, "out/processed_weather.csv", spatial_index=index)
+        weather_pipeline.start()
+        weather_pipeline.submit('a.csv')
+        weather_pipeline.close()
+
+    run(FakeWriter(fail_uploads=1))
+    assert len(index) == 0
+    run(FakeWriter())
+    assert names(index.within_bbox(50, 4, 51, 5)) == ['Brussels']
@@ -0,0 +1,48 @@
+import time
+import random
+from pipeline import Stage, StagedPipeline
+
+
+def run(stages, items):
+    staged_pipeline = StagedPipeline(stages).start()
+    for item in items:
+        staged_pipeline.submit(item)
+    staged_pipeline.close()
+    return staged_pipeline
+
+
+def slow(item):
+    # Items finish out of submission order on the unordered workers
+    time.sleep(random.Random(item).uniform(0, 0.01))
+    return item
+
+
+def test_ordered_stage_sees_items_in_submission_order():
+    seen = []
+    stages = [Stage("read", slow, workers=4, queue_size=2),
+              Stage("write", lambda item: seen.append(item) or item, ordered=True)]
+    run(stages, range(30))
+    assert seen == list(range(30))
+
+
+def test_dropped_and_failed_items_do_not_hold_up_the_ordered_stage():
+    seen = []
+
+    def read(item):
+        if item % 5 == 0:
+            return None
+        if item % 7 == 0:
+            raise ValueError(f"bad file {item}")
+        return slow(item)
+
+    stages = [Stage("read", read, workers=3),
+              Stage("write", lambda item: seen.append(item) or item, ordered=True),
+              Stage("upload", lambda item: item, workers=2)]
+    staged_pipeline = run(stages, range(1, 21))
+    assert seen == [item for item in range(1, 21) if item % 5 and item % 7]
+    assert staged_pipeline.stats['read'] == {'done': 14, 'dropped': 4, 'failed': 2}
+    assert staged_pipeline.stats['upload'] == {'done': 14, 'dropped': 0, 'failed': 0}
+
+
+def test_an_ordered_stage_runs_on_one_worker():
+    assert Stage("write", slow, workers=4, ordered=True).workers == 1
@@ -0,0 +1,51 @@
+import pytest
+from storage import LocalDirectoryStorage, MemoryStorage, get_storage
+
+
+@pytest.fixture(params=['local', 'memory'])
+def backend(request, tmp_path):
+    if request.param == 'local':
+        return LocalDirectoryStorage("weather", root_dir=str(tmp_path / "storage"))
+    return MemoryStorage("weather")
+
+
+def local_file(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def test_overwrite_semantics_match_azure(backend, tmp_path):
+    backend.upload(local_file(tmp_path, "a.csv", "first"), "out/a.csv", overwrite=False)
+    with pytest.raises(FileExistsError):
+        backend.upload(local_file(tmp_path, "b.csv", "second"), "out/a.csv", overwrite=False)
+    backend.upload(local_file(tmp_path, "c.csv", "third"), "out/a.csv")
+    assert backend.exists("out/a.csv") and not backend.exists("out/b.csv")
+
+
+def test_list_and_delete_blobs(backend, tmp_path):
+    path = local_file(tmp_path, "a.csv", "rows")
+    for name in ("out/2024/a.csv", "out/2024/b.csv", "other.csv"):
+        backend.upload(path, name)
+    assert backend.list_blobs("out/") == ["out/2024/a.csv", "out/2024/b.csv"]
+    backend.delete("out/2024/a.csv")
+    backend.delete("out/2024/missing.csv")
+    assert backend.list_blobs("") == ["other.csv", "out/2024/b.csv"]
+
+
+def test_local_blobs_are_files_and_empty_folders_are_removed(tmp_path):
+    storage = LocalDirectoryStorage("weather", root_dir=str(tmp_path / "storage"))
+    storage.upload(local_file(tmp_path, "a.csv", "rows"), "out/2024/a.csv")
+    with open(storage.blob_path("out/2024/a.csv")) as blob:
+        assert blob.read() == "rows"
+    storage.delete("out/2024/a.csv")
+    assert not (tmp_path / "storage" / "weather" / "out").exists()
+
+
+def test_backend_is_picked_by_storage_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    assert isinstance(get_storage(None, "weather"), MemoryStorage)
+    monkeypatch.setenv("STORAGE_DIR", str(tmp_path))
+    assert isinstance(get_storage(None, "weather", backend='local'), LocalDirectoryStorage)
+    with pytest.raises(ValueError, match="Unknown storage backend"):
+        get_storage(None, "weather", backend='s3')
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+import storage
+from storage import RetryPolicy
+
+
+# StatusError class
+# - An error carrying an HTTP status code, like the Azure SDK's HttpResponseError.
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Records the retry delays instead of sleeping them"""
+    delays = []
+    monkeypatch.setattr(storage.time, 'sleep', delays.append)
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(storage.asyncio, 'sleep', fake_sleep)
+    return delays
+
+
+def failing(errors, result="stored"):
+    """A function raising errors in turn, then returning result; calls counts the calls"""
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return func, calls
+
+
+@pytest.mark.parametrize('error', [
+    StatusError(408), StatusError(429), StatusError(500), StatusError(503),
+    ConnectionResetError("reset"), TimeoutError("timed out"),
+])
+def test_transient_errors_are_retried(error):
+    assert RetryPolicy().is_retryable(error)
+
+
+@pytest.mark.parametrize('error', [
+    StatusError(400), StatusError(403), StatusError(404), StatusError(409),
+    FileExistsError("blob exists"), ValueError("bad argument"), KeyError("x"), OSError("disk full"),
+])
+def test_other_errors_are_not_retried(error):
+    assert not RetryPolicy().is_retryable(error)
+
+
+def test_azure_connection_errors_are_retried():
+    exceptions = pytest.importorskip("azure.core.exceptions")
+    assert RetryPolicy().is_retryable(exceptions.ServiceRequestError("no connection"))
+    assert RetryPolicy().is_retryable(exceptions.ServiceResponseError("connection dropped"))
+    assert not RetryPolicy().is_retryable(exceptions.ClientAuthenticationError("bad key"))
+
+
+def test_call_retries_until_success(no_sleep):
+    func, calls = failing([StatusError(503), ConnectionError("down")])
+    assert RetryPolicy(max_attempts=5).call(func) == "stored"
+    assert len(calls) == 3
+    assert len(no_sleep) == 2
+
+
+def test_call_gives_up_after_max_attempts(no_sleep):
+    func, calls = failing([StatusError(503)] * 5)
+    with pytest.raises(StatusError):
+        RetryPolicy(max_attempts=3).call(func)
+    assert len(calls) == 3
+
+
+def test_call_raises_a_permanent_error_at_once(no_sleep):
+    func, calls = failing([StatusError(403)])
+    with pytest.raises(StatusError):
+        RetryPolicy().call(func)
+    assert len(calls) == 1 and no_sleep == []
+
+
+def test_delays_back_off_exponentially_with_jitter():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for attempt, ceiling in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (10, 5.0)]:
+        delay = policy.delay(attempt)
+        assert ceiling / 2 <= delay <= ceiling
+
+
+def test_call_async_retries(no_sleep):
+    func, calls = failing([TimeoutError("slow"), StatusError(429)])
+
+    async def upload():
+        return func()
+
+    assert asyncio.run(RetryPolicy().call_async(upload)) == "stored"
+    assert len(calls) == 3 and len(no_sleep) == 2
+
+    func, calls = failing([StatusError(404)])
+    with pytest.raises(StatusError):
+        asyncio.run(RetryPolicy().call_async(upload))
+    assert len(calls) == 1
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from validation_errors import ErrorStore
+
+RULES = [
+    ('missing_columns', "Missing columns: {value}"),
+    ('temperature_type', "Row {row}: temperature {value} is not a number"),
+    ('humidity_range', "Row {row}: humidity out of range"),
+]
+
+
+def samples(store):
+    return [(error.row, error.rule) for error in store]
+
+
+def test_samples_are_kept_in_row_order_whatever_order_the_rules_run_in():
+    store = ErrorStore(RULES, index=pd.RangeIndex(10), max_samples=4)
+    store.add_many([2, 5, 8], 'humidity_range')
+    store.add_many([1, 5, 9], 'temperature_type', values=['hot', 'warm', 'cold'])
+    store.add(-1, 'missing_columns', 'wind_kph')
+
+    assert samples(store) == [(-1, 'missing_columns'), (1, 'temperature_type'), (2, 'humidity_range'),
+                              (5, 'temperature_type')]
+    # Every error is counted, not only the retained ones
+    assert len(store) == 7
+    assert store.counts_by_rule() == {'missing_columns': 1, 'temperature_type': 3, 'humidity_range': 3}
+    # Values of dropped samples are released
+    assert [error.value for error in store] == ['wind_kph', 'hot', None, 'warm']
+    assert store.values == ['wind_kph', 'hot', 'warm']
+
+
+def test_samples_wanted_stops_at_the_last_retained_sample():
+    store = ErrorStore(RULES, index=pd.RangeIndex(10), max_samples=2)
+    store.add_many([3, 4], 'humidity_range')
+    assert store.samples_wanted(np.array([1, 3, 6]), 'temperature_type') == 2
+    assert store.samples_wanted(np.array([6, 7]), 'temperature_type') == 0
+
+
+def test_rules_fired_per_row():
+    store = ErrorStore(RULES, index=pd.RangeIndex(4))
+    store.add_many([0, 2], 'temperature_type', values=['a', 'b'])
+    store.add_many([2], 'humidity_range')
+    assert store.invalid_rows().tolist() == [0, 2]
+    assert store.invalid_mask(1, 3).tolist() == [False, True]
+    assert store.rules_for_row(2) == ['temperature_type', 'humidity_range']
+    assert store.rule_codes([0, 2]) == ['temperature_type', 'temperature_type;humidity_range']
+
+
+def test_messages_are_rendered_with_the_index_label():
+    store = ErrorStore(RULES, index=pd.Index([10, 20, 30]))
+    store.add(1, 'temperature_type', 'hot')
+    assert str(store[0]) == "Row 20: temperature hot is not a number"
+    assert store[-1].rule == 'temperature_type'
+    with pytest.raises(IndexError):
+        store[1]
+
+
+def test_too_many_rules_are_rejected():
+    with pytest.raises(ValueError, match="At most 256 rules"):
+        ErrorStore([(f"rule_{i}", "") for i in range(257)])
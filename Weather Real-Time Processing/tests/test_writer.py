@@ -0,0 +1,55 @@
+import os
+import threading
+import pandas as pd
+import pytest
+from storage import MemoryStorage
+from writer import Writer
+
+
+@pytest.fixture
+def writer():
+    return Writer(None, "weather", storage=MemoryStorage("weather"))
+
+
+def frame(temperature):
+    return pd.DataFrame({'location_name': ['Brussels', 'Paris'], 'temperature_celsius': [temperature, 21.5]})
+
+
+def test_name_carries_the_source_and_the_content_hash(writer, tmp_path):
+    path, name = writer.save_local(frame(13.9), "processed_weather.csv", str(tmp_path / "processed_weather.csv"),
+                                   source_id="/input/weather 2024-05-16.csv")
+    assert name.startswith("processed_weather_") and name.endswith(f"_weather-2024-05-16_{Writer.content_hash(frame(13.9))}.csv")
+    pd.testing.assert_frame_equal(pd.read_csv(path), frame(13.9))
+    # Only the output itself is left, no temporary file
+    assert os.listdir(tmp_path) == [name]
+
+
+def test_content_hash_follows_values_and_columns():
+    assert Writer.content_hash(frame(13.9)) == Writer.content_hash(frame(13.9))
+    assert Writer.content_hash(frame(13.9)) != Writer.content_hash(frame(14.0))
+    assert Writer.content_hash(frame(13.9)) != Writer.content_hash(frame(13.9).rename(columns={'location_name': 'city'}))
+
+
+def test_concurrent_writers_never_overwrite_each_other(writer, tmp_path):
+    output_path = str(tmp_path / "processed_weather.csv")
+    names = []
+
+    def write(temperature):
+        names.append(writer.write(frame(temperature), "processed_weather.csv", output_path)[1])
+
+    threads = [threading.Thread(target=write, args=(float(t),)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(names)) == 8
+    assert sorted(writer.storage.blobs) == sorted(names)
+    assert sorted(os.listdir(tmp_path)) == sorted(names)
+
+
+def test_an_output_already_uploaded_is_skipped(writer, tmp_path, capsys):
+    path, name = writer.save_local(frame(13.9), "processed_weather.csv", str(tmp_path / "processed_weather.csv"))
+    writer.upload(path, name)
+    writer.upload(path, name)
+    assert "Already uploaded, skipped" in capsys.readouterr().out
+    assert list(writer.storage.blobs) == [name]
@@ -1,181 +1,119 @@
+import os
 import pandas as pd
-from datetime import datetime
-from reader import Reader
+from validation_errors import ErrorStore
+from rule_plan import load_rules, compile_plan, RuleStats, rule_report
+
+# The validation rules, as data, see rule_plan.py for the format
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'validation_rules.json')
+
 
 class Validator:
-    def __init__(self, data):
+    def __init__(self, data, max_error_samples=1000, error_budget=None, rules_path=None):
         self.data = data
-        self.errors = []
-        self.error_rows = set()  # Track rows with errors for filtering
-
-        self.valid_moon_phases = {
-            "new moon",
-            "waxing crescent",
-            "first quarter",
-            "waxing gibbous",
-            "full moon",
-            "waning gibbous",
-            "third quarter",
-            "waning crescent",
-            "last quarter"
-        }
-
-        # Define expected types/formats for each field
-        self.schema = {
-            'country': str,
-            'location_name': str,
-            'latitude': (float, int),
-            'longitude': (float, int),
-            'timezone': str,
-            'last_updated_epoch': (float, int),
-            'last_updated': 'datetime',
-            'temperature_celsius': (float, int),
-            'temperature_fahrenheit': (float, int),
-            'condition_text': str,
-            'wind_mph': (float, int),
-            'wind_kph': (float, int),
-            'wind_degree': (float, int),
-            'wind_direction': str,
-            'pressure_mb': (float, int),
-            'pressure_in': (float, int),
-            'precip_mm': (float, int),
-            'precip_in': (float, int),
-            'humidity': (float, int),
-            'cloud': (float, int),
-            'feels_like_celsius': (float, int),
-            'feels_like_fahrenheit': (float, int),
-            'visibility_km': (float, int),
-            'visibility_miles': (float, int),
-            'uv_index': (float, int),
-            'gust_mph': (float, int),
-            'gust_kph': (float, int),
-            'air_quality_Carbon_Monoxide': (float, int),
-            'air_quality_Ozone': (float, int),
-            'air_quality_Nitrogen_dioxide': (float, int),
-            'air_quality_Sulphur_dioxide': (float, int),
-            'air_quality_PM2.5': (float, int),
-            'air_quality_PM10': (float, int),
-            'air_quality_us-epa-index': (float, int),
-            'air_quality_gb-defra-index': (float, int),
-            'sunrise': 'time',
-            'sunset': 'time',
-            'moonrise': 'time',
-            'moonset': 'time',
-            'moon_phase': str,
-            'moon_illumination': int
-        }
+        self.max_error_samples = max_error_samples
+        self.error_budget = error_budget
+        self.errors = None
+        self.budget_exceeded = False
+        self.termination_reason = None
+        self.rows_checked = 0
+        # Time spent and sample offending values per rule, for get_rule_report()
+        self.rule_stats = RuleStats()
+
+        # A missing-value and a format rule per column, compiled once per set of rules and
+        # shared by every Validator (one per file); editing the rule file gives a new plan
+        self.plan = compile_plan(load_rules(rules_path or RULES_PATH))
+
+        # Error rules: a file-level rule plus the rules of the plan
+        self.rules = [('missing_columns', "Missing columns in data: {value}")] + self.plan.rules
+
+    def required_columns(self):
+        """Columns the Reader must load, every column with a rule is validated"""
+        return list(self.plan.columns)
 
     def validate(self):
-        """Validate the data according to the schema"""
-        self.errors = []
-        self.error_rows = set()
+        """Validate the data according to the rules"""
+        self.errors = ErrorStore(self.rules, index=self.data.index, max_samples=self.max_error_samples)
+        self.budget_exceeded = False
+        self.termination_reason = None
+        self.rows_checked = 0
+        self.rule_stats = RuleStats()
         
         # Check that all required columns are present
-        missing_columns = set(self.schema.keys()) - set(self.data.columns)
+        expected_columns = self.plan.columns
+        missing_columns = set(expected_columns) - set(self.data.columns)
         if missing_columns:
-            self.errors.append(f"Missing columns in data: {', '.join(missing_columns)}")
+            self.errors.add(-1, 'missing_columns', ', '.join(missing_columns))
+            self.rule_stats.values['missing_columns'] = sorted(missing_columns)
             # If critical columns are missing, return early
-            if len(missing_columns) > len(self.schema) / 2:  # If more than half the columns are missing
+            if len(missing_columns) > len(expected_columns) / 2:  # If more than half the columns are missing
+                self.budget_exceeded = True
+                self.termination_reason = f"{len(missing_columns)} of {len(expected_columns)} columns are missing"
                 return self.errors
 
-        # Validate each row
-        for i, row in self.data.iterrows():
-            row_has_error = False
-            
-            for col, expected_type in self.schema.items():
-                # Skip columns that don't exist in the dataset
-                if col not in self.data.columns:
-                    continue
-                    
-                value = row[col]
-
-                # Check presence (mandatory)
-                if pd.isna(value):
-                    self.errors.append(f"Record {i}: Missing value in '{col}'")
-                    row_has_error = True
-                    continue
-
-                # Moon phase validation
-                if col == 'moon_phase':
-                    # Case-insensitive comparison
-                    if str(value).strip().lower() not in self.valid_moon_phases:
-                        self.errors.append(f"Record {i}: '{col}' contains invalid moon phase '{value}'")
-                        row_has_error = True
-                    continue  # Skip further type checking for this field
-
-                # Check datetime format
-                if expected_type == 'datetime':
-                    try:
-                        datetime.strptime(str(value), '%Y-%m-%d %H:%M')
-                    except ValueError:
-                        self.errors.append(f"Record {i}: '{col}' is not in 'YYYY-MM-DD HH:MM' format")
-                        row_has_error = True
-                    continue
-
-                # Check time format
-                elif expected_type == 'time':
-                    if isinstance(value, str) and value.strip().lower() in {
-                        "no moonset", "no sunrise", "no sunset", "no moonrise"
-                    }:
-                        continue  # Valid exception
-                    try:
-                        datetime.strptime(str(value).strip(), '%I:%M %p')
-                    except ValueError:
-                        self.errors.append(f"Record {i}: '{col}' is not in 'HH:MM AM/PM' format or a valid exception")
-                        row_has_error = True
-                    continue
-
-                # Generic type check (float/int/str)
-                else:
-                    if not isinstance(value, expected_type):
-                        try:
-                            # Attempt conversion to check if the value is convertible
-                            if isinstance(expected_type, tuple):
-                                # Try each type in the tuple
-                                conversion_success = False
-                                for t in expected_type:
-                                    try:
-                                        t(value)
-                                        conversion_success = True
-                                        break
-                                    except (ValueError, TypeError):
-                                        pass
-                                if not conversion_success:
-                                    self.errors.append(f"Record {i}: '{col}' is not of type {expected_type}")
-                                    row_has_error = True
-                            else:
-                                expected_type(value)  # Attempt conversion
-                        except (ValueError, TypeError):
-                            self.errors.append(f"Record {i}: '{col}' is not of type {expected_type.__name__}")
-                            row_has_error = True
-            
-            if row_has_error:
-                self.error_rows.add(i)
-
+        # Validate chunk by chunk, the error budget is checked after every chunk
+        chunk_size = self.error_budget.chunk_size if self.error_budget is not None else max(len(self.data), 1)
+        invalid_rows = 0
+        for start in range(0, len(self.data), chunk_size):
+            chunk = self.data.iloc[start:start + chunk_size]
+            self.plan.evaluate(chunk, self.errors, offset=start, stats=self.rule_stats)
+            self.rows_checked = start + len(chunk)
+
+            if self.error_budget is not None:
+                invalid_rows += int(self.errors.invalid_mask(start, self.rows_checked).sum())
+                reason = self.error_budget.exceeded(self.rows_checked, invalid_rows, len(self.errors))
+                if reason:
+                    self.budget_exceeded = True
+                    self.termination_reason = reason
+                    return self.errors
+
+        self.rows_checked = len(self.data)
         return self.errors
 
     def summary(self):
-        total = len(self.data)
-        invalid = len(self.error_rows)
+        # Rows after an early stop were never checked
+        total = self.rows_checked if self.budget_exceeded else len(self.data)
+        invalid = len(self.errors.invalid_rows()) if self.errors is not None else 0
         return {
             'total_records': total,
             'invalid_records': invalid,
-            'error_count': len(self.errors),
-            'valid_percentage': round((total - invalid) / total * 100, 2) if total > 0 else 0
+            'error_count': len(self.errors) if self.errors is not None else 0,
+            'valid_percentage': round((total - invalid) / total * 100, 2) if total > 0 else 0,
+            'budget_exceeded': self.budget_exceeded
         }
+
+    def get_rule_report(self):
+        """Hits, share of rows, time spent and sample values of every rule, as a JSON-ready dict"""
+        if self.errors is None:
+            raise ValueError("No validation results. Call validate() first.")
+        report = rule_report(self.errors, self.summary()['total_records'], self.rule_stats, self.plan)
+        report['budget_exceeded'] = self.budget_exceeded
+        return report
     
     def get_validated_data(self, filter_invalid=False):
         """
         Return the validated data
         If filter_invalid is True, rows with validation errors are removed
         """
-        if filter_invalid and self.error_rows:
+        if filter_invalid and self.errors:
             # Return only valid rows
-            valid_indices = list(set(range(len(self.data))) - self.error_rows)
-            return self.data.iloc[valid_indices].copy().reset_index(drop=True)
+            valid_mask = ~self.errors.invalid_mask()
+            return self.data[valid_mask].copy().reset_index(drop=True)
         return self.data
 
+    def get_rejected_data(self):
+        """
+        Return the rows that failed validation, with a 'rule_codes' column
+        listing the rules each row failed
+        """
+        if not self.errors:
+            return self.data.iloc[0:0].assign(rule_codes=pd.Series(dtype=object))
+        rows = self.errors.invalid_rows()
+        rejected = self.data.iloc[rows].copy()
+        rejected['rule_codes'] = self.errors.rule_codes(rows)
+        return rejected.reset_index(drop=True)
+
 if __name__ == "__main__":
+    from reader import Reader
     # Load the most recent CSV file from the input folder
     data = Reader.read_last_file()
     
@@ -200,6 +138,10 @@ if __name__ == "__main__":
                 print(error)
             if len(errors) > 10:
                 print(f"...and {len(errors) - 10} more errors")
+
+            print("\nErrors by rule:")
+            for rule, count in errors.counts_by_rule().items():
+                print(f"{rule}: {count}")
             
             # Get clean data
             valid_data = validator.get_validated_data(filter_invalid=True)
@@ -1,38 +1,80 @@
 # Added the imports
 import os
+import re
+import hashlib
+import threading
 import datetime
-from azure.storage.blob import BlobServiceClient
 import pandas as pd
-from processor import Processor
+from storage import get_storage
 
 # Writer class
 # - Writes to the local /output folder.
-# - Writes to Azure Blog Storage.
+# - Writes to Azure Blog Storage, or to the backend chosen with STORAGE_BACKEND (see storage.py).
 class Writer:
-    def __init__(self, connection_string, container_name):
+    def __init__(self, connection_string, container_name, storage=None):
         self.connection_string = connection_string
         self.container_name = container_name
-        self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
+        self.storage = storage or get_storage(connection_string, container_name)
 
-    def write(self, df: pd.DataFrame, filename, output_path):
-        # Create a unique filename with timestamp
+    def write(self, df: pd.DataFrame, filename, output_path, source_id=None, rollups=None):
+        unique_output_path, unique_filename = self.save_local(df, filename, output_path, source_id)
+        self.upload(unique_output_path, unique_filename)
+        for rollup_path, rollup_name in self.save_rollups(rollups or {}, unique_output_path):
+            self.upload(rollup_path, rollup_name)
+        return unique_output_path, unique_filename
+
+    def save_local(self, df: pd.DataFrame, filename, output_path, source_id=None):
+        # Create a unique filename: <name>_<timestamp>[_<source>]_<content hash><ext>
+        # Two outputs only share a name when they have the same content, so concurrent
+        # writers never overwrite each other's files.
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         filename_base, filename_ext = os.path.splitext(filename)
-        unique_filename = f"{filename_base}_{timestamp}{filename_ext}"
+        parts = [filename_base, timestamp]
+        if source_id:
+            parts.append(re.sub(r"[^A-Za-z0-9-]+", "-", os.path.splitext(os.path.basename(source_id))[0]))
+        parts.append(self.content_hash(df))
+        unique_filename = "_".join(parts) + filename_ext
         unique_output_path = os.path.join(os.path.dirname(output_path), unique_filename)
         
-        # Save to local file
-        df.to_csv(unique_output_path, index=False)
-
-        # Upload to Azure Blob Storage
-        blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=unique_filename)
-        with open(unique_output_path, "rb") as data_file:
-            blob_client.upload_blob(data_file, overwrite=True)
-        print(f"☁️ Uploaded to Azure Blob Storage: {self.container_name}/{unique_filename}")
-        
+        self._save_atomic(df, unique_output_path)
         return unique_output_path, unique_filename
 
+    def save_rollups(self, rollups, output_path):
+        """Write each rollup table next to output_path as <output name>_<rollup name>.csv, returns [(path, blob name)]"""
+        written = []
+        output_base, output_ext = os.path.splitext(output_path)
+        for name, table in rollups.items():
+            rollup_path = f"{output_base}_{name}{output_ext}"
+            self._save_atomic(table, rollup_path)
+            written.append((rollup_path, os.path.basename(rollup_path)))
+        return written
+
+    @staticmethod
+    def _save_atomic(df: pd.DataFrame, path):
+        # Save to a temp file and rename, readers never see a half-written output
+        tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def content_hash(df: pd.DataFrame):
+        """Short hash of the column names and row values"""
+        digest = hashlib.sha1(",".join(map(str, df.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return digest.hexdigest()[:12]
+
+    def upload(self, local_path, blob_name):
+        # Conditional upload (If-None-Match: *), an existing blob with this name already
+        # holds the same content, so it is left as it is
+        try:
+            self.storage.upload(local_path, blob_name, overwrite=False)
+        except FileExistsError:
+            print(f"Already uploaded, skipped: {self.container_name}/{blob_name}")
+            return
+        print(f"☁️ Uploaded to {self.storage}: {self.container_name}/{blob_name}")
+
 if __name__ == "__main__":
+    from processor import Processor
     processor = Processor()
     processed_data = processor.process().get_processed_data()
     
@@ -0,0 +1,25 @@
+import os
+import filecmp
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEATHER_DIR = os.path.join(ROOT, "Weather Real-Time Processing")
+NASHVILLE_DIR = os.path.join(ROOT, "Nashville Batch Processing", "original")
+
+# Modules both pipelines use, kept as identical copies: change one, copy it to the other
+SHARED_MODULES = [
+    'dtype_optimizer.py',
+    'error_budget.py',
+    'polars_io.py',
+    'quarantine.py',
+    'rule_plan.py',
+    'storage.py',
+    'validation_errors.py',
+]
+
+
+@pytest.mark.parametrize('module', SHARED_MODULES)
+def test_shared_module_copies_are_identical(module):
+    weather, nashville = os.path.join(WEATHER_DIR, module), os.path.join(NASHVILLE_DIR, module)
+    assert filecmp.cmp(weather, nashville, shallow=False), \
+        f"{module} differs between the two pipelines, copy the changed one over the other"